@@ -0,0 +1,79 @@
+import io
+import wave
+import numpy as np
+from typing import BinaryIO, Union
+
+# Anything AudioSampleExtractor can open: a path, WAV file bytes or a binary file object
+AudioSource = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# Little-endian dtypes for sample widths NumPy can view directly
+SAMPLE_DTYPES = {1: np.dtype(np.uint8), 2: np.dtype('<i2'), 4: np.dtype('<i4')}
+
+
+class AudioSampleExtractor:
+    def __init__(self, path: AudioSource, channel: Union[int, None] = None):
+        """
+        Initialize with the path to the WAV file.
+
+        :param path: Path to the WAV file (or WAV bytes / binary file object).
+        :param channel: Channel to expose, or None for all interleaved samples.
+        """
+        self.path = path
+        self.channel = channel
+        self.params: Union[tuple, None] = None
+        self.frames: Union[bytearray, None] = None
+        self.samples: Union[np.ndarray, None] = None
+
+    def load(self) -> None:
+        """
+        Load every frame into a writable buffer and expose its samples as a view.
+        """
+        with self.open(self.path) as wav:
+            self.params = wav.getparams()
+            self.frames = bytearray(wav.readframes(self.params.nframes))
+        self.samples = self.view(self.frames, self.params.sampwidth, self.params.nchannels, self.channel)
+
+    @staticmethod
+    def open(source: AudioSource) -> wave.Wave_read:
+        """
+        Open a WAV source for reading. In-memory buffers are wrapped in BytesIO (which shares, not copies, a bytes object).
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        return wave.open(source, 'rb')
+
+    @staticmethod
+    def lanes(nchannels: int, channel: Union[int, None]) -> int:
+        """
+        Number of usable samples per frame.
+        """
+        return nchannels if channel is None else 1
+
+    @staticmethod
+    def view(buffer, sampwidth: int, nchannels: int, channel: Union[int, None] = None) -> np.ndarray:
+        """
+        Build a zero-copy view of PCM frames whose LSBs are the sample LSBs.
+
+        8, 16 and 32-bit samples are viewed with their own dtype. 24-bit samples
+        have no NumPy dtype, so the view is a strided uint8 view of their low byte.
+
+        :param buffer: Frame bytes (bytes, bytearray, memoryview or uint8 array). Writable buffers give writable views.
+        :param sampwidth: Sample width in bytes (1-4).
+        :param nchannels: Number of interleaved channels.
+        :param channel: Channel to select, or None for all interleaved samples.
+        :return: 1-D array with one element per usable sample.
+        """
+        if channel is not None and not (0 <= channel < nchannels):
+            raise ValueError(f"channel must be between 0 and {nchannels - 1}")
+        raw = buffer if isinstance(buffer, np.ndarray) else np.frombuffer(buffer, dtype=np.uint8)
+        raw = raw[:raw.size - raw.size % (sampwidth * nchannels)]
+        if sampwidth in SAMPLE_DTYPES:
+            samples = raw.view(SAMPLE_DTYPES[sampwidth])
+        elif sampwidth == 3:
+            # Little-endian: the low byte of each sample comes first
+            samples = raw[::3]
+        else:
+            raise ValueError(f"Unsupported sample width: {sampwidth * 8} bits")
+        if channel is not None:
+            samples = samples[channel::nchannels]
+        return samples
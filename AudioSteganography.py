@@ -1,129 +1,590 @@
+import io
+import logging
+import os
+import shutil
+import struct
 import wave
 import numpy as np
+from typing import BinaryIO, Iterable, Iterator
 
-from TextBitManipulator import TextBitExtractor, TextGenerator
+import StegMetrics
+from AudioSampleManipulator import AudioSampleExtractor, AudioSource
+from CoverCache import CoverCache
+from BitPlaneManipulator import BitPlaneEngine, HEADER_BITS, MAX_DEPTH, MAX_PAYLOAD_BITS
+from KeyedScatter import KeyedScatter
+from PayloadCodec import PayloadCodec
+from StegContainer import CONTAINER_BITS, ContainerHeader
+from StegThreads import ThreadedLayout, prefetch
+from TextBitManipulator import TextGenerator
 
+logger = logging.getLogger(__name__)
 
 class AudioSteganography:
     """
     AudioSteganography class that encodes and decodes messages in audio using LSB steganography.
     """
 
-    def __init__(self, delimiter: str = "<END>"):
+    def __init__(self, delimiter: str = "<END>", chunk_frames: int = 65536, channel: int | None = None,
+                 bits_per_sample: int = 1, key: str | None = None, threads: int = 1,
+                 cache: CoverCache | None = None):
         """
         Initialize the steganography tool with a custom delimiter.
 
         Args:
-            delimiter: String delimiter to mark the end of the hidden message
+            delimiter: String delimiter ending the message in audio written before the container
+                header; only used to decode those
+            chunk_frames: Maximum number of frames read at once while decoding
+            channel: Channel to confine the hidden bits to, or None to spread them across all channels
+            bits_per_sample: Low bits of each sample carrying the message when encoding (1-4).
+                Recorded in the header, so decoding needs no option.
+            key: Secret key scattering the header and message over keyed pseudo-random samples
+                instead of the first ones; decoding needs the same key
+            threads: Threads embedding and extracting contiguous chunks of a large payload, and reading
+                the next chunk of frames while the current one is decoded. The output is identical for any value.
+            cache: Keeps WAVs given by path loaded between encode calls (revalidated by mtime and size),
+                for embedding many payloads into the same covers
         """
+        if not (1 <= bits_per_sample <= MAX_DEPTH):
+            raise ValueError(f"bits_per_sample must be between 1 and {MAX_DEPTH}.")
+        if threads < 1:
+            raise ValueError("threads must be positive")
         self.delimiter = delimiter
-    def encode(self, audio_path: str, message: str, output_path: str) -> bool:
+        self.chunk_frames = chunk_frames
+        self.channel = channel
+        self.bits_per_sample = bits_per_sample
+        self.key = key
+        self.threads = threads
+        self.cache = cache
+
+    def _layout(self, size: int) -> BitPlaneEngine | KeyedScatter | ThreadedLayout:
+        """
+        Bit layout over size usable samples: sequential, or keyed scatter when a key is set,
+        split across threads when threads > 1.
+        """
+        layout = BitPlaneEngine if self.key is None else KeyedScatter(self.key, size)
+        return layout if self.threads == 1 else ThreadedLayout(layout, self.threads)
+
+    def _iter_frames(self, wav: wave.Wave_read, n_frames: int) -> Iterator[bytes]:
+        """
+        Read the next n_frames frames of an open WAV file, at most chunk_frames at a time.
+        """
+        block_align = wav.getnchannels() * wav.getsampwidth()
+        while n_frames > 0:
+            frames = wav.readframes(min(self.chunk_frames, n_frames))
+            if not frames:
+                raise EOFError("Audio ended before the hidden data was fully read")
+            n_frames -= len(frames) // block_align
+            yield frames
+
+    def _iter_lsbs(self, wav: wave.Wave_read, count: int, carry: np.ndarray,
+                   depth: int = 1) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """
+        Lazily read the low bits of the next samples of an open WAV file in bounded chunks.
+
+        Args:
+            wav: WAV file opened for reading
+            count: Number of bits to read
+            carry: Samples already read from the file but not consumed yet
+            depth: Bits stored per sample
+
+        Yields:
+            tuple: (bits, carry) per chunk; carry holds the samples read past the bits so far
+        """
+        nchannels = wav.getnchannels()
+        sampwidth = wav.getsampwidth()
+        lanes = AudioSampleExtractor.lanes(nchannels, self.channel)
+        remaining = count
+        used = min(BitPlaneEngine.samples_for(count, depth), carry.size)
+        if used:
+            bits = BitPlaneEngine.extract(carry, min(remaining, used * depth), 0, depth)
+            remaining -= bits.size
+            yield bits, carry[used:]
+        if remaining <= 0:
+            return
+        # Only read whole frames, and never more than the payload needs
+        chunks = self._iter_frames(wav, -(-BitPlaneEngine.samples_for(remaining, depth) // lanes))
+        if self.threads > 1:
+            chunks = prefetch(chunks)
+        for frames in chunks:
+            samples_needed = BitPlaneEngine.samples_for(remaining, depth)
+            samples = AudioSampleExtractor.view(frames, sampwidth, nchannels, self.channel)
+            take = min(samples_needed, samples.size)
+            bits = BitPlaneEngine.extract(samples, min(remaining, take * depth), 0, depth)
+            remaining -= bits.size
+            yield bits, samples[take:]
+
+    def _read_lsbs(self, wav: wave.Wave_read, count: int, carry: np.ndarray,
+                   depth: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Read the next count bits (depth per sample) of an open WAV file.
+
+        Returns:
+            tuple: (bits, carry) where carry holds the samples read past count
+        """
+        chunks = []
+        for bits, carry in self._iter_lsbs(wav, count, carry, depth):
+            chunks.append(bits)
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8), carry
+
+    def _embed(self, samples: np.ndarray, message: str) -> bool:
+        """
+        Embed the length header and the message bits into a writable sample view, in place.
+
+        Args:
+            samples: Writable 1-D view of the samples that may carry bits
+            message: Text message to hide
+
+        Returns:
+            bool: True if the message fit and was embedded, False otherwise
+        """
+        return self._embed_bits(samples, self._message_bytes(message))
+
+    def _message_bytes(self, message: str) -> bytes:
+        """
+        Encode a text message; the container header records its exact length, so no delimiter is needed.
+        """
+        with StegMetrics.stage("payload") as st:
+            payload = message.encode("utf-8")
+            st.nbytes = len(payload)
+        return payload
+
+    def _embed_bits(self, samples: np.ndarray, payload: bytes, binary: bool = False,
+                    cleared: np.ndarray | None = None) -> bool:
+        """
+        Embed the container header and the payload into a writable sample view, in place.
+
+        Args:
+            samples: Writable 1-D view of the samples that may carry bits
+            payload: Bytes to hide
+            binary: The payload is a PayloadCodec blob (recorded in the container flags)
+            cleared: The same samples with their bits_per_sample low bits already cleared (see CoverCache)
+
+        Returns:
+            bool: True if the payload fit and was embedded, False otherwise
+        """
+        logger.debug("Sample size: %d", samples.size)
+        depth = self.bits_per_sample
+
+        # Check the message + header > max capacity of the audio
+        msg_len = len(payload) * 8
+        if not self._fits(msg_len, samples.size):
+            return False
+
+        # Container header first (1 bit per sample): length, bits per sample and CRC32
+        header_bits = ContainerHeader.pack(payload, depth, binary)
+        logger.debug("Encoding message length: %d at %d bits per sample", msg_len, depth)
+
+        with StegMetrics.stage("embed", msg_len // 8):
+            layout = self._layout(samples.size)
+            layout.embed(samples, header_bits, 0)
+            layout.embed(samples, np.unpackbits(np.frombuffer(payload, dtype=np.uint8)), CONTAINER_BITS, depth,
+                         cleared)
+        return True
+
+    def _fits(self, msg_len: int, n_samples: int) -> bool:
+        """
+        Check that msg_len bits fit in n_samples samples after the header, logging an error otherwise.
+        """
+        capacity = min(max(0, n_samples - CONTAINER_BITS) * self.bits_per_sample, MAX_PAYLOAD_BITS)
+        if msg_len > capacity:
+            logger.error("Message too large for audio. Needs %d bits, audio has %d bits at %d bits per sample.",
+                         msg_len, capacity, self.bits_per_sample)
+            return False
+        return True
+
+    def encode(self, audio_path: AudioSource, message: str, output_path: str | BinaryIO) -> bool:
         """
         Hide a message in an audio using LSB steganography.
 
+        Args:
+            audio_path: Path to the input WAV file (or WAV bytes / binary file object)
+            message: Text message to hide
+            output_path: Path (or writable binary file object) to save the steganographic audio (.wav)
+
+        Returns:
+            bool: True if encoding was successful, False otherwise
+        """
+        try:
+            return self._encode_bits(audio_path, self._message_bytes(message), output_path)
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return False
+
+    def _encode_bits(self, audio_path: AudioSource, payload: bytes, output_path: str | BinaryIO,
+                     binary: bool = False) -> bool:
+        """
+        Load a WAV, embed the payload and write the steganographic WAV.
+        """
+        cleared = None
+        # Load the audio into a writable buffer viewed as samples
+        with StegMetrics.stage("load") as st:
+            if self.cache is not None and isinstance(audio_path, str):
+                cover = self.cache.audio(audio_path)
+                # A private copy: the cached frames stay untouched
+                params, frames = cover.params, bytearray(cover.data)
+                samples = cover.samples(frames, self.channel)
+                plane = self.cache.cleared(cover, self.bits_per_sample)
+                if plane is not None:
+                    cleared = cover.samples(plane, self.channel)
+            else:
+                audio_extractor = AudioSampleExtractor(audio_path, self.channel)
+                audio_extractor.load()
+                params, frames, samples = audio_extractor.params, audio_extractor.frames, audio_extractor.samples
+            st.nbytes = len(frames)
+
+        # samples is a view of the loaded frame buffer, so this patches the frames directly
+        if not self._embed_bits(samples, payload, binary, cleared):
+            return False
+
+        with StegMetrics.stage("save", len(frames)):
+            with wave.open(output_path, 'wb') as out:
+                out.setparams(params)
+                out.writeframes(frames)
+        logger.info("Message successfully hidden in %s", output_path)
+        return True
+
+    def encode_payload(self, audio_path: AudioSource, data: bytes, output_path: str | BinaryIO,
+                       codec: str = "none", level: int | None = None) -> bool:
+        """
+        Hide arbitrary bytes in an audio, optionally compressed.
+
+        Args:
+            audio_path: Path to the input WAV file (or WAV bytes / binary file object)
+            data: Binary payload to hide
+            output_path: Path (or writable binary file object) to save the steganographic audio (.wav)
+            codec: Compression codec (none, zlib, lzma or zstd), recorded in the payload header
+            level: Codec-specific compression level
+
+        Returns:
+            bool: True if encoding was successful, False otherwise
+        """
+        try:
+            with StegMetrics.stage("payload") as st:
+                packed = PayloadCodec.pack(data, codec, level)
+                st.nbytes = len(packed)
+            logger.debug("Payload: %d bytes, %d bytes packed with %s", len(data), len(packed), codec)
+            return self._encode_bits(audio_path, packed, output_path, binary=True)
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return False
+
+    def encode_to_bytes(self, audio: AudioSource, message: str) -> bytes | None:
+        """
+        Hide a message in an audio and return the WAV file bytes, without touching the filesystem.
+
+        Args:
+            audio: Input WAV (path, bytes or binary file object)
+            message: Text message to hide
+
+        Returns:
+            bytes: Steganographic WAV file, or None if encoding failed
+        """
+        buf = io.BytesIO()
+        if not self.encode(audio, message, buf):
+            return None
+        return buf.getvalue()
+
+    def encode_samples(self, samples: np.ndarray, message: str) -> np.ndarray | None:
+        """
+        Hide a message in an array of integer PCM samples.
+
+        Args:
+            samples: Integer samples, 1-D (interleaved) or shaped (frames, channels); a channel
+                set in the constructor needs the latter
+            message: Text message to hide
+
+        Returns:
+            np.ndarray: Steganographic copy of samples, or None if encoding failed
+        """
+        try:
+            stego = np.array(samples, copy=True)
+            if not self._embed(self._samples_view(stego), message):
+                return None
+            return stego
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return None
+
+    def _samples_view(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Flat view of the samples carrying bits: the configured channel of a (frames, channels) array,
+        or every sample of an interleaved 1-D array (or of a 2-D array when no channel is set).
+
+        Raises:
+            ValueError: If the samples are not integers, or a channel is set for 1-D samples, whose
+                channel count is unknown
+        """
+        if not np.issubdtype(samples.dtype, np.integer):
+            raise ValueError("Samples must be integer PCM values")
+        if self.channel is None:
+            return samples.reshape(-1)
+        if samples.ndim != 2:
+            raise ValueError("A channel can only be selected in samples shaped (frames, channels)")
+        return samples[:, self.channel]
+
+    @staticmethod
+    def _find_data_chunk(audio_path: str) -> tuple[int, int, int, int]:
+        """
+        Walk the RIFF chunks of a WAV file to locate the PCM sample data.
+
+        Args:
+            audio_path: Path to the WAV file
+
+        Returns:
+            tuple: (data offset, data size in bytes, channels, sample width in bytes)
+        """
+        file_size = os.path.getsize(audio_path)
+        fmt = None
+        with open(audio_path, 'rb') as f:
+            riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError("Not a RIFF/WAVE file")
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError("WAV file has no data chunk")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt = struct.unpack('<HHIIHH', f.read(16))
+                    # Only plain PCM (1), like the wave module the other paths read through
+                    if fmt[0] != 1:
+                        raise ValueError(f"Unsupported WAV format tag {fmt[0]:#06x}, expected PCM")
+                    f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError("WAV data chunk found before fmt chunk")
+                    offset = f.tell()
+                    # Streaming writers may leave a placeholder size
+                    size = min(chunk_size, file_size - offset)
+                    return offset, size, fmt[1], (fmt[5] + 7) // 8
+                else:
+                    # Chunks are padded to an even number of bytes
+                    f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    def encode_mmap(self, audio_path: str, message: str, output_path: str | None = None) -> bool:
+        """
+        Hide a message in an audio by patching only the payload samples of a memory-mapped WAV.
+
+        The input is copied to output_path (or modified in place when output_path is None)
+        and only the 112 + ceil(len(message bits) / bits_per_sample) payload samples are rewritten:
+        the first ones, or the keyed positions when a key is set.
+
         Args:
             audio_path: Path to the input WAV file
             message: Text message to hide
-            output_path: Path to save the steganographic audio (.wav)
+            output_path: Path to save the steganographic audio (.wav), None to modify audio_path
 
         Returns:
             bool: True if encoding was successful, False otherwise
         """
         try:
-            # Load the audio
-            wav = wave.open(audio_path, 'rb')
-            params = wav.getparams()
-            frames = wav.readframes(params.nframes)
-            samples = np.frombuffer(frames, dtype=np.int16)
-            wav.close()
-
-            print(f"Sample size: {samples.size}")
-
-            # Convert the hidden message to bits
-            text_extractor = TextBitExtractor(delimiter=self.delimiter)
-            message_bits = text_extractor.encode_text_to_bits(text_extractor, message)
-
-            # Check the message + length > max capacity of the image
-            if len(message_bits) + 32 > samples.size:
-                print(
-                    f"Error: Message too large for image. Needs {len(message_bits)} bits, audio has {samples.size} bits.")
-                return False
+            offset, size, nchannels, sampwidth = self._find_data_chunk(audio_path)
+            block_align = nchannels * sampwidth
+            lanes = AudioSampleExtractor.lanes(nchannels, self.channel)
+            n_samples = (size // block_align) * lanes
+            logger.debug("Sample size: %d", n_samples)
 
-            # Encode message length first (32 bits) for length
-            msg_len = len(message_bits)
-            len_bits = format(msg_len, '032b')
-            print(f"Encoding message length: {msg_len}")
+            payload = self._message_bytes(message)
 
-            stego = samples.copy()
-            # Encode length
-            for i in range(32):
-                # Clear LSB and set it to the current bit of the length
-                stego[i] = (stego[i] & 0xFE) | int(len_bits[i])
+            # Check the message + header > max capacity of the audio
+            msg_len = len(payload) * 8
+            if not self._fits(msg_len, n_samples):
+                return False
+
+            depth = self.bits_per_sample
+            header_bits = ContainerHeader.pack(payload, depth)
+            logger.debug("Encoding message length: %d at %d bits per sample", msg_len, depth)
 
-            for i in range(len(message_bits)):
-                if i + 32 < stego.size:
-                    # Clear LSB and set it to the current bit of the length
-                    stego[i + 32] = (stego[i + 32] & 0xFE) | message_bits[i]
+            if output_path is None:
+                output_path = audio_path
+            elif not (os.path.exists(output_path) and os.path.samefile(audio_path, output_path)):
+                with StegMetrics.stage("save", os.path.getsize(audio_path)):
+                    shutil.copyfile(audio_path, output_path)
 
-            out = wave.open(output_path, 'wb')
-            out.setparams(params)
-            out.writeframes(stego.tobytes())
-            out.close()
+            # Map only the frames that carry the header and the message (all of them when scattered;
+            # the OS still only pages in and writes back the touched ones)
+            if self.key is None:
+                n_frames = -(-(CONTAINER_BITS + BitPlaneEngine.samples_for(msg_len, depth)) // lanes)
+            else:
+                n_frames = size // block_align
+            with StegMetrics.stage("embed", msg_len // 8):
+                raw = np.memmap(output_path, dtype=np.uint8, mode='r+', offset=offset, shape=(n_frames * block_align,))
+                stego = AudioSampleExtractor.view(raw, sampwidth, nchannels, self.channel)
+                layout = self._layout(n_samples)
+                layout.embed(stego, header_bits, 0)
+                layout.embed(stego, np.unpackbits(np.frombuffer(payload, dtype=np.uint8)), CONTAINER_BITS, depth)
+                raw.flush()
+                del stego, raw
 
+            logger.info("Message successfully hidden in %s", output_path)
             return True
         except Exception as e:
-            print(f"Error during encoding :{str(e)}")
+            logger.error("Error during encoding: %s", e)
             return False
 
+    def _read_header(self, wav: wave.Wave_read) -> tuple[ContainerHeader, np.ndarray] | None:
+        """
+        Read and validate the header (container, or legacy 32-bit length) of an open WAV file.
 
-    def decode(self, audio_path: str) -> str | None:
+        Returns:
+            tuple: (header, carry samples), or None if the header is invalid
+        """
+        params = wav.getparams()
+        total_samples = params.nframes * AudioSampleExtractor.lanes(params.nchannels, self.channel)
+
+        bits, carry = self._read_lsbs(wav, HEADER_BITS, np.empty(0, dtype=np.uint8))
+        if ContainerHeader.is_container(bits):
+            rest, carry = self._read_lsbs(wav, CONTAINER_BITS - HEADER_BITS, carry)
+            header = ContainerHeader.parse(np.concatenate((bits, rest)))
+        else:
+            header = ContainerHeader.parse_legacy(bits)
+        logger.debug("Decoding message length: %d at %d bits per sample", header.length, header.depth)
+
+        # Validate message length
+        if not header.fits(total_samples):
+            logger.error("Invalid message length detected. Audio may not contain hidden data.")
+            return None
+        return header, carry
+
+    def _read_flat_header(self, flat: np.ndarray) -> tuple[ContainerHeader, BitPlaneEngine | KeyedScatter | ThreadedLayout] | None:
+        """
+        Read and validate the header of an in-memory (or memory-mapped) sample view.
+
+        Returns:
+            tuple: (header, bit layout), or None if the header is invalid
+        """
+        layout = self._layout(flat.size)
+        header = ContainerHeader.read(flat, layout)
+        logger.debug("Decoding message length: %d at %d bits per sample", header.length, header.depth)
+
+        # Validate message length
+        if not header.fits(flat.size):
+            logger.error("Invalid message length detected. Audio may not contain hidden data.")
+            return None
+        return header, layout
+
+    def _keyed_samples(self, audio_path: AudioSource) -> np.ndarray:
+        """
+        Read-only view of every usable sample for keyed decoding, which needs random access.
+
+        Paths are memory-mapped, so only the pages holding payload samples are read;
+        in-memory and file object sources are loaded whole.
+        """
+        if isinstance(audio_path, str):
+            offset, size, nchannels, sampwidth = self._find_data_chunk(audio_path)
+            raw = np.memmap(audio_path, dtype=np.uint8, mode='r', offset=offset, shape=(size,))
+            return AudioSampleExtractor.view(raw, sampwidth, nchannels, self.channel)
+        audio_extractor = AudioSampleExtractor(audio_path, self.channel)
+        audio_extractor.load()
+        return audio_extractor.samples
+
+    def decode(self, audio_path: AudioSource) -> str | None:
         """
         Extract a hidden message from a steganographic audio.
 
         Args:
-            audio_path: Path to the steganographic audio
+            audio_path: Path to the steganographic audio (or WAV bytes / binary file object)
 
         Returns:
             str : Extracted message or None if extraction failed
         """
         try:
-            # Load the audio
-            wav = wave.open(audio_path, 'rb')
-            params = wav.getparams()
-            frames = wav.readframes(params.nframes)
-            samples = np.frombuffer(frames, dtype=np.int16)
-            wav.close()
-
-            len_bits = ""
-            for i in range(32):
-                len_bits += str(samples[i] & 1)
-
-            print(f"Extracted length bits: {len_bits}")
-            msg_len = int(len_bits, 2)
-            print(f"Decoding message length: {msg_len}")
-
-            # Validate message length
-            if msg_len <= 0 or msg_len > samples.size - 32:
-                print("Error: Invalid message length detected. Audio may not contain hidden data.")
-                return None
+            if self.key is not None:
+                flat = self._keyed_samples(audio_path)
+                result = self._read_flat_header(flat)
+                if result is None:
+                    return None
+                header, layout = result
+                with StegMetrics.stage("extract") as st:
+                    bit_chunks = layout.extract_chunks(flat, header.length, header.offset, depth=header.depth)
+                    text = self._bits_to_text(bit_chunks, header)
+                    st.nbytes = len(text)
+                return text
+
+            # Stream the audio: only the header and the payload samples are read
+            with AudioSampleExtractor.open(audio_path) as wav:
+                result = self._read_header(wav)
+                if result is None:
+                    return None
+                header, carry = result
+
+                # Extract message bits; legacy reading stops at the chunk holding the delimiter
+                with StegMetrics.stage("extract") as st:
+                    bit_chunks = (bits for bits, _ in self._iter_lsbs(wav, header.length, carry, header.depth))
+                    text = self._bits_to_text(bit_chunks, header)
+                    st.nbytes = len(text)
+                return text
 
-            # Extract message bits
-            extracted_bits = []
-            for i in range(msg_len):
-                if i + 32 < samples.size:
-                    extracted_bits.append(samples[i + 32] & 1)
+        except Exception as e:
+            logger.error("Error during decoding: %s", e)
+            return None
+
+    def decode_payload(self, audio_path: AudioSource) -> bytes | None:
+        """
+        Extract a binary payload hidden with encode_payload.
 
-            # Convert bits to text
-            decoded_text = TextGenerator.decode_bits_to_text(extracted_bits)
+        Args:
+            audio_path: Path to the steganographic audio (or WAV bytes / binary file object)
 
-            # Remove delimiter
-            if self.delimiter in decoded_text:
-                decoded_text = decoded_text.split(self.delimiter)[0]
-                return decoded_text
+        Returns:
+            bytes: The original (decompressed) payload, or None if extraction failed
+        """
+        try:
+            if self.key is not None:
+                flat = self._keyed_samples(audio_path)
+                result = self._read_flat_header(flat)
+                if result is None:
+                    return None
+                header, layout = result
+                with StegMetrics.stage("extract", header.length // 8):
+                    bits = layout.extract(flat, header.length, header.offset, header.depth)
             else:
-                print("Warning: Delimiter not found. Message might be incomplete or corrupted.")
-                return decoded_text
+                with AudioSampleExtractor.open(audio_path) as wav:
+                    result = self._read_header(wav)
+                    if result is None:
+                        return None
+                    header, carry = result
+                    with StegMetrics.stage("extract", header.length // 8):
+                        bits, _ = self._read_lsbs(wav, header.length, carry, header.depth)
+            return PayloadCodec.unpack(header.check(np.packbits(bits).tobytes()))
 
         except Exception as e:
-            print(f"Error during decoding :{str(e)}")
+            logger.error("Error during decoding: %s", e)
             return None
+
+    def decode_samples(self, samples: np.ndarray) -> str | None:
+        """
+        Extract a hidden message from an array of integer PCM samples.
+
+        Args:
+            samples: Integer samples, 1-D (interleaved) or shaped (frames, channels); a channel
+                set in the constructor needs the latter
+
+        Returns:
+            str : Extracted message or None if extraction failed
+        """
+        try:
+            flat = self._samples_view(np.asarray(samples))
+            result = self._read_flat_header(flat)
+            if result is None:
+                return None
+            header, layout = result
+            return self._bits_to_text(layout.extract_chunks(flat, header.length, header.offset, depth=header.depth),
+                                      header)
+        except Exception as e:
+            logger.error("Error during decoding: %s", e)
+            return None
+
+    def _bits_to_text(self, bit_chunks: Iterable[np.ndarray], header: ContainerHeader) -> str:
+        """
+        Convert message bit chunks to text: all of them, checked against the CRC32, for a container;
+        up to the delimiter for legacy audio.
+        """
+        if not header.legacy:
+            chunks = list(bit_chunks)
+            bits = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8)
+            return header.text(np.packbits(bits).tobytes())
+        decoded_text, found = TextGenerator.decode_until_delimiter(bit_chunks, self.delimiter)
+        if not found and self.delimiter:
+            logger.warning("Delimiter not found. Message might be incomplete or corrupted.")
+        return decoded_text
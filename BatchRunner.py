@@ -0,0 +1,203 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Union
+
+import StegMetrics
+from AudioSteganography import AudioSteganography
+from CoverCache import CoverCache
+from ImageInImageSteganography import ImageInImageSteganography
+from ImageSteganography import ImageSteganography
+
+KINDS = ("image-text", "image-image", "audio-text")
+MODES = ("encode", "decode")
+IMAGE_EXTENSIONS = (".png", ".bmp", ".tif", ".tiff", ".npy")
+AUDIO_EXTENSIONS = (".wav",)
+
+
+# Cover cache of this worker process, installed by BatchRunner when enabled
+_cover_cache: Union[CoverCache, None] = None
+
+
+def _int_or_none(value) -> Union[int, None]:
+    return None if value in (None, "") else int(value)
+
+
+def _init_worker(cache_bytes: int) -> None:
+    global _cover_cache
+    _cover_cache = CoverCache(cache_bytes) if cache_bytes else None
+
+
+def run_job(job: Dict[str, str]) -> Dict[str, object]:
+    """
+    Run a single encode/decode job. Executed inside the worker processes.
+
+    Args:
+        job: Dict with kind, mode, input, payload, output and optional bit_depth/channel/bits_per_sample/key/band_rows
+
+    Returns:
+        dict: The job plus ok, seconds, bytes, error, per-stage metrics and cover_cache (hit, miss
+            or None) fields
+    """
+    result = dict(job)
+    start = time.perf_counter()
+    ok = False
+    error = None
+    record = None
+    cache = _cover_cache
+    lookups = (cache.hits, cache.misses) if cache is not None else None
+    try:
+        kind, mode = job["kind"], job["mode"]
+        src, payload, out = job["input"], job.get("payload", ""), job["output"]
+        channel = _int_or_none(job.get("channel"))
+        bits_per_sample = _int_or_none(job.get("bits_per_sample")) or 1
+        key = job.get("key") or None
+        # The mode classes report failures through logging; keep the last error for the result
+        with StegMetrics.capture_errors() as last_error, StegMetrics.collect() as record:
+            if kind == "image-text":
+                steg = ImageSteganography(bits_per_sample=bits_per_sample, key=key, cache=cache)
+                if mode == "encode":
+                    ok = steg.encode(src, payload, out)
+                else:
+                    hidden = steg.decode(src)
+                    if hidden is not None:
+                        with open(out, "w", encoding="utf-8") as f:
+                            f.write(hidden)
+                        ok = True
+            elif kind == "image-image":
+                bit_depth = _int_or_none(job.get("bit_depth"))
+                steg = ImageInImageSteganography(bit_depth or 4, channel or 0,
+                                                 band_rows=_int_or_none(job.get("band_rows")), cache=cache)
+                ok = steg.encode(src, payload, out) if mode == "encode" else steg.decode(src, out)
+            elif kind == "audio-text":
+                steg = AudioSteganography(channel=channel, bits_per_sample=bits_per_sample, key=key, cache=cache)
+                if mode == "encode":
+                    ok = steg.encode(src, payload, out)
+                else:
+                    hidden = steg.decode(src)
+                    if hidden is not None:
+                        with open(out, "w", encoding="utf-8") as f:
+                            f.write(hidden)
+                        ok = True
+            else:
+                raise ValueError(f"Unknown kind: {kind}")
+        if not ok:
+            error = last_error.message or "failed"
+    except Exception as e:
+        error = str(e)
+    result["ok"] = bool(ok)
+    result["seconds"] = time.perf_counter() - start
+    result["bytes"] = os.path.getsize(job["input"]) if os.path.exists(job["input"]) else 0
+    result["error"] = error
+    result["stages"] = record.stages if record is not None else {}
+    result["cover_cache"] = None
+    if lookups is not None:
+        if cache.hits > lookups[0]:
+            result["cover_cache"] = "hit"
+        elif cache.misses > lookups[1]:
+            result["cover_cache"] = "miss"
+    return result
+
+
+class BatchRunner:
+    """
+    BatchRunner class that dispatches steganography jobs across a process pool.
+    """
+
+    def __init__(self, workers: Union[int, None] = None, cover_cache_bytes: int = 0):
+        """
+        :param workers: Number of worker processes (defaults to the CPU count).
+        :param cover_cache_bytes: Memory budget of the CoverCache of each worker (0 disables it).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.cover_cache_bytes = cover_cache_bytes
+
+    @staticmethod
+    def load_manifest(path: str) -> List[Dict[str, str]]:
+        """
+        Read jobs from a CSV (with a header row) or JSONL manifest.
+
+        Each job needs kind (image-text, image-image or audio-text), mode (encode or decode),
+        input and output. payload holds the message or secret image path for encode jobs.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.endswith((".jsonl", ".json")):
+                jobs = [json.loads(line) for line in f if line.strip()]
+            else:
+                jobs = list(csv.DictReader(f))
+        for i, job in enumerate(jobs):
+            if job.get("kind") not in KINDS or job.get("mode") not in MODES:
+                raise ValueError(f"Manifest entry {i}: kind must be one of {KINDS} and mode one of {MODES}")
+            if not job.get("input") or not job.get("output"):
+                raise ValueError(f"Manifest entry {i}: input and output are required")
+        return jobs
+
+    @staticmethod
+    def jobs_from_directory(directory: str, kind: str, mode: str, out_dir: str,
+                            payload: str = "", **options) -> List[Dict[str, str]]:
+        """
+        Build one job per cover (encode) or stego file (decode) found in a directory.
+
+        Args:
+            directory: Directory to scan (not recursive)
+            kind: image-text, image-image or audio-text
+            mode: encode or decode
+            out_dir: Directory receiving the outputs, named after the inputs
+            payload: Message (text kinds) or secret image path (image-image) used for every encode job
+            options: Extra job fields such as bit_depth, channel, bits_per_sample, key or band_rows
+        """
+        extensions = AUDIO_EXTENSIONS if kind == "audio-text" else IMAGE_EXTENSIONS
+        os.makedirs(out_dir, exist_ok=True)
+        jobs = []
+        for name in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in extensions:
+                continue
+            if mode == "decode" and kind != "image-image":
+                out_name = stem + ".txt"
+            elif kind == "audio-text":
+                out_name = name
+            else:
+                out_name = stem + ".png"
+            job = {"kind": kind, "mode": mode, "input": os.path.join(directory, name),
+                   "payload": payload, "output": os.path.join(out_dir, out_name)}
+            job.update({k: v for k, v in options.items() if v is not None})
+            jobs.append(job)
+        return jobs
+
+    def run(self, jobs: Iterable[Dict[str, str]]) -> Iterator[Dict[str, object]]:
+        """
+        Run the jobs on the process pool, yielding results in job order.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        if self.workers == 1:
+            # Skip the pool entirely; useful for debugging and tiny batches
+            _init_worker(self.cover_cache_bytes)
+            yield from map(run_job, jobs)
+            return
+        # Hand out jobs in chunks so tiny jobs do not pay one IPC round trip each
+        chunksize = max(1, min(64, len(jobs) // (self.workers * 4)))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.cover_cache_bytes,)) as pool:
+            yield from pool.map(run_job, jobs, chunksize=chunksize)
+
+    @staticmethod
+    def summarize(results: List[Dict[str, object]], elapsed: float) -> Dict[str, object]:
+        """
+        Aggregate per-job results into counts and throughput.
+        """
+        total_bytes = sum(r["bytes"] for r in results)
+        ok = sum(1 for r in results if r["ok"])
+        return {
+            "jobs": len(results),
+            "ok": ok,
+            "failed": len(results) - ok,
+            "seconds": elapsed,
+            "jobs_per_second": len(results) / elapsed if elapsed else 0.0,
+            "mb_per_second": total_bytes / 1e6 / elapsed if elapsed else 0.0,
+            "cover_cache_hits": sum(1 for r in results if r.get("cover_cache") == "hit"),
+        }
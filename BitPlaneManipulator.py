@@ -0,0 +1,155 @@
+import numpy as np
+from typing import Iterator
+
+# Length header of the text modes: 32 bits at one bit per sample. The top 2 bits hold
+# bits_per_sample - 1 and the low 30 bits the payload length in bits, so headers written
+# before bits_per_sample existed read back as 1 bit per sample.
+HEADER_BITS = 32
+MAX_PAYLOAD_BITS = (1 << 30) - 1
+MAX_DEPTH = 4
+
+
+class BitPlaneEngine:
+    """
+    Vectorized helpers to read and write the least significant bit plane of a flat sample array.
+    """
+
+    @staticmethod
+    def int_to_bits(value: int, width: int = 32) -> np.ndarray:
+        """
+        Convert an unsigned integer to a fixed-width array of bits (MSB first).
+
+        Args:
+            value: Integer to convert
+            width: Number of bits to produce (multiple of 8)
+
+        Returns:
+            np.ndarray: uint8 array of 0s and 1s
+        """
+        raw = np.frombuffer(int(value).to_bytes(width // 8, 'big'), dtype=np.uint8)
+        return np.unpackbits(raw)
+
+    @staticmethod
+    def bits_to_int(bits: np.ndarray) -> int:
+        """
+        Convert an array of bits (MSB first) back to an unsigned integer.
+
+        Args:
+            bits: Array of 0s and 1s
+
+        Returns:
+            int: The decoded value
+        """
+        bits = np.asarray(bits, dtype=np.uint8)
+        pad = (-bits.size) % 8
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> pad
+
+    @staticmethod
+    def parse_header(bits: np.ndarray) -> tuple[int, int]:
+        """
+        Parse the 32-bit length header written by the text modes before the container header.
+
+        Returns:
+            tuple: (payload length in bits, bits per sample)
+        """
+        value = BitPlaneEngine.bits_to_int(bits)
+        return value & MAX_PAYLOAD_BITS, (value >> 30) + 1
+
+    @staticmethod
+    def samples_for(count: int, depth: int = 1) -> int:
+        """
+        Number of samples needed to hold count bits at depth bits per sample.
+        """
+        return -(-count // depth)
+
+    @staticmethod
+    def to_values(bits: np.ndarray, depth: int, dtype: np.dtype) -> np.ndarray:
+        """
+        Fold bits into per-sample values of depth bits each (MSB first), zero-padding the last one.
+        """
+        if depth == 1:
+            return np.asarray(bits, dtype=dtype)
+        bits = np.asarray(bits, dtype=np.uint8)
+        pad = (-bits.size) % depth
+        if pad:
+            bits = np.concatenate((bits, np.zeros(pad, dtype=np.uint8)))
+        groups = bits.reshape(-1, depth)
+        values = groups[:, 0].copy()
+        for i in range(1, depth):
+            values <<= 1
+            values |= groups[:, i]
+        return values.astype(dtype, copy=False)
+
+    @staticmethod
+    def from_values(values: np.ndarray, count: int, depth: int) -> np.ndarray:
+        """
+        Reverse to_values(): spread the depth low bits of each value into count bits.
+        """
+        if depth == 1:
+            return (values & 1).astype(np.uint8)
+        values = (values & ((1 << depth) - 1)).astype(np.uint8)
+        # Spread each value over depth columns (MSB first); one pass per bit beats broadcasting
+        bits = np.empty((values.size, depth), dtype=np.uint8)
+        for i in range(depth):
+            np.right_shift(values, depth - 1 - i, out=bits[:, i])
+        bits &= 1
+        return bits.reshape(-1)[:count]
+
+    @staticmethod
+    def embed(flat: np.ndarray, bits: np.ndarray, offset: int = 0, depth: int = 1,
+              cleared: np.ndarray | None = None) -> None:
+        """
+        Overwrite the depth low bits of flat[offset:offset + ceil(len(bits) / depth)] in place.
+
+        Args:
+            flat: 1-D integer array (or view) to modify
+            bits: Array of 0s and 1s to store, most significant bit of each sample first
+            offset: Index of the first element to modify
+            depth: Bits stored per element (1-4)
+            cleared: Same samples as flat with the depth low bits already cleared (see CoverCache);
+                each element is then written in a single pass
+        """
+        values = BitPlaneEngine.to_values(bits, depth, flat.dtype)
+        region = flat[offset:offset + values.size]
+        if cleared is not None:
+            np.bitwise_or(cleared[offset:offset + values.size], values, out=region)
+            return
+        region &= ~flat.dtype.type((1 << depth) - 1)
+        region |= values
+
+    @staticmethod
+    def extract(flat: np.ndarray, count: int, offset: int = 0, depth: int = 1) -> np.ndarray:
+        """
+        Read count bits from the depth low bits of the elements starting at flat[offset].
+
+        Args:
+            flat: 1-D integer array (or view) to read from
+            count: Number of bits to read
+            offset: Index of the first element to read
+            depth: Bits stored per element (1-4)
+
+        Returns:
+            np.ndarray: uint8 array of 0s and 1s
+        """
+        values = flat[offset:offset + BitPlaneEngine.samples_for(count, depth)]
+        return BitPlaneEngine.from_values(values, count, depth)
+
+    @staticmethod
+    def extract_chunks(flat: np.ndarray, count: int, offset: int = 0, chunk: int = 1 << 19,
+                       depth: int = 1) -> Iterator[np.ndarray]:
+        """
+        Lazily read count bits starting at flat[offset], chunk bits at a time.
+
+        Args:
+            flat: 1-D integer array (or view) to read from
+            count: Number of bits to read
+            offset: Index of the first element to read
+            chunk: Maximum number of bits per yielded array (rounded down to whole elements)
+            depth: Bits stored per element (1-4)
+
+        Yields:
+            np.ndarray: uint8 arrays of 0s and 1s
+        """
+        chunk = max(depth, chunk - chunk % depth)
+        for start in range(0, count, chunk):
+            yield BitPlaneEngine.extract(flat, min(chunk, count - start), offset + start // depth, depth)
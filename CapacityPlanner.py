@@ -0,0 +1,174 @@
+import bisect
+import json
+import os
+import wave
+from typing import Dict, List, Union
+
+import numpy as np
+from PIL import Image
+
+from BitPlaneManipulator import MAX_DEPTH, MAX_PAYLOAD_BITS
+from StegContainer import CONTAINER_BITS
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".tif", ".tiff", ".npy")
+AUDIO_EXTENSIONS = (".wav",)
+
+
+class CapacityPlanner:
+    """
+    CapacityPlanner class that sizes covers from their file headers, without decoding pixels or samples.
+    """
+
+    @staticmethod
+    def image(path: str) -> Dict[str, object]:
+        """
+        Capacity of an image cover. Only the header is read (PIL opens images lazily, .npy files are mapped).
+
+        Returns:
+            dict: width, height, mode and a capacity dict of payload bits per mode key
+        """
+        if path.lower().endswith(".npy"):
+            # Raw arrays: the shape is in the .npy header, the data stays on disk
+            arr = np.load(path, mmap_mode='r')
+            h, w = arr.shape[:2]
+            mode = "RGB" if arr.ndim == 3 else "L"
+            del arr
+        else:
+            with Image.open(path) as img:
+                w, h = img.size
+                mode = img.mode
+        # Every mode is converted to RGB before embedding, so there are always 3 channels
+        values = w * h * 3
+        capacity = CapacityPlanner._text_capacity("image-text", values)
+        for bit_depth in range(1, 5):
+            # The image-in-image header needs 64 pixels in the first row; the channel only moves it
+            capacity[f"image-image/bit_depth={bit_depth}"] = values * bit_depth if w >= 64 else 0
+        return {"path": path, "type": "image", "width": w, "height": h, "mode": mode, "capacity": capacity}
+
+    @staticmethod
+    def audio(path: str) -> Dict[str, object]:
+        """
+        Capacity of a WAV cover. Only the header is read (getparams).
+
+        Returns:
+            dict: channels, sample width, frame rate, frame count and a capacity dict of payload bits per mode key
+        """
+        with wave.open(path, 'rb') as wav:
+            params = wav.getparams()
+        capacity = CapacityPlanner._text_capacity("audio-text", params.nframes * params.nchannels)
+        for channel in range(params.nchannels):
+            capacity.update(CapacityPlanner._text_capacity(f"audio-text/channel={channel}", params.nframes))
+        return {"path": path, "type": "audio", "channels": params.nchannels, "sampwidth": params.sampwidth,
+                "framerate": params.framerate, "nframes": params.nframes, "capacity": capacity}
+
+    @staticmethod
+    def _text_capacity(key: str, samples: int) -> Dict[str, int]:
+        """
+        Capacities of a text mode over the given number of samples: key for 1 bit per sample
+        and key/bits_per_sample=N for the deeper settings.
+        """
+        capacity = {}
+        for depth in range(1, MAX_DEPTH + 1):
+            bits = min(max(0, samples - CONTAINER_BITS) * depth, MAX_PAYLOAD_BITS)
+            capacity[key if depth == 1 else f"{key}/bits_per_sample={depth}"] = bits
+        return capacity
+
+    @staticmethod
+    def probe(path: str) -> Dict[str, object]:
+        """
+        Capacity of any supported cover, chosen by file extension.
+        """
+        if path.lower().endswith(AUDIO_EXTENSIONS):
+            return CapacityPlanner.audio(path)
+        return CapacityPlanner.image(path)
+
+    @staticmethod
+    def message_bits(message_bytes: int) -> int:
+        """
+        Bits needed by a text message of message_bytes encoded bytes (the container header records
+        the length, so no delimiter is stored).
+        """
+        return message_bytes * 8
+
+
+class CoverIndex:
+    """
+    CoverIndex class that keeps a cached capacity table of a directory of covers.
+
+    Entries are re-probed only when a file's mtime or size changes, and lookups
+    of the smallest fitting cover are a binary search over the sorted capacities.
+    """
+
+    def __init__(self, directory: str, cache_path: Union[str, None] = None):
+        """
+        :param directory: Directory holding the covers (scanned recursively).
+        :param cache_path: JSON file to store the table in (default: .stegtool-capacity.json inside directory).
+        """
+        self.directory = directory
+        self.cache_path = cache_path or os.path.join(directory, ".stegtool-capacity.json")
+        self.entries: Dict[str, Dict[str, object]] = {}
+        self._sorted: Dict[str, List[tuple]] = {}
+
+    def build(self) -> "CoverIndex":
+        """
+        Load the cache, probe new or changed covers, drop deleted ones and save the cache.
+        """
+        cached = {}
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding="utf-8") as f:
+                cached = json.load(f)
+
+        entries = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.lower().endswith(IMAGE_EXTENSIONS + AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                entry = cached.get(path)
+                # Tables cached before the container header count a shorter header; re-probe those too
+                if (entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size
+                        or entry.get("header_bits") != CONTAINER_BITS):
+                    try:
+                        entry = CapacityPlanner.probe(path)
+                    except Exception:
+                        # Unreadable or corrupt covers are simply not indexed
+                        continue
+                    entry["mtime_ns"] = st.st_mtime_ns
+                    entry["size"] = st.st_size
+                    entry["header_bits"] = CONTAINER_BITS
+                entries[path] = entry
+
+        self.entries = entries
+        self._sorted = {}
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        return self
+
+    def _table(self, key: str) -> List[tuple]:
+        """
+        Entries holding a capacity for key, sorted by (capacity, path).
+        """
+        if key not in self._sorted:
+            self._sorted[key] = sorted(
+                (entry["capacity"][key], path) for path, entry in self.entries.items() if key in entry["capacity"]
+            )
+        return self._sorted[key]
+
+    def smallest_fitting(self, key: str, payload_bits: int) -> Union[Dict[str, object], None]:
+        """
+        Smallest cover whose capacity for key holds payload_bits.
+
+        Args:
+            key: Capacity key, e.g. image-text, image-text/bits_per_sample=2, audio-text, audio-text/channel=0,
+                image-image/bit_depth=4
+            payload_bits: Bits to embed (excluding the length header)
+
+        Returns:
+            dict: The cover's entry, or None if no cover is large enough
+        """
+        table = self._table(key)
+        i = bisect.bisect_left(table, (payload_bits, ""))
+        if i == len(table):
+            return None
+        return self.entries[table[i][1]]
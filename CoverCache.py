@@ -0,0 +1,182 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Union
+
+import numpy as np
+
+from AudioSampleManipulator import AudioSampleExtractor
+
+
+class CachedCover:
+    """
+    Decoded cover held by CoverCache: RGB pixels (images) or PCM frames (WAV), read-only, plus
+    copies with the low bits of every sample cleared, per bit depth.
+    """
+    __slots__ = ("data", "params", "planes", "uses")
+
+    def __init__(self, data: np.ndarray, params: Union[tuple, None] = None):
+        """
+        :param data: HxWx3 uint8 pixels, or the uint8 frame bytes of a WAV.
+        :param params: WAV parameters (wave._wave_params) for audio covers, None for images.
+        """
+        data.flags.writeable = False
+        self.data = data
+        self.params = params
+        self.planes: Dict[int, np.ndarray] = {}
+        self.uses = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + sum(plane.nbytes for plane in self.planes.values())
+
+    def samples(self, buffer: Union[np.ndarray, bytearray], channel: Union[int, None] = None) -> np.ndarray:
+        """
+        Flat view of the samples of buffer (the cover data, a copy of it or a cleared plane).
+        """
+        if self.params is None:
+            return np.asarray(buffer).reshape(-1)
+        return AudioSampleExtractor.view(buffer, self.params.sampwidth, self.params.nchannels, channel)
+
+    def clear(self, depth: int) -> np.ndarray:
+        """
+        Copy of the data with the depth low bits of every sample cleared.
+        """
+        plane = np.array(self.data)
+        samples = self.samples(plane)
+        samples &= ~samples.dtype.type((1 << depth) - 1)
+        plane.flags.writeable = False
+        return plane
+
+
+class CoverCache:
+    """
+    CoverCache class that keeps recently used covers decoded, for embedding many payloads into the same covers.
+
+    Entries are keyed by path and revalidated against the file mtime and size on every lookup,
+    and the least recently used ones are evicted beyond max_bytes. Pass one instance to several
+    ImageSteganography, ImageInImageSteganography or AudioSteganography objects to share it;
+    lookups are thread-safe.
+
+    A cover's LSB-cleared plane is built when the cover is first reused, so covers used once
+    never pay for it; from then on each payload costs a copy of the cover, the embed and the save.
+    """
+
+    def __init__(self, max_bytes: int = 1 << 30, threads: int = 1):
+        """
+        :param max_bytes: Memory budget of the decoded covers and their cleared planes.
+        :param threads: Threads decoding image covers on a miss (see ImageRowReader).
+        """
+        self.max_bytes = max_bytes
+        self.threads = threads
+        self._entries: "OrderedDict[str, tuple[tuple[int, int], CachedCover]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path: str) -> tuple[int, int]:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def _lookup(self, path: str, loader) -> CachedCover:
+        key = os.path.abspath(path)
+        signature = self._signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cover = entry[1]
+                cover.uses += 1
+                return cover
+            self.misses += 1
+        # Decode outside the lock so other covers stay available meanwhile
+        cover = loader(key)
+        cover.uses = 1
+        with self._lock:
+            stale = self._entries.pop(key, None)
+            if stale is not None:
+                self._bytes -= stale[1].nbytes
+            self._entries[key] = (signature, cover)
+            self._bytes += cover.nbytes
+            self._evict()
+        return cover
+
+    def _evict(self) -> None:
+        # Covers larger than the whole budget are handed out but not kept
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, cover) = self._entries.popitem(last=False)
+            self._bytes -= cover.nbytes
+            self.evictions += 1
+
+    def image(self, path: str) -> CachedCover:
+        """
+        Decoded RGB pixels of an image file.
+        """
+        # Imported here so audio-only users of the cache never load Pillow
+        from ImageRGBManipulator import ImageRGBExtractor
+
+        def load(key: str) -> CachedCover:
+            extractor = ImageRGBExtractor(key, self.threads)
+            extractor.load()
+            return CachedCover(extractor.arr)
+
+        return self._lookup(path, load)
+
+    def audio(self, path: str) -> CachedCover:
+        """
+        Frames and parameters of a WAV file.
+        """
+        def load(key: str) -> CachedCover:
+            extractor = AudioSampleExtractor(key)
+            extractor.load()
+            return CachedCover(np.frombuffer(extractor.frames, dtype=np.uint8), extractor.params)
+
+        return self._lookup(path, load)
+
+    def cleared(self, cover: CachedCover, depth: int) -> Union[np.ndarray, None]:
+        """
+        The cover data with its depth low bits cleared, or None while the cover has been used only once
+        (or when the plane does not fit the budget).
+        """
+        plane = cover.planes.get(depth)
+        if plane is not None or cover.uses < 2:
+            return plane
+        if cover.nbytes + cover.data.nbytes > self.max_bytes:
+            return None
+        plane = cover.clear(depth)
+        with self._lock:
+            if depth not in cover.planes:
+                cover.planes[depth] = plane
+                # Only account for planes of covers still in the cache
+                if any(entry[1] is cover for entry in self._entries.values()):
+                    self._bytes += plane.nbytes
+                    self._evict()
+        return plane
+
+    def clear(self) -> None:
+        """
+        Drop every cover (statistics are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Hit/miss/eviction counts, hit rate and memory held by the cached covers.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
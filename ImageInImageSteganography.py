@@ -1,190 +1,411 @@
-from ImageRGBManipulator import ImageRGBExtractor
-from PIL import Image
+import logging
+import StegMetrics
+from BitPlaneManipulator import BitPlaneEngine
+from CoverCache import CoverCache
+from ImageRGBManipulator import ImageRGBExtractor, ImageRowReader, ImageRowWriter, ImageSource, ImageWriter
+from StegThreads import MIN_SPAN, prefetch, run_spans
+from typing import BinaryIO, Iterable, Iterator
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+
+def _timed_bands(bands: Iterable[tuple[int, np.ndarray]], name: str) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    Pass row bands through, recording the time spent decoding each one as a metrics stage.
+    """
+    bands = iter(bands)
+    while True:
+        with StegMetrics.stage(name) as st:
+            item = next(bands, None)
+            if item is not None:
+                st.nbytes = item[1].nbytes
+        if item is None:
+            return
+        yield item
+
 class ImageInImageSteganography:
     """
     ImageInImageSteganography class that encodes and decodes hidden image in the original image.
     """
-    def __init__(self, bit_depth: int = 4, channel: int = 0):
+    def __init__(self, bit_depth: int = 4, channel: int = 0, writer: ImageWriter | None = None,
+                 band_rows: int | None = None, threads: int = 1, cache: CoverCache | None = None):
         """
         :param channel: Channel to embed the secret image in (0 for red, 1 for green, 2 for blue).
         :param bit_depth: Number of LSBs on the cover to replace with MSBs of the secret (1-4 recommended).
+        :param writer: Output writer for stego and recovered images (default: PNG, or the output file extension).
+        :param band_rows: When set, encode and decode stream the images in bands of this many rows, so
+            memory follows the band size instead of the image size (PNG or NPY output only).
+            The pixels written are identical to whole-image processing (the bytes too for NPY output).
+        :param threads: Threads merging and extracting contiguous row ranges, and decoding the next
+            band while the current one is processed and written. The pixels written are identical.
+        :param cache: Keeps covers given by path decoded between encode calls (revalidated by mtime and size),
+            for hiding many secrets in the same covers. Not used when streaming in row bands.
         """
         self.channel = channel
         if not (1 <= bit_depth <= 4):
             raise ValueError("bit_depth must be between 1 and 4 for imperceptibility.")
         self.bit_depth = bit_depth
+        self.writer = writer or ImageWriter()
+        if band_rows is not None and band_rows < 1:
+            raise ValueError("band_rows must be positive")
+        self.band_rows = band_rows
+        if threads < 1:
+            raise ValueError("threads must be positive")
+        self.threads = threads
+        self.cache = cache
 
-
-    def encode(self, original_img_path: str, secret_img_path: str, output_path : str) -> bool:
+    def _merge(self, cover_img: ImageSource, secret_img: ImageSource) -> np.ndarray | None:
         """
-        Hide a secret image in the original image.
+        Load both images and return a copy of the cover with the secret merged into its LSBs.
 
         Args:
-            original_img_path: Path to the input image
-            secret_img_path: Text message to hide
-            output_path: Path to save the steganographic image
+            cover_img: Cover image (path, bytes, file object, array or PIL image)
+            secret_img: Secret image (path, bytes, file object, array or PIL image)
 
         Returns:
-            bool: True if encoding was successful, False otherwise
+            np.ndarray: Steganographic RGB array, or None if the secret does not fit
         """
+        cleared = None
+        # Load the original image
+        with StegMetrics.stage("load") as st:
+            if self.cache is not None and isinstance(cover_img, str):
+                cached = self.cache.image(cover_img)
+                # A private copy: the cached pixels stay untouched
+                cover = np.array(cached.data)
+                cleared = self.cache.cleared(cached, self.bit_depth)
+            else:
+                original_extractor = ImageRGBExtractor(cover_img, self.threads)
+                # A private buffer: the secret is merged in place
+                original_extractor.load(writable=True)
+                cover = original_extractor.arr
+            if cover is not None:
+                st.nbytes = cover.nbytes
 
-        try:
-            # Load the original image
-            original_extractor = ImageRGBExtractor(original_img_path)
-            original_extractor.load()
-
-            # Load the secret image
-            secret_extractor = ImageRGBExtractor(secret_img_path)
+        # Load the secret image
+        with StegMetrics.stage("payload") as st:
+            secret_extractor = ImageRGBExtractor(secret_img, self.threads)
             secret_extractor.load()
+            if secret_extractor.arr is not None:
+                st.nbytes = secret_extractor.arr.nbytes
 
-            cover = original_extractor.arr
-            secret = secret_extractor.arr
+        secret = secret_extractor.arr
 
-            if cover is None or secret is None:
-                print("Error: Failed to load images")
-                return False
+        if cover is None or secret is None:
+            logger.error("Failed to load images")
+            return None
 
 
-            h, w, _ = cover.shape
-            sh, sw, _ = secret.shape
+        h, w, _ = cover.shape
+        sh, sw, _ = secret.shape
 
-            # Must fit header in first row: width * 3 channels >= 64 bits
-            if w  < 64:
-                print(f"Error: Cover width {w} too small to hold 64-bit header")
-                return False
+        if not self._check_sizes(h, w, sh, sw):
+            return None
 
-            # Compare height and width of original and secret image
-            if sh > h or sw > w:
-                print("Error: Secret image is larger than original image")
-                return False
+        with StegMetrics.stage("embed", secret.nbytes):
+            stego = cover
+            self._embed_header(stego, sw, sh)
+            if cleared is None:
+                self._merge_rows(stego, secret)
+            else:
+                # The first row also carries header bits: merge it the usual way, the rows below from the plane
+                self._merge_rows(stego[:1], secret[:1])
+                self._merge_rows(stego[1:], secret[1:], cleared[1:])
+        return stego
 
-            # Prepare header bits
-            header = format(sw, '032b') + format(sh, '032b')  # 64-char string
-            print(f"Header: {header}")
-            # Copy of the original image
-            stego = original_extractor.arr.copy()
-            # Create the clear mask
-            mask_header = ""
-            for i in range(8 - self.bit_depth - 1):
-                mask_header += "1"
-
-            for i in range(self.bit_depth + 1):
-                mask_header += "0"
-            print(f"Mask header: {mask_header}")
-            clear_mask = int(mask_header, 2)
-            # Embed header in the first row
-
-            bit_idx = 0
-            for x in range(w):
-                if bit_idx < 64:
-                    header_bit = (int(header[bit_idx]) & 1) << self.bit_depth
-                    cover_bit = stego[0][x][self.channel] & clear_mask
-                    stego[0, x, self.channel] = cover_bit | header_bit
-                    bit_idx += 1
-                else:
-                    break
-            # Img mask
-            mask_img = ""
-            for i in range(8 - self.bit_depth):
-                mask_img += "1"
-
-            for i in range(self.bit_depth):
-                mask_img += "0"
-            mask = int(mask_img, 2)
-            print(f"Mask img: {mask_img}")
-
-            for y in range(sh):
-                for x in range(sw):
-                    for c in range(3):
-                        # Merge MSBs of secret image with LSBs of cover image
-                        cover_part = stego[y][x][c] & mask
-                        #print(f"Cover part: {bin(cover_part)}")
-                        secret_part = secret[y][x][c] >> (8 - self.bit_depth)
-                        #print(f"Secret part: {bin(secret_part)}")
-                        stego[y][x][c] = cover_part | secret_part
-            stego_img = Image.fromarray(stego, mode='RGB')
-            stego_img.save(output_path, format='PNG')
-            print(f"Message successfully hidden in {output_path}")
-            return True
-        except Exception as e:
-            print(f"Error during encoding :{str(e)}")
+    def _check_sizes(self, h: int, w: int, sh: int, sw: int) -> bool:
+        """
+        Check that the header and a sh x sw secret fit a h x w cover, logging an error otherwise.
+        """
+        # Must fit header in first row: width * 3 channels >= 64 bits
+        if w  < 64:
+            logger.error("Cover width %d too small to hold 64-bit header", w)
             return False
 
-    def decode(self, img_path: str, output_path: str) -> bool:
+        # Compare height and width of original and secret image
+        if sh > h or sw > w:
+            logger.error("Secret image is larger than original image")
+            return False
+        return True
+
+    def _embed_header(self, stego: np.ndarray, sw: int, sh: int) -> None:
         """
-        Extract the hidden secret image from a stego-image.
+        Write the secret size header into the first row of stego (in place).
+        """
+        # Prepare header bits: 32-bit width followed by 32-bit height
+        header = np.concatenate((BitPlaneEngine.int_to_bits(sw, 32), BitPlaneEngine.int_to_bits(sh, 32)))
+        logger.debug("Header: %dx%d", sw, sh)
+        # Clear mask for the header: clears bits 0..bit_depth
+        clear_mask = (0xFF << (self.bit_depth + 1)) & 0xFF
+
+        # Embed header in the first row, one bit per pixel at position bit_depth
+        header_row = stego[0, :64, self.channel]
+        header_row &= np.uint8(clear_mask)
+        header_row |= header << self.bit_depth
+
+    def _span_rows(self, row_bytes: int) -> int:
+        """
+        Fewest rows of row_bytes bytes worth handing to a thread.
+        """
+        return -(-MIN_SPAN // max(1, row_bytes))
+
+    def _bands(self, reader: ImageRowReader, rows: int, stop: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Row bands of reader, decoded one band ahead on a background thread when threads > 1.
+        """
+        bands = reader.iter_bands(rows, stop)
+        return bands if self.threads == 1 else prefetch(bands)
+
+    def _merge_rows(self, stego: np.ndarray, secret: np.ndarray, cleared: np.ndarray | None = None) -> None:
+        """
+        Merge the MSBs of secret rows into the LSBs of the top-left corner of stego rows (in place).
+
+        cleared, if given, holds the same pixels as stego with their bit_depth LSBs already cleared.
+        """
+        # Img mask: keeps the MSBs of the cover
+        mask = np.uint8((0xFF << self.bit_depth) & 0xFF)
+
+        # Merge MSBs of secret image with LSBs of cover image, in row ranges split across threads
+        def merge_span(y0: int, y1: int) -> None:
+            region = stego[y0:y1, :secret.shape[1]]
+            if cleared is not None:
+                np.bitwise_or(cleared[y0:y1, :secret.shape[1]], secret[y0:y1] >> (8 - self.bit_depth), out=region)
+                return
+            region &= mask
+            region |= secret[y0:y1] >> (8 - self.bit_depth)
+
+        run_spans(merge_span, secret.shape[0], self.threads, min_size=self._span_rows(secret.shape[1] * 3))
+
+    def _merge_bands(self, cover_img: ImageSource, secret_img: ImageSource, output_path: str | BinaryIO) -> bool:
+        """
+        Stream the cover in bands of band_rows rows, merging the secret rows and writing each band out.
+
+        Returns:
+            bool: True if the stego image was written, False if the secret does not fit
+        """
+        with ImageRowReader(cover_img, self.threads) as cover, ImageRowReader(secret_img, self.threads) as secret:
+            for name, reader in (("Cover", cover), ("Secret", secret)):
+                if not reader.banded:
+                    logger.warning("%s image cannot be read in row bands; decoding it whole", name)
+            if not self._check_sizes(cover.height, cover.width, secret.height, secret.width):
+                return False
+            secret_bands = _timed_bands(self._bands(secret, self.band_rows), "payload")
+            with ImageRowWriter(output_path, cover.width, cover.height, self.writer) as out:
+                for y0, band in _timed_bands(self._bands(cover, self.band_rows), "load"):
+                    with StegMetrics.stage("embed"):
+                        # Bands may be views of the source (an array, a memory map); never write through them
+                        if not band.flags.owndata:
+                            band = band.copy()
+                        if y0 == 0:
+                            self._embed_header(band, secret.width, secret.height)
+                        if y0 < secret.height:
+                            _, secret_band = next(secret_bands)
+                            self._merge_rows(band, secret_band)
+                    with StegMetrics.stage("save", band.nbytes):
+                        out.write(band)
+        return True
+
+    def encode(self, original_img_path: ImageSource, secret_img_path: ImageSource,
+               output_path: str | BinaryIO) -> bool:
+        """
+        Hide a secret image in the original image.
 
         Args:
-            img_path: Path to the stego-image (PNG).
-            output_path: Path to save the recovered secret image.
+            original_img_path: Path to the input image (or bytes, file object, array or PIL image)
+            secret_img_path: Path to the secret image to hide (or bytes, file object, array or PIL image)
+            output_path: Path (or writable binary file object) to save the steganographic image
 
         Returns:
-            True if decoding was successful, False otherwise.
+            bool: True if encoding was successful, False otherwise
         """
+
         try:
-            # Load the original image
-            img_extractor = ImageRGBExtractor(img_path)
-            img_extractor.load()
-            img = img_extractor.arr
-            if img is None:
-                print("Error: Failed to load image")
+            if self.band_rows is not None:
+                if not self._merge_bands(original_img_path, secret_img_path, output_path):
+                    return False
+                logger.info("Message successfully hidden in %s", output_path)
+                return True
+            stego = self._merge(original_img_path, secret_img_path)
+            if stego is None:
                 return False
-            stego_arr = img.copy()
+            with StegMetrics.stage("save", stego.nbytes):
+                self.writer.save(stego, output_path)
+            logger.info("Message successfully hidden in %s", output_path)
+            return True
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return False
+
+    def encode_to_array(self, cover_img: ImageSource, secret_img: ImageSource) -> np.ndarray | None:
+        """
+        Hide a secret image in a cover image without touching the filesystem.
+
+        Returns:
+            np.ndarray: Steganographic RGB array, or None if encoding failed
+        """
+        try:
+            return self._merge(cover_img, secret_img)
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return None
+
+    def encode_to_bytes(self, cover_img: ImageSource, secret_img: ImageSource) -> bytes | None:
+        """
+        Hide a secret image in a cover image and return the image file bytes (PNG unless the writer says otherwise).
+
+        Returns:
+            bytes: Encoded steganographic image, or None if encoding failed
+        """
+        stego = self.encode_to_array(cover_img, secret_img)
+        if stego is None:
+            return None
+        with StegMetrics.stage("save", stego.nbytes):
+            return self.writer.to_bytes(stego)
 
+    def _extract(self, img: ImageSource) -> np.ndarray | None:
+        """
+        Decode the rows of a stego-image holding the secret and return it as an RGB array.
+
+        Only the header row and then the first secret-height rows are decoded, so a small
+        secret in a large cover never pays for decoding the rest of it.
+
+        Args:
+            img: Stego-image (path, bytes, file object, array or PIL image)
+
+        Returns:
+            np.ndarray: Recovered secret, or None if no valid header was found
+        """
+        with StegMetrics.stage("load") as st, ImageRowReader(img, self.threads) as stego:
             # 1) Read header
-            # Build the clear-bit mask (only bit n is kept)
-            mask_header = ""
-            for i in range(8 - self.bit_depth - 1):
-                mask_header += "0"
-            mask_header += "1"
-            for i in range(self.bit_depth):
-                mask_header += "0"
-            print(f"Mask header: {mask_header}")
-            clear_mask = int(mask_header, 2)
-
-            # Now extract 64 bits into a string
-            header_bits = ""
-            for i in range(64):
-                bit = (stego_arr[0][i][self.channel] & clear_mask) >> self.bit_depth
-                header_bits += str(bit)
-
-            print(f"Extracted header bits: {header_bits}")
-            # First 32 bits = width, next 32 bits = height
-            sw = int(header_bits[:32], 2)
-            sh = int(header_bits[32:], 2)
-
-            print(f"Extracted secret width  : {sw}")
-            print(f"Extracted secret height : {sh}")
-            if sw == 0 or sh == 0 or sw > stego_arr.shape[1] or sh > stego_arr.shape[0]:
-                print("Error: Invalid secret dimensions extracted")
-                return False
+            first_row = stego.read(stop=1)[0]
+            st.nbytes = first_row.nbytes
+            size = self._read_size(first_row, stego.height)
+            if size is None:
+                return None
+            sw, sh = size
+            stego_arr = stego.read(stop=sh)
+            st.nbytes = stego_arr.nbytes
+
+        # 2) Extract pixel bits
+        with StegMetrics.stage("extract", sh * sw * 3):
+            secret_arr = self._secret_rows(stego_arr[:, :sw])
+        return secret_arr
+
+    def _read_size(self, first_row: np.ndarray, height: int) -> tuple[int, int] | None:
+        """
+        Read and validate the secret size header from the first stego row.
+
+        Returns:
+            tuple: (secret width, secret height), or None if the header is invalid
+        """
+        # Build the clear-bit mask (only bit n is kept)
+        clear_mask = 1 << self.bit_depth
+
+        # Now extract 64 bits
+        header_bits = (first_row[:64, self.channel] & clear_mask) >> self.bit_depth
+
+        # First 32 bits = width, next 32 bits = height
+        sw = BitPlaneEngine.bits_to_int(header_bits[:32])
+        sh = BitPlaneEngine.bits_to_int(header_bits[32:])
+
+        logger.debug("Extracted secret size: %dx%d", sw, sh)
+        if sw == 0 or sh == 0 or sw > first_row.shape[0] or sh > height:
+            logger.error("Invalid secret dimensions extracted")
+            return None
+        return sw, sh
+
+    def _secret_rows(self, stego_rows: np.ndarray) -> np.ndarray:
+        """
+        Recover secret pixels from the LSBs of stego pixels.
+        """
+        # Img mask: keeps the LSBs carrying the secret
+        mask = np.uint8((1 << self.bit_depth) - 1)
+        secret = np.empty(stego_rows.shape, dtype=np.uint8)
 
-            # 2) Extract pixel bits
-            secret_arr = np.zeros((sh, sw, 3), dtype=np.uint8)
+        def secret_span(y0: int, y1: int) -> None:
+            np.bitwise_and(stego_rows[y0:y1], mask, out=secret[y0:y1])
+            secret[y0:y1] <<= 8 - self.bit_depth
 
-            # Img mask
-            mask_img = ""
-            for i in range(8 - self.bit_depth):
-                mask_img += "0"
+        run_spans(secret_span, stego_rows.shape[0], self.threads, min_size=self._span_rows(stego_rows.shape[1] * 3))
+        return secret
 
-            for i in range(self.bit_depth):
-                mask_img += "1"
-            mask = int(mask_img, 2)
-            print(f"Mask img: {mask_img}")
+    def _extract_bands(self, img: ImageSource, output_path: str | BinaryIO) -> bool:
+        """
+        Stream the stego rows holding the secret in bands of band_rows rows, writing the secret as it goes.
+
+        Returns:
+            bool: True if the secret was written, False if no valid header was found
+        """
+        with ImageRowReader(img, self.threads) as stego:
+            if not stego.banded:
+                logger.warning("Stego image cannot be read in row bands; decoding it whole")
+            _, first = next(_timed_bands(stego.iter_bands(1, 1), "load"))
+            size = self._read_size(first[0], stego.height)
+            if size is None:
+                return False
+            sw, sh = size
+            with ImageRowWriter(output_path, sw, sh, self.writer) as out:
+                # Rows below the secret are never decoded
+                for _, band in _timed_bands(self._bands(stego, self.band_rows, sh), "load"):
+                    with StegMetrics.stage("extract", band.shape[0] * sw * 3):
+                        secret_band = self._secret_rows(band[:, :sw])
+                    with StegMetrics.stage("save", secret_band.nbytes):
+                        out.write(secret_band)
+        return True
+
+    def decode(self, img_path: ImageSource, output_path: str | BinaryIO) -> bool:
+        """
+        Extract the hidden secret image from a stego-image.
 
-            for y in range(sh):
-                for x in range(sw):
-                    for c in range(3):
-                        secret_arr[y, x, c] = (stego_arr[y][x][c] & mask) << (8 - self.bit_depth)
+        Args:
+            img_path: Path to the stego-image (PNG, TIFF, BMP or NPY), or bytes, file object, array or PIL image.
+            output_path: Path (or writable binary file object) to save the recovered secret image.
+
+        Returns:
+            True if decoding was successful, False otherwise.
+        """
+        try:
+            if self.band_rows is not None:
+                if not self._extract_bands(img_path, output_path):
+                    return False
+                logger.info("Secret image recovered successfully as %s", output_path)
+                return True
+            secret_arr = self._extract(img_path)
+            if secret_arr is None:
+                return False
 
             # Save recovered secret
-            recovered = Image.fromarray(secret_arr, mode='RGB')
-            recovered.save(output_path, format='PNG')
-            print(f"Secret image recovered successfully as {output_path}")
+            with StegMetrics.stage("save", secret_arr.nbytes):
+                self.writer.save(secret_arr, output_path)
+            logger.info("Secret image recovered successfully as %s", output_path)
             return True
 
         except Exception as e:
-            print(f"Error during decoding: {e}")
+            logger.error("Error during decoding: %s", e)
             return False
+
+    def decode_to_array(self, img: ImageSource) -> np.ndarray | None:
+        """
+        Extract the hidden secret image without touching the filesystem.
+
+        Returns:
+            np.ndarray: Recovered secret RGB array, or None if decoding failed
+        """
+        try:
+            return self._extract(img)
+        except Exception as e:
+            logger.error("Error during decoding: %s", e)
+            return None
+
+    def decode_to_bytes(self, img: ImageSource) -> bytes | None:
+        """
+        Extract the hidden secret image and return it as image file bytes (PNG unless the writer says otherwise).
+
+        Returns:
+            bytes: Encoded secret image, or None if decoding failed
+        """
+        secret_arr = self.decode_to_array(img)
+        if secret_arr is None:
+            return None
+        with StegMetrics.stage("save", secret_arr.nbytes):
+            return self.writer.to_bytes(secret_arr)
@@ -1,21 +1,598 @@
+import io
+import os
+import struct
+import warnings
+import zlib
 from PIL import Image
 import numpy as np
-from typing import Union
+from typing import BinaryIO, Iterator, Union
+
+from StegThreads import prefetch
+
+# Anything ImageRGBExtractor can load: a path, encoded image bytes, a binary file object,
+# an already decoded array or a PIL image
+ImageSource = Union[str, bytes, bytearray, memoryview, BinaryIO, np.ndarray, Image.Image]
+
+# Lossless output formats by file extension; NPY is a raw NumPy array file
+OUTPUT_FORMATS = {".png": "PNG", ".tif": "TIFF", ".tiff": "TIFF", ".bmp": "BMP", ".npy": "NPY"}
+NPY_MAGIC = b"\x93NUMPY"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Little and big-endian TIFF, then BigTIFF
+TIFF_MAGICS = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+
+# Channels per PNG colour type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# 8-bit PNG colour type whose pixels are n bytes wide, by n: rows of any PNG with the same
+# bytes per pixel unfilter identically when relabelled with it, and decode to their raw bytes
+PNG_CARRIERS = {1: 0, 2: 4, 3: 2, 4: 6}
+# Target size of the bands ImageRGBExtractor decodes whole images in: each band costs a few
+# transient copies (inflated rows, carrier PNG, Pillow's decode), so small bands keep that overhead low
+LOAD_BAND_BYTES = 1 << 20
+# Bits per pixel of the raw modes whose strips may omit the row stride
+RAW_BITS = {"1": 1, "L": 8, "P": 8, "LA": 16, "I;16": 16, "I;16B": 16, "RGB": 24, "RGBA": 32, "RGBX": 32, "CMYK": 32}
+
 
 class ImageRGBExtractor:
-    def __init__(self, path: str):
+    def __init__(self, path: ImageSource, threads: int = 1):
         """
-        Initialize with the path to the image.
+        Initialize with the path to the image (or any other ImageSource).
+
+        :param threads: With 2 or more, band decoding is pipelined across threads (see ImageRowReader).
         """
         self.path = path
+        self.threads = threads
         self.arr: Union[np.ndarray, None] = None
 
-    def load(self) -> None:
+    def load(self, writable: bool = False) -> None:
+        """
+        Load the image and convert to an RGB NumPy array, copying as little as possible.
+
+        By default arr may be read-only: a view of the decoded pixels, of the caller's array or of a
+        memory-mapped .npy file. With writable=True, arr is a private writable buffer that can be
+        modified in place; it is copied only when it would otherwise be shared.
+        """
+        source = self.path
+        if self._is_npy(source):
+            # Raw arrays written by ImageWriter: map files instead of reading them
+            if isinstance(source, str):
+                source = np.load(source, mmap_mode='r')
+            else:
+                source = np.load(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        if isinstance(source, np.ndarray):
+            if source.dtype == np.uint8 and source.ndim == 3 and source.shape[2] == 3:
+                # Arrays read from .npy bytes are already private; the caller's arrays and memory maps are not
+                shared = source is self.path or isinstance(source, np.memmap)
+                self.arr = np.array(source) if writable and shared else np.asarray(source)
+                return
+            source = Image.fromarray(source)
+        if isinstance(source, Image.Image):
+            self.arr = self._from_pil(source, writable)
+            return
+        # Line-oriented formats are decoded band by band straight into the final array,
+        # skipping Pillow's full-size pixel buffer and the bytes it exports it through
+        with ImageRowReader(source, self.threads) as reader:
+            self.arr = reader.read(writable)
+
+    @staticmethod
+    def _from_pil(img: Image.Image, writable: bool = False) -> np.ndarray:
+        """
+        Convert a PIL image to an RGB array (read-only unless writable).
+        """
+        # convert() copies even when the mode already matches
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        # Pillow exports its pixels as an immutable bytes object: wrapping it is free but read-only
+        return np.array(img) if writable else np.asarray(img)
+
+    @staticmethod
+    def _is_npy(source: ImageSource) -> bool:
+        """
+        Check whether a path, buffer or seekable file object holds a .npy array.
+        """
+        if isinstance(source, str):
+            return source.lower().endswith(".npy")
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return bytes(source[:len(NPY_MAGIC)]) == NPY_MAGIC
+        if hasattr(source, "read") and hasattr(source, "seek") and source.seekable():
+            pos = source.tell()
+            magic = source.read(len(NPY_MAGIC))
+            source.seek(pos)
+            return magic == NPY_MAGIC
+        return False
+
+
+class ImageWriter:
+    """
+    ImageWriter class that saves RGB arrays in a lossless format, trading file size for speed.
+
+    PNG is compact but its zlib encoder dominates encode time on large images; TIFF and BMP are
+    written uncompressed and NPY dumps the raw array, which is fastest and loads back memory-mapped.
+    """
+
+    def __init__(self, format: str | None = None, compress_level: int | None = None, optimize: bool = False):
+        """
+        :param format: PNG, TIFF, BMP or NPY. None picks it from the output file extension (PNG otherwise).
+        :param compress_level: PNG zlib level, 0 (fastest, largest) to 9 (slowest, smallest). Pillow default is 6.
+        :param optimize: PNG only: search for the smallest encoding (slow).
+        """
+        if format is not None:
+            format = format.upper()
+            if format not in OUTPUT_FORMATS.values():
+                raise ValueError(f"Unsupported output format: {format}. Choose from PNG, TIFF, BMP, NPY")
+        if compress_level is not None and not (0 <= compress_level <= 9):
+            raise ValueError("compress_level must be between 0 and 9")
+        self.format = format
+        self.compress_level = compress_level
+        self.optimize = optimize
+
+    def format_for(self, output: str | BinaryIO) -> str:
+        """
+        Format used for an output path or file object.
+        """
+        if self.format is not None:
+            return self.format
+        if isinstance(output, (str, os.PathLike)):
+            return OUTPUT_FORMATS.get(os.path.splitext(output)[1].lower(), "PNG")
+        return "PNG"
+
+    def save(self, arr: np.ndarray, output: str | BinaryIO) -> None:
+        """
+        Write an RGB array to a path or writable binary file object.
+        """
+        format = self.format_for(output)
+        if format == "NPY":
+            if isinstance(output, (str, os.PathLike)):
+                # np.save would append .npy to paths without that extension
+                with open(output, "wb") as f:
+                    np.save(f, arr)
+            else:
+                np.save(output, arr)
+            return
+        options = {}
+        if format == "PNG":
+            options["optimize"] = self.optimize
+            if self.compress_level is not None:
+                options["compress_level"] = self.compress_level
+        Image.fromarray(arr, mode='RGB').save(output, format=format, **options)
+
+    def to_bytes(self, arr: np.ndarray) -> bytes:
+        """
+        Encode an RGB array to file bytes in memory (PNG unless a format was given).
+        """
+        buf = io.BytesIO()
+        self.save(arr, buf)
+        return buf.getvalue()
+
+
+def _png_chunk_parts(kind: bytes, data: bytes) -> tuple[bytes, bytes, bytes, bytes]:
+    return struct.pack(">I", len(data)), kind, data, struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return b"".join(_png_chunk_parts(kind, data))
+
+
+def _png_bytes(width: int, height: int, bit_depth: int, color_type: int, rows: np.ndarray,
+               extra: bytes = b"") -> bytes:
+    """
+    Build an in-memory PNG from already filtered rows (filter byte first), stored without compression.
+    """
+    ihdr = struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0)
+    # One join: the rows are the bulk of the file and are copied once after compression
+    return b"".join((PNG_SIGNATURE, _png_chunk(b"IHDR", ihdr), extra,
+                     *_png_chunk_parts(b"IDAT", zlib.compress(np.ascontiguousarray(rows), 0)),
+                     _png_chunk(b"IEND", b"")))
+
+
+class ImageRowReader:
+    """
+    ImageRowReader class that decodes an image as RGB row bands, so memory follows the band size
+    instead of the image size.
+
+    NPY files are memory-mapped, non-interlaced PNG is inflated and unfiltered one band at a time,
+    and uncompressed BMP/TIFF rows are read straight from their strips. Other sources (compressed
+    TIFF, JPEG, 16-bit RGB PNG...) are decoded whole on first use; banded tells which case applies.
+    """
+
+    def __init__(self, source: ImageSource, threads: int = 1):
+        """
+        :param source: Image path, bytes, file object, array or PIL image.
+        :param threads: With 2 or more, the next band is decoded on a background thread while the
+            current one is used: PNG data is inflated ahead of unfiltering, and strips are read ahead.
+        """
+        self.source = source
+        self.threads = threads
+        self.width = 0
+        self.height = 0
+        self._file = None
+        self._owns_file = False
+        self._arr: Union[np.ndarray, None] = None
+        self._image: Union[Image.Image, None] = None
+        self._png = None
+        self._tiles = None
+
+    def __enter__(self) -> "ImageRowReader":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> None:
         """
-        Load the image and convert to an RGB NumPy array.
+        Read the image header and pick the band decoder.
         """
-        img = Image.open(self.path).convert('RGB')
-        self.arr = np.array(img, dtype=np.uint8)
+        source = self.source
+        if isinstance(source, (np.ndarray, Image.Image)) or ImageRGBExtractor._is_npy(source):
+            # Already decoded, or a raw array that loads memory-mapped
+            extractor = ImageRGBExtractor(source)
+            extractor.load()
+            self._arr = extractor.arr
+            self.height, self.width = self._arr.shape[:2]
+            return
+        if isinstance(source, str):
+            self._file, self._owns_file = open(source, "rb"), True
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._file = io.BytesIO(source)
+        else:
+            self._file = source
+        start = self._file.tell()
+        if self._file.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE and self._open_png():
+            return
+        self._file.seek(start)
+        if self._open_raw():
+            return
+        self._file.seek(start)
+        self._image = Image.open(self._file)
+        self.width, self.height = self._image.size
 
+    def close(self) -> None:
+        if self._owns_file:
+            self._file.close()
+        self._file = None
+        self._arr = None
+        self._image = None
 
+    @property
+    def banded(self) -> bool:
+        """
+        False if the image has to be decoded whole (arrays and memory-mapped .npy files count as banded).
+        """
+        return self._image is None
+
+    def read(self, writable: bool = False, stop: int | None = None) -> np.ndarray:
+        """
+        Decode the image (or its first rows) into one RGB array, band by band when possible.
+
+        Args:
+            writable: Return a private writable array (see ImageRGBExtractor.load)
+            stop: Number of rows to decode (default: all of them); decoding stops there
+        """
+        stop = self.height if stop is None else min(stop, self.height)
+        if self._image is not None:
+            return ImageRGBExtractor._from_pil(self._image, writable)[:stop]
+        if self._arr is not None:
+            return np.array(self._arr[:stop]) if writable else self._arr[:stop]
+        # The same guard Pillow applies before decoding a whole image
+        pixels = self.width * stop
+        limit = Image.MAX_IMAGE_PIXELS
+        if limit and pixels > 2 * limit:
+            raise Image.DecompressionBombError(
+                f"Image size ({pixels} pixels) exceeds limit of {2 * limit} pixels, could be decompression bomb DOS attack.")
+        if limit and pixels > limit:
+            warnings.warn(f"Image size ({pixels} pixels) exceeds limit of {limit} pixels, "
+                          "could be decompression bomb DOS attack.", Image.DecompressionBombWarning)
+        arr = np.empty((stop, self.width, 3), dtype=np.uint8)
+        for y0, band in self.iter_bands(max(1, LOAD_BAND_BYTES // (self.width * 3 or 1)), stop):
+            arr[y0:y0 + band.shape[0]] = band
+        return arr
+
+    def _open_png(self) -> bool:
+        """
+        Parse the PNG header chunks up to the first IDAT. False if the PNG needs a whole decode.
+        """
+        f = self._file
+        length, kind = struct.unpack(">I4s", f.read(8))
+        if kind != b"IHDR":
+            return False
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", f.read(13))
+        f.seek(length - 13 + 4, os.SEEK_CUR)
+        bits = PNG_CHANNELS.get(color_type, 0) * bit_depth
+        bpp = max(1, bits // 8)
+        if interlace or bpp not in PNG_CARRIERS:
+            return False
+        # Keep the chunks that affect RGB conversion (palette, transparency) for the band images
+        extra = b""
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+            length, kind = struct.unpack(">I4s", header)
+            if kind == b"IDAT":
+                f.seek(-8, os.SEEK_CUR)
+                break
+            data = f.read(length)
+            f.seek(4, os.SEEK_CUR)
+            if kind in (b"PLTE", b"tRNS"):
+                extra += _png_chunk(kind, data)
+        self.width, self.height = width, height
+        self._png = {"bit_depth": bit_depth, "color_type": color_type, "bpp": bpp,
+                     "row_bytes": (width * bits + 7) // 8, "extra": extra, "idat": f.tell()}
+        return True
+
+    def _open_raw(self) -> bool:
+        """
+        Read the tile layout of an uncompressed BMP or TIFF. False for other formats or if any tile is compressed.
+        """
+        start = self._file.tell()
+        magic = self._file.read(4)
+        self._file.seek(start)
+        # The plugin classes are used directly rather than Image.open: row bands never decode the whole
+        # image, and read() applies the decompression bomb guard to the rows actually decoded
+        if magic[:2] == b"BM":
+            from PIL import BmpImagePlugin
+            factory = BmpImagePlugin.BmpImageFile
+        elif magic in TIFF_MAGICS:
+            from PIL import TiffImagePlugin
+            factory = TiffImagePlugin.TiffImageFile
+        else:
+            return False
+        try:
+            img = factory(self._file)
+        except (SyntaxError, OSError, ValueError, struct.error):
+            return False
+        tiles = []
+        for tile in img.tile:
+            args = tile.args if isinstance(tile.args, tuple) else (tile.args,)
+            rawmode, stride, orientation = (args + (0, 1))[:3]
+            x0, y0, x1, y1 = tile.extents
+            if tile.codec_name != "raw":
+                return False
+            if not stride:
+                if rawmode != img.mode or rawmode not in RAW_BITS:
+                    return False
+                stride = ((x1 - x0) * RAW_BITS[rawmode] + 7) // 8
+            tiles.append((tile.extents, tile.offset, rawmode, stride, orientation))
+        self.width, self.height = img.size
+        self._tiles = (img.mode, img.palette, tiles)
+        return True
 
+    def iter_bands(self, rows: int, stop: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Decode the image rows [0, stop) as RGB bands of at most rows rows.
+
+        Args:
+            rows: Rows per band
+            stop: Number of rows to decode (default: all of them); decoding stops there
+
+        Yields:
+            tuple: (first row of the band, HxWx3 uint8 array). Bands may be read-only views.
+        """
+        stop = self.height if stop is None else min(stop, self.height)
+        if self._image is not None and self._arr is None:
+            self._arr = ImageRGBExtractor._from_pil(self._image)
+        if self._arr is not None:
+            for y0 in range(0, stop, rows):
+                yield y0, self._arr[y0:min(stop, y0 + rows)]
+        elif self._png is not None:
+            yield from self._png_bands(rows, stop)
+        elif self.threads > 1:
+            yield from prefetch(self._raw_bands(rows, stop))
+        else:
+            yield from self._raw_bands(rows, stop)
+
+    def _idat_pieces(self, size: int = 1 << 20) -> Iterator[bytes]:
+        """
+        Yield the concatenated IDAT data in pieces of at most size bytes.
+        """
+        f = self._file
+        f.seek(self._png["idat"])
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return
+            length, kind = struct.unpack(">I4s", header)
+            if kind == b"IEND":
+                return
+            if kind != b"IDAT":
+                f.seek(length + 4, os.SEEK_CUR)
+                continue
+            while length:
+                piece = f.read(min(size, length))
+                if not piece:
+                    return
+                length -= len(piece)
+                yield piece
+            f.seek(4, os.SEEK_CUR)
+
+    def _png_inflate(self, rows: int, stop: int) -> Iterator[np.ndarray]:
+        """
+        Inflate the filtered rows [0, stop) of the PNG, rows rows (plus their filter bytes) at a time.
+
+        Each band is inflated into rows 1.. of a fresh (n + 1, row_bytes + 1) array; row 0 is left
+        for the caller (the previous raw row when unfiltering).
+        """
+        row_bytes = self._png["row_bytes"]
+        inflater = zlib.decompressobj()
+        pieces = self._idat_pieces()
+        for y0 in range(0, stop, rows):
+            n = min(rows, stop - y0)
+            band = np.empty((n + 1, row_bytes + 1), dtype=np.uint8)
+            flat = band[1:].reshape(-1)
+            filled = 0
+            while filled < flat.size:
+                out = inflater.decompress(inflater.unconsumed_tail, flat.size - filled)
+                if not out:
+                    piece = next(pieces, None)
+                    if piece is None:
+                        raise ValueError("PNG image data ends before the last row")
+                    out = inflater.decompress(inflater.unconsumed_tail + piece, flat.size - filled)
+                flat[filled:filled + len(out)] = np.frombuffer(out, dtype=np.uint8)
+                filled += len(out)
+            yield band
+
+    def _png_bands(self, rows: int, stop: int) -> Iterator[tuple[int, np.ndarray]]:
+        png = self._png
+        row_bytes, bpp = png["row_bytes"], png["bpp"]
+        inflated = self._png_inflate(rows, stop)
+        if self.threads > 1:
+            # zlib and Pillow's unfilter both release the GIL: inflate the next band meanwhile
+            inflated = prefetch(inflated)
+        # The row above the first one is all zeros for the PNG filters
+        prev = np.zeros(row_bytes, dtype=np.uint8)
+        for y0, filtered in zip(range(0, stop, rows), inflated):
+            n = min(rows, stop - y0)
+            # Unfilter with Pillow: prepend the previous raw row (filter None) and decode the band
+            # under the 8-bit colour type with the same bytes per pixel, which yields the raw row bytes
+            filtered[0, 0] = 0
+            filtered[0, 1:] = prev
+            carrier = _png_bytes(row_bytes // bpp, n + 1, 8, PNG_CARRIERS[bpp], filtered)
+            raw = np.asarray(Image.open(io.BytesIO(carrier))).reshape(n + 1, row_bytes)[1:]
+            prev = raw[-1]
+            if (png["bit_depth"], png["color_type"]) == (8, 2):
+                band = raw.reshape(n, self.width, 3)
+            else:
+                # Let Pillow convert the raw rows exactly as it converts the whole image
+                filtered[1:, 0] = 0
+                filtered[1:, 1:] = raw
+                real = _png_bytes(self.width, n, png["bit_depth"], png["color_type"], filtered[1:], png["extra"])
+                band = np.asarray(Image.open(io.BytesIO(real)).convert("RGB"))
+            yield y0, band
+
+    def _raw_bands(self, rows: int, stop: int) -> Iterator[tuple[int, np.ndarray]]:
+        mode, palette, tiles = self._tiles
+        f = self._file
+        for y0 in range(0, stop, rows):
+            y1 = min(stop, y0 + rows)
+            band = np.empty((y1 - y0, self.width, 3), dtype=np.uint8)
+            for (x0, ty0, x1, ty1), offset, rawmode, stride, orientation in tiles:
+                r0, r1 = max(y0, ty0), min(y1, ty1)
+                if r0 >= r1:
+                    continue
+                # Bottom-up tiles (BMP) store their last row first
+                skip = ty1 - r1 if orientation < 0 else r0 - ty0
+                f.seek(offset + skip * stride)
+                data = f.read((r1 - r0) * stride)
+                piece = Image.frombytes(mode, (x1 - x0, r1 - r0), data, "raw", rawmode, stride, orientation)
+                if palette is not None:
+                    piece.putpalette(palette)
+                band[r0 - y0:r1 - y0, x0:x1] = np.asarray(piece.convert("RGB"))
+            yield y0, band
+
+
+class ImageRowWriter:
+    """
+    ImageRowWriter class that writes an RGB image band by band, for images too large to hold in memory.
+
+    PNG is streamed through zlib with the Up filter, so the file holds the same pixels as ImageWriter's
+    but not the same bytes (Pillow picks filters per row). NPY is written raw, byte for byte what
+    ImageWriter writes. TIFF and BMP are not supported: their 32-bit offsets cap them at 4 GB.
+    """
+
+    def __init__(self, output: str | BinaryIO, width: int, height: int, writer: ImageWriter | None = None):
+        """
+        :param output: Path or writable binary file object.
+        :param width: Image width in pixels.
+        :param height: Image height in pixels; exactly this many rows must be written.
+        :param writer: Output format and PNG compression level (optimize is ignored).
+        """
+        writer = writer or ImageWriter()
+        self.format = writer.format_for(output)
+        if self.format not in ("PNG", "NPY"):
+            raise ValueError(f"{self.format} cannot be written in row bands; use PNG or NPY")
+        self.output = output
+        self.width = width
+        self.height = height
+        # Pillow's default PNG level
+        self.compress_level = 6 if writer.compress_level is None else writer.compress_level
+        self.rows = 0
+        self._file = None
+        self._owns_file = False
+        self._partial = None
+        self._deflate = None
+        self._prev = None
+
+    def __enter__(self) -> "ImageRowWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self.close(exc_type is None)
+
+    def open(self) -> None:
+        """
+        Open the output and write the file header.
+
+        Paths are written to a partial file next to them, renamed over the output by close(): the
+        output may be one of the images still being read (encoding a cover onto itself).
+        """
+        if isinstance(self.output, (str, os.PathLike)):
+            self._partial = f"{os.fspath(self.output)}.{os.getpid()}-{id(self):x}.part"
+            self._file, self._owns_file = open(self._partial, "xb"), True
+        else:
+            self._file = self.output
+        if self.format == "NPY":
+            header = {"descr": "|u1", "fortran_order": False, "shape": (self.height, self.width, 3)}
+            np.lib.format.write_array_header_1_0(self._file, header)
+        else:
+            ihdr = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+            self._file.write(PNG_SIGNATURE + _png_chunk(b"IHDR", ihdr))
+            self._deflate = zlib.compressobj(self.compress_level)
+            self._prev = np.zeros(self.width * 3, dtype=np.uint8)
+
+    def write(self, band: np.ndarray) -> None:
+        """
+        Append the next rows (HxWx3 uint8).
+        """
+        if band.shape[1:] != (self.width, 3) or self.rows + band.shape[0] > self.height:
+            raise ValueError(f"Band of shape {band.shape} does not fit a {self.width}x{self.height} RGB image")
+        self.rows += band.shape[0]
+        if self.format == "NPY":
+            self._file.write(np.ascontiguousarray(band, dtype=np.uint8).data)
+            return
+        flat = band.reshape(band.shape[0], -1)
+        filtered = np.empty((flat.shape[0], flat.shape[1] + 1), dtype=np.uint8)
+        if self.compress_level == 0:
+            # Nothing to gain from filtering stored data
+            filtered[:, 0] = 0
+            filtered[:, 1:] = flat
+        else:
+            # Up filter: difference with the row above, vectorized across the band
+            filtered[:, 0] = 2
+            np.subtract(flat[0], self._prev, out=filtered[0, 1:])
+            np.subtract(flat[1:], flat[:-1], out=filtered[1:, 1:])
+        self._prev = flat[-1].copy()
+        self._write_idat(self._deflate.compress(filtered.data))
+
+    def _write_idat(self, data: bytes) -> None:
+        if data:
+            for part in _png_chunk_parts(b"IDAT", data):
+                self._file.write(part)
+
+    def close(self, complete: bool = True) -> None:
+        """
+        Finish the file. Raises ValueError if fewer rows than the height were written.
+
+        A path output is only replaced once the file is complete; otherwise the partial file is removed.
+        """
+        if self._file is None:
+            return
+        done = False
+        try:
+            if complete:
+                if self.rows != self.height:
+                    raise ValueError(f"Wrote {self.rows} of {self.height} rows")
+                if self.format == "PNG":
+                    self._write_idat(self._deflate.flush())
+                    self._file.write(_png_chunk(b"IEND", b""))
+                done = True
+        finally:
+            if self._owns_file:
+                self._file.close()
+            self._file = None
+            if self._partial is not None:
+                partial, self._partial = self._partial, None
+                if done:
+                    os.replace(partial, self.output)
+                else:
+                    os.unlink(partial)
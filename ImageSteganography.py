@@ -1,140 +1,328 @@
-from PIL import Image
-from ImageRGBManipulator import ImageRGBExtractor
-from TextBitManipulator import TextBitExtractor, TextGenerator
+import logging
+from typing import BinaryIO
+import numpy as np
+import StegMetrics
+from CoverCache import CoverCache
+from BitPlaneManipulator import BitPlaneEngine, MAX_DEPTH, MAX_PAYLOAD_BITS
+from KeyedScatter import KeyedScatter
+from ImageRGBManipulator import ImageRGBExtractor, ImageRowReader, ImageSource, ImageWriter
+from PayloadCodec import PayloadCodec
+from StegContainer import CONTAINER_BITS, ContainerHeader
+from StegThreads import ThreadedLayout
+from TextBitManipulator import TextGenerator
+
+logger = logging.getLogger(__name__)
 
 
 class ImageSteganography:
     """
     ImageSteganography class that encodes and decodes messages in images using LSB steganography.
     """
-    def __init__(self, delimiter: str = "<END>"):
+    def __init__(self, delimiter: str = "<END>", writer: ImageWriter | None = None, bits_per_sample: int = 1,
+                 key: str | None = None, threads: int = 1, cache: CoverCache | None = None):
         """
         Initialize the steganography tool with a custom delimiter.
 
         Args:
-            delimiter: String delimiter to mark the end of the hidden message
+            delimiter: String delimiter ending the message in images written before the container
+                header; only used to decode those
+            writer: Output writer (format and PNG compression); defaults to PNG, or the output file extension
+            bits_per_sample: Low bits of each channel byte carrying the message when encoding (1-4).
+                Recorded in the header, so decoding needs no option.
+            key: Secret key scattering the header and message over keyed pseudo-random pixel bytes
+                instead of the first ones; decoding needs the same key
+            threads: Threads embedding and extracting contiguous chunks of a large payload, and decoding
+                the next row band while the current one is processed. The output is identical for any value.
+            cache: Keeps covers given by path decoded between encode calls (revalidated by mtime and
+                size), for embedding many payloads into the same covers
         """
+        if not (1 <= bits_per_sample <= MAX_DEPTH):
+            raise ValueError(f"bits_per_sample must be between 1 and {MAX_DEPTH}.")
+        if threads < 1:
+            raise ValueError("threads must be positive")
         self.delimiter = delimiter
+        self.writer = writer or ImageWriter()
+        self.bits_per_sample = bits_per_sample
+        self.key = key
+        self.threads = threads
+        self.cache = cache
+
+    def _layout(self, size: int) -> BitPlaneEngine | KeyedScatter | ThreadedLayout:
+        """
+        Bit layout over a cover of size bytes: sequential, or keyed scatter when a key is set,
+        split across threads when threads > 1.
+        """
+        layout = BitPlaneEngine if self.key is None else KeyedScatter(self.key, size)
+        return layout if self.threads == 1 else ThreadedLayout(layout, self.threads)
+
+    def _embed(self, image: ImageSource, message: str) -> np.ndarray | None:
+        """
+        Load an image and return a copy of its RGB array with the message embedded.
+
+        Args:
+            image: Input image (path, bytes, file object, array or PIL image)
+            message: Text message to hide
+
+        Returns:
+            np.ndarray: Steganographic RGB array, or None if the message does not fit
+        """
+        # The container header records the exact length, so no delimiter is needed
+        with StegMetrics.stage("payload") as st:
+            payload = message.encode("utf-8")
+            st.nbytes = len(payload)
+        return self._embed_bits(image, payload)
+
+    def _embed_bits(self, image: ImageSource, payload: bytes, binary: bool = False) -> np.ndarray | None:
+        """
+        Load an image and return a copy of its RGB array with the container header and payload embedded.
+
+        Args:
+            image: Input image (path, bytes, file object, array or PIL image)
+            payload: Bytes to hide
+            binary: The payload is a PayloadCodec blob (recorded in the container flags)
+
+        Returns:
+            np.ndarray: Steganographic RGB array, or None if the bits do not fit
+        """
+        depth = self.bits_per_sample
+        cleared = None
+        # Load the image
+        with StegMetrics.stage("load") as st:
+            if self.cache is not None and isinstance(image, str):
+                cover = self.cache.image(image)
+                # A private copy: the cached pixels stay untouched
+                img_array = np.array(cover.data)
+                cleared = self.cache.cleared(cover, depth)
+            else:
+                img_extractor = ImageRGBExtractor(image, self.threads)
+                # A private buffer: the message is embedded in place
+                img_extractor.load(writable=True)
+                img_array = img_extractor.arr
+            if img_array is not None:
+                st.nbytes = img_array.nbytes
+
+        if img_array is None:
+            logger.error("Failed to load image")
+            return None
 
-    def encode(self, image_path: str, message: str, output_path: str) -> bool:
+        # Check if the given image is large enough
+        max_capacity = min(max(0, img_array.size - CONTAINER_BITS) * depth, MAX_PAYLOAD_BITS)
+
+        # Check the message + header > max capacity of the image
+        msg_len = len(payload) * 8
+        if msg_len > max_capacity:
+            logger.error("Message too large for image. Needs %d bits, image has %d bits at %d bits per sample.",
+                         msg_len, max_capacity, depth)
+            return None
+
+        # Container header first (1 bit per sample): length, bits per sample and CRC32
+        header_bits = ContainerHeader.pack(payload, depth, binary)
+        message_bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+        logger.debug("Encoding message length: %d at %d bits per sample", msg_len, depth)
+
+        with StegMetrics.stage("embed", msg_len // 8):
+            # Work on a flat view of the image
+            stego_array = img_array
+            flat_stego = stego_array.reshape(-1)
+
+            # Encode the header, then the message bits right after it
+            layout = self._layout(flat_stego.size)
+            layout.embed(flat_stego, header_bits, 0)
+            layout.embed(flat_stego, message_bits, CONTAINER_BITS, depth,
+                         None if cleared is None else cleared.reshape(-1))
+        return stego_array
+
+    def _save(self, stego_array: np.ndarray, output_path: str | BinaryIO) -> None:
+        """
+        Save a steganographic RGB array with the configured lossless writer, so the LSBs survive.
+        """
+        with StegMetrics.stage("save", stego_array.nbytes):
+            self.writer.save(stego_array, output_path)
+
+    def encode(self, image_path: ImageSource, message: str, output_path: str | BinaryIO) -> bool:
         """
         Hide a message in an image using LSB steganography.
 
         Args:
-            image_path: Path to the input image
+            image_path: Path to the input image (or bytes, file object, array or PIL image)
             message: Text message to hide
-            output_path: Path to save the steganographic image
+            output_path: Path (or writable binary file object) to save the steganographic image
 
         Returns:
             bool: True if encoding was successful, False otherwise
         """
         try:
-            # Load the image
-            img_extractor = ImageRGBExtractor(image_path)
-            img_extractor.load()
-
-            if img_extractor.arr is None:
-                print("Error: Failed to load image")
+            stego_array = self._embed(image_path, message)
+            if stego_array is None:
                 return False
 
-            # Convert the hidden message to bits
-            text_extractor = TextBitExtractor(delimiter=self.delimiter)
-            message_bits = text_extractor.encode_text_to_bits(text_extractor, message)
+            # Save the steganographic image
+            self._save(stego_array, output_path)
 
-            # Check if the given image is large enough
-            img_array = img_extractor.arr
-            max_capacity = img_array.size
+            logger.info("Message successfully hidden in %s", output_path)
+            return True
 
-            # Check the message + length > max capacity of the image
-            if len(message_bits) + 32 > max_capacity:
-                print(
-                    f"Error: Message too large for image. Needs {len(message_bits)} bits, image has {max_capacity} bits.")
-                return False
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return False
 
-            # Encode message length first (32 bits) for length
-            msg_len = len(message_bits)
-            len_bits = format(msg_len, '032b')
-            print(f"Encoding message length: {msg_len}")
+    def encode_to_array(self, image: ImageSource, message: str) -> np.ndarray | None:
+        """
+        Hide a message in an image without touching the filesystem.
 
-            # Flatten the array for easy handling
-            stego_array = img_array.copy()
-            flat_stego = stego_array.flatten()
+        Args:
+            image: Input image (path, bytes, file object, array or PIL image)
+            message: Text message to hide
 
-            # Encode length
-            for i in range(32):
-                # Clear LSB and set it to the current bit of the length
-                flat_stego[i] = (flat_stego[i] & 0xFE) | int(len_bits[i])
+        Returns:
+            np.ndarray: Steganographic RGB array, or None if encoding failed
+        """
+        try:
+            return self._embed(image, message)
+        except Exception as e:
+            logger.error("Error during encoding: %s", e)
+            return None
 
-            # Encode message bits
-            for i in range(len(message_bits)):
-                if i + 32 < flat_stego.size:
-                    # Clear LSB and set it to the current message bit
-                    flat_stego[i + 32] = (flat_stego[i + 32] & 0xFE) | message_bits[i]
+    def encode_to_bytes(self, image: ImageSource, message: str) -> bytes | None:
+        """
+        Hide a message in an image and return the image file bytes (PNG unless the writer says otherwise).
 
-            # Reshape back to original dimensions
-            stego_array = flat_stego.reshape(img_array.shape)
+        Args:
+            image: Input image (path, bytes, file object, array or PIL image)
+            message: Text message to hide
 
-            # Save the steganographic image
-            stego_img = Image.fromarray(stego_array, mode='RGB')
-            stego_img.save(output_path, format='PNG') # save png for reserving the rgb format
+        Returns:
+            bytes: Encoded steganographic image, or None if encoding failed
+        """
+        stego_array = self.encode_to_array(image, message)
+        if stego_array is None:
+            return None
+        with StegMetrics.stage("save", stego_array.nbytes):
+            return self.writer.to_bytes(stego_array)
+
+    def encode_payload(self, image_path: ImageSource, data: bytes, output_path: str | BinaryIO,
+                       codec: str = "none", level: int | None = None) -> bool:
+        """
+        Hide arbitrary bytes in an image, optionally compressed.
+
+        Args:
+            image_path: Path to the input image (or bytes, file object, array or PIL image)
+            data: Binary payload to hide
+            output_path: Path (or writable binary file object) to save the steganographic image
+            codec: Compression codec (none, zlib, lzma or zstd), recorded in the payload header
+            level: Codec-specific compression level
 
-            print(f"Message successfully hidden in {output_path}")
+        Returns:
+            bool: True if encoding was successful, False otherwise
+        """
+        try:
+            with StegMetrics.stage("payload") as st:
+                packed = PayloadCodec.pack(data, codec, level)
+                st.nbytes = len(packed)
+            logger.debug("Payload: %d bytes, %d bytes packed with %s", len(data), len(packed), codec)
+            stego_array = self._embed_bits(image_path, packed, binary=True)
+            if stego_array is None:
+                return False
+
+            self._save(stego_array, output_path)
+            logger.info("Payload successfully hidden in %s", output_path)
             return True
 
         except Exception as e:
-            print(f"Error during encoding: {str(e)}")
+            logger.error("Error during encoding: %s", e)
             return False
 
-    def decode(self, img_path: str) -> str | None:
+    def _read_header(self, img_path: ImageSource) -> tuple[np.ndarray, ContainerHeader, BitPlaneEngine | KeyedScatter | ThreadedLayout] | None:
+        """
+        Read and validate the header of a stego-image (container, or legacy 32-bit length).
+
+        Unkeyed, only the leading rows holding the header and then the message are decoded,
+        so the cost follows the message rather than the image. Keyed, the bits may sit on any
+        row and the whole image is decoded.
+
+        Args:
+            img_path: Path to the steganographic image (or bytes, file object, array or PIL image)
+
+        Returns:
+            tuple: (flat view of the decoded pixel bytes, header, bit layout), or None if the header is invalid
+        """
+        with StegMetrics.stage("load") as st, ImageRowReader(img_path, self.threads) as reader:
+            row_bytes = reader.width * 3
+            size = reader.height * row_bytes
+            layout = self._layout(size)
+            if self.key is not None:
+                flat_img = reader.read().reshape(-1)
+            else:
+                flat_img = reader.read(stop=-(-CONTAINER_BITS // row_bytes)).reshape(-1)
+            st.nbytes = flat_img.nbytes
+
+            header = ContainerHeader.read(flat_img, layout)
+            logger.debug("Decoding message length: %d at %d bits per sample", header.length, header.depth)
+            # Validate message length against the whole image
+            if not header.fits(size):
+                logger.error("Invalid message length detected. Image may not contain hidden data.")
+                return None
+
+            if self.key is None:
+                used = header.offset + BitPlaneEngine.samples_for(header.length, header.depth)
+                flat_img = reader.read(stop=-(-used // row_bytes)).reshape(-1)
+                st.nbytes = flat_img.nbytes
+        return flat_img, header, layout
+
+    def decode(self, img_path: ImageSource) -> str | None:
         """
         Extract a hidden message from a steganographic image.
 
         Args:
-            img_path: Path to the steganographic image
+            img_path: Path to the steganographic image (or bytes, file object, array or PIL image)
 
         Returns:
             str : Extracted message or None if extraction failed
         """
         try:
-            # Load the steganographic image
-            img_extractor = ImageRGBExtractor(img_path)
-            img_extractor.load()
-
-            if img_extractor.arr is None:
-                print("Error: Failed to load steganographic image")
-                return None
-            # Flatten the array
-            flat_img = img_extractor.arr.flatten()
-
-            # Extract the length (first 32 bits)
-            len_bits = ""
-            for i in range(32):
-                len_bits += str(flat_img[i] & 1)
-            print(f"Extracted length bits: {len_bits}")
-            msg_len = int(len_bits, 2)
-            print(f"Decoding message length: {msg_len}")
-            # Validate message length
-            if msg_len <= 0 or msg_len > flat_img.size - 32:
-                print("Error: Invalid message length detected. Image may not contain hidden data.")
+            result = self._read_header(img_path)
+            if result is None:
                 return None
+            flat_img, header, layout = result
 
-            # Extract message bits
-            extracted_bits = []
-            for i in range(msg_len):
-                if i + 32 < flat_img.size:
-                    extracted_bits.append(flat_img[i + 32] & 1)
+            with StegMetrics.stage("extract") as st:
+                if not header.legacy:
+                    # Exactly the payload bytes, checked against the CRC32
+                    bits = layout.extract(flat_img, header.length, header.offset, header.depth)
+                    decoded_text = header.text(np.packbits(bits).tobytes())
+                    st.nbytes = len(decoded_text)
+                    return decoded_text
+                # Legacy images: extract chunk by chunk, stopping at the delimiter
+                bit_chunks = layout.extract_chunks(flat_img, header.length, header.offset, depth=header.depth)
+                decoded_text, found = TextGenerator.decode_until_delimiter(bit_chunks, self.delimiter)
+                st.nbytes = len(decoded_text)
+            if not found and self.delimiter:
+                logger.warning("Delimiter not found. Message might be incomplete or corrupted.")
+            return decoded_text
 
-            # Convert bits to text
-            decoded_text = TextGenerator.decode_bits_to_text(extracted_bits)
+        except Exception as e:
+            logger.error("Error during decoding: %s", e)
+            return None
 
-            # Remove delimiter
-            if self.delimiter in decoded_text:
-                decoded_text = decoded_text.split(self.delimiter)[0]
-                return decoded_text
-            else:
-                print("Warning: Delimiter not found. Message might be incomplete or corrupted.")
-                return decoded_text
+    def decode_payload(self, img_path: ImageSource) -> bytes | None:
+        """
+        Extract a binary payload hidden with encode_payload.
+
+        Args:
+            img_path: Path to the steganographic image (or bytes, file object, array or PIL image)
+
+        Returns:
+            bytes: The original (decompressed) payload, or None if extraction failed
+        """
+        try:
+            result = self._read_header(img_path)
+            if result is None:
+                return None
+            flat_img, header, layout = result
+            with StegMetrics.stage("extract", header.length // 8):
+                packed = np.packbits(layout.extract(flat_img, header.length, header.offset, header.depth)).tobytes()
+                return PayloadCodec.unpack(header.check(packed))
 
         except Exception as e:
-            print(f"Error during decoding: {str(e)}")
+            logger.error("Error during decoding: %s", e)
             return None
@@ -0,0 +1,120 @@
+import hashlib
+import numpy as np
+from typing import Iterator, Union
+
+from BitPlaneManipulator import BitPlaneEngine
+
+# splitmix64 finalizer constants
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+class KeyedScatter:
+    """
+    Keyed bijection of the sample indices [0, size), used to scatter hidden bits across a cover.
+
+    Slot i of the payload lives at sample positions(i, i + 1)[0]. The mapping is a balanced
+    Feistel network over the smallest even power of two covering size, with cycle walking to
+    stay inside [0, size). Only the requested slots are evaluated, so time and memory scale
+    with the payload, never with the cover.
+
+    embed, extract and extract_chunks mirror BitPlaneEngine, with offset counting slots
+    instead of samples, so the modes can use either layout interchangeably.
+    """
+
+    def __init__(self, key: Union[str, bytes], size: int, rounds: int = 6):
+        """
+        :param key: Secret key (text or bytes); the same key and cover size give the same positions.
+        :param size: Number of samples of the cover.
+        :param rounds: Feistel rounds.
+        """
+        if size <= 0:
+            raise ValueError("Cover has no samples")
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        self.size = size
+        # Half width in bits: 2 * half_bits covers size, so cycle walking takes < 4 steps on average
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = np.uint64((1 << self.half_bits) - 1)
+        # Bind the round keys to the cover size so the same key scatters differently across covers
+        digest = hashlib.blake2b(key, digest_size=8 * rounds, person=b"stegscatter",
+                                 salt=size.to_bytes(8, "little")).digest()
+        self.round_keys = np.frombuffer(digest, dtype="<u8").astype(np.uint64)
+
+    def _feistel(self, idx: np.ndarray) -> np.ndarray:
+        """
+        One pass of the Feistel network over uint64 indices below 2 ** (2 * half_bits).
+        """
+        shift = np.uint64(self.half_bits)
+        left = idx >> shift
+        right = idx & self.half_mask
+        for k in self.round_keys:
+            # splitmix64 of the right half as the round function
+            z = (right ^ k) + _GOLDEN
+            z ^= z >> np.uint64(30)
+            z *= _MIX1
+            z ^= z >> np.uint64(27)
+            z *= _MIX2
+            z ^= z >> np.uint64(31)
+            left, right = right, left ^ (z & self.half_mask)
+        return (left << shift) | right
+
+    def positions(self, start: int, stop: int) -> np.ndarray:
+        """
+        Sample positions of the slots start..stop-1.
+
+        Returns:
+            np.ndarray: int64 array of distinct indices in [0, size)
+        """
+        if not 0 <= start <= stop <= self.size:
+            raise ValueError(f"Slots {start}..{stop} outside a cover of {self.size} samples")
+        pos = self._feistel(np.arange(start, stop, dtype=np.uint64))
+        # Cycle walking: re-encrypt the few indices that land past the end of the cover
+        out = np.flatnonzero(pos >= self.size)
+        while out.size:
+            pos[out] = self._feistel(pos[out])
+            out = out[pos[out] >= self.size]
+        return pos.astype(np.int64)
+
+    def embed(self, flat: np.ndarray, bits: np.ndarray, offset: int = 0, depth: int = 1,
+              cleared: np.ndarray | None = None, chunk: int = 1 << 20) -> None:
+        """
+        Overwrite the depth low bits of the samples at slots offset.. in place.
+
+        Args:
+            flat: 1-D integer array (or view) of size samples to modify
+            bits: Array of 0s and 1s to store, most significant bit of each sample first
+            offset: First slot to write
+            depth: Bits stored per sample (1-4)
+            cleared: Same samples as flat with the depth low bits already cleared (see CoverCache)
+            chunk: Maximum number of samples gathered at once
+        """
+        values = BitPlaneEngine.to_values(bits, depth, flat.dtype)
+        clear = ~flat.dtype.type((1 << depth) - 1)
+        for start in range(0, values.size, chunk):
+            stop = min(values.size, start + chunk)
+            pos = self.positions(offset + start, offset + stop)
+            if cleared is not None:
+                flat[pos] = cleared[pos] | values[start:stop]
+            else:
+                flat[pos] = (flat[pos] & clear) | values[start:stop]
+
+    def extract(self, flat: np.ndarray, count: int, offset: int = 0, depth: int = 1) -> np.ndarray:
+        """
+        Read count bits (depth per sample) from the samples at slots offset..
+
+        Returns:
+            np.ndarray: uint8 array of 0s and 1s
+        """
+        n = BitPlaneEngine.samples_for(count, depth)
+        return BitPlaneEngine.from_values(flat[self.positions(offset, offset + n)], count, depth)
+
+    def extract_chunks(self, flat: np.ndarray, count: int, offset: int = 0, chunk: int = 1 << 19,
+                       depth: int = 1) -> Iterator[np.ndarray]:
+        """
+        Lazily read count bits starting at slot offset, chunk bits at a time.
+        """
+        chunk = max(depth, chunk - chunk % depth)
+        for start in range(0, count, chunk):
+            yield self.extract(flat, min(chunk, count - start), offset + start // depth, depth)
@@ -0,0 +1,135 @@
+import lzma
+import struct
+import zlib
+
+# Codec ids stored in the payload header
+CODECS = {"none": 0, "zlib": 1, "lzma": 2, "zstd": 3}
+CODEC_NAMES = {v: k for k, v in CODECS.items()}
+
+
+class PayloadCodec:
+    """
+    PayloadCodec class that wraps binary payloads in a small header and (de)compresses them.
+
+    Layout: magic (4 bytes) | codec id (1 byte) | original size (4 bytes, big-endian) | data
+    """
+    MAGIC = b"STGB"
+    HEADER = struct.Struct(">4sBI")
+
+    @staticmethod
+    def _zstd():
+        # zstd is optional: only needed when a job asks for it
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("The zstd codec requires the 'zstandard' package (pip install zstandard)")
+        return zstandard
+
+    @staticmethod
+    def compress(data: bytes, codec: str = "none", level: int | None = None) -> bytes:
+        """
+        Compress raw bytes with the given codec.
+
+        Args:
+            data: Raw payload
+            codec: none, zlib, lzma or zstd
+            level: Codec-specific compression level (zlib 0-9, lzma preset 0-9, zstd 1-22)
+
+        Returns:
+            bytes: Compressed data (without header)
+        """
+        if codec == "none":
+            return bytes(data)
+        if codec == "zlib":
+            return zlib.compress(data, -1 if level is None else level)
+        if codec == "lzma":
+            return lzma.compress(data, preset=6 if level is None else level)
+        if codec == "zstd":
+            return PayloadCodec._zstd().ZstdCompressor(level=3 if level is None else level).compress(data)
+        raise ValueError(f"Unknown codec: {codec}. Choose from {', '.join(CODECS)}")
+
+    @staticmethod
+    def decompress(data: bytes, codec: str, max_size: int | None = None) -> bytes:
+        """
+        Reverse compress().
+
+        Args:
+            data: Compressed data (without header)
+            codec: none, zlib, lzma or zstd
+            max_size: Largest acceptable output; decompression stops one byte past it, so a small
+                payload cannot expand without bound (None: no limit)
+
+        Raises:
+            ValueError: If the output exceeds max_size or the compressed data is truncated
+        """
+        if max_size is None:
+            if codec == "none":
+                return bytes(data)
+            if codec == "zlib":
+                return zlib.decompress(data)
+            if codec == "lzma":
+                return lzma.decompress(data)
+            if codec == "zstd":
+                return PayloadCodec._zstd().ZstdDecompressor().decompress(data)
+            raise ValueError(f"Unknown codec: {codec}")
+
+        limit = max_size + 1
+        if codec == "none":
+            out, complete = bytes(data[:limit]), True
+        elif codec == "zlib":
+            inflater = zlib.decompressobj()
+            out = inflater.decompress(data, limit)
+            complete = inflater.eof
+        elif codec == "lzma":
+            decompressor = lzma.LZMADecompressor()
+            out = decompressor.decompress(data, max_length=limit)
+            complete = decompressor.eof
+        elif codec == "zstd":
+            # max_output_size is ignored when the frame header declares a content size: read in bounded steps
+            reader = PayloadCodec._zstd().ZstdDecompressor().stream_reader(data)
+            pieces, total = [], 0
+            while total < limit:
+                piece = reader.read(limit - total)
+                if not piece:
+                    break
+                pieces.append(piece)
+                total += len(piece)
+            out, complete = b"".join(pieces), True
+        else:
+            raise ValueError(f"Unknown codec: {codec}")
+        if len(out) > max_size:
+            raise ValueError(f"Payload decompresses to more than the {max_size} bytes its header records")
+        if not complete:
+            raise ValueError("Compressed payload is truncated")
+        return out
+
+    @staticmethod
+    def pack(data: bytes, codec: str = "none", level: int | None = None) -> bytes:
+        """
+        Compress a payload and prefix it with the header recording the codec and original size.
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}. Choose from {', '.join(CODECS)}")
+        body = PayloadCodec.compress(data, codec, level)
+        return PayloadCodec.HEADER.pack(PayloadCodec.MAGIC, CODECS[codec], len(data)) + body
+
+    @staticmethod
+    def unpack(blob: bytes) -> bytes:
+        """
+        Check the header of a packed payload and return the original bytes.
+
+        Raises:
+            ValueError: If the header is missing or the payload does not match it
+        """
+        if len(blob) < PayloadCodec.HEADER.size:
+            raise ValueError("Payload too short to hold a header")
+        magic, codec_id, size = PayloadCodec.HEADER.unpack_from(blob)
+        if magic != PayloadCodec.MAGIC:
+            raise ValueError("No binary payload found (bad magic)")
+        if codec_id not in CODEC_NAMES:
+            raise ValueError(f"Unknown codec id {codec_id}")
+        # The recorded size caps decompression: a forged payload cannot expand past it
+        data = PayloadCodec.decompress(blob[PayloadCodec.HEADER.size:], CODEC_NAMES[codec_id], size)
+        if len(data) != size:
+            raise ValueError(f"Payload size mismatch: header says {size} bytes, got {len(data)}")
+        return data
@@ -0,0 +1,139 @@
+import struct
+import zlib
+import numpy as np
+
+from BitPlaneManipulator import BitPlaneEngine, HEADER_BITS, MAX_PAYLOAD_BITS
+
+# Container header of the text modes, stored at 1 bit per sample ahead of the payload
+CONTAINER_BITS = 112
+
+
+class ContainerHeader:
+    """
+    ContainerHeader class that frames the payload of the text modes and parses it back.
+
+    Layout: magic (4 bytes) | version (1 byte) | flags (1 byte) | payload length in bytes (4 bytes)
+    | CRC32 of the payload (4 bytes), big-endian. The low 2 bits of flags hold bits_per_sample - 1.
+
+    Files written before the container carry a bare 32-bit length header and end the message with
+    a delimiter; they parse as legacy headers (crc is None). Legacy lengths always count whole bytes,
+    while the magic read as a legacy header does not, so the two formats cannot be confused.
+    """
+    MAGIC = b"STGC"
+    VERSION = 1
+    HEADER = struct.Struct(">4sBBII")
+    FLAG_BINARY = 0x04
+
+    def __init__(self, length: int, depth: int, offset: int, flags: int = 0, crc: int | None = None):
+        """
+        :param length: Payload length in bits.
+        :param depth: Bits stored per sample in the payload (1-4).
+        :param offset: First sample (or keyed slot) of the payload.
+        :param flags: Container flags (0 for legacy headers).
+        :param crc: CRC32 of the payload bytes, or None for legacy headers.
+        """
+        self.length = length
+        self.depth = depth
+        self.offset = offset
+        self.flags = flags
+        self.crc = crc
+
+    @property
+    def legacy(self) -> bool:
+        return self.crc is None
+
+    @property
+    def binary(self) -> bool:
+        return bool(self.flags & ContainerHeader.FLAG_BINARY)
+
+    @staticmethod
+    def pack(payload: bytes, depth: int = 1, binary: bool = False) -> np.ndarray:
+        """
+        Build the container header of a payload.
+
+        Args:
+            payload: Payload bytes (encoded text, or a PayloadCodec blob when binary)
+            depth: Bits stored per sample in the payload (1-4)
+            binary: Mark the payload as a PayloadCodec blob
+
+        Returns:
+            np.ndarray: uint8 array of CONTAINER_BITS bits, to be embedded at 1 bit per sample
+        """
+        if len(payload) * 8 > MAX_PAYLOAD_BITS:
+            raise ValueError(f"Payload of {len(payload) * 8} bits exceeds the {MAX_PAYLOAD_BITS}-bit limit")
+        flags = (depth - 1) | (ContainerHeader.FLAG_BINARY if binary else 0)
+        raw = ContainerHeader.HEADER.pack(ContainerHeader.MAGIC, ContainerHeader.VERSION, flags,
+                                          len(payload), zlib.crc32(payload))
+        return np.unpackbits(np.frombuffer(raw, dtype=np.uint8))
+
+    @staticmethod
+    def is_container(bits: np.ndarray) -> bool:
+        """
+        Tell from the first HEADER_BITS header bits whether a container header follows.
+        """
+        return np.packbits(bits[:HEADER_BITS]).tobytes() == ContainerHeader.MAGIC
+
+    @staticmethod
+    def parse(bits: np.ndarray) -> "ContainerHeader":
+        """
+        Parse a full container header (CONTAINER_BITS bits).
+
+        Raises:
+            ValueError: If the magic or the version does not match
+        """
+        magic, version, flags, length, crc = ContainerHeader.HEADER.unpack(np.packbits(bits).tobytes())
+        if magic != ContainerHeader.MAGIC:
+            raise ValueError("No container header (bad magic)")
+        if version != ContainerHeader.VERSION:
+            raise ValueError(f"Unsupported container version {version}")
+        return ContainerHeader(length * 8, (flags & 3) + 1, CONTAINER_BITS, flags, crc)
+
+    @staticmethod
+    def parse_legacy(bits: np.ndarray) -> "ContainerHeader":
+        """
+        Parse the bare 32-bit length header of files written before the container.
+        """
+        length, depth = BitPlaneEngine.parse_header(bits)
+        return ContainerHeader(length, depth, HEADER_BITS)
+
+    @staticmethod
+    def read(flat: np.ndarray, layout=BitPlaneEngine) -> "ContainerHeader":
+        """
+        Read the header of either format from a flat sample array, through a bit layout
+        (BitPlaneEngine or KeyedScatter).
+        """
+        bits = layout.extract(flat, HEADER_BITS, 0)
+        if ContainerHeader.is_container(bits):
+            rest = layout.extract(flat, CONTAINER_BITS - HEADER_BITS, HEADER_BITS)
+            return ContainerHeader.parse(np.concatenate((bits, rest)))
+        return ContainerHeader.parse_legacy(bits)
+
+    def fits(self, samples: int) -> bool:
+        """
+        Check that the announced payload fits in a cover of the given number of samples.
+        """
+        if self.legacy and (self.length <= 0 or self.length % 8):
+            return False
+        return self.length <= (samples - self.offset) * self.depth
+
+    def check(self, payload: bytes) -> bytes:
+        """
+        Verify the payload bytes against the header CRC32 (legacy payloads pass unchecked).
+
+        Raises:
+            ValueError: If the payload does not match its checksum
+        """
+        if self.crc is not None and zlib.crc32(payload) != self.crc:
+            raise ValueError("Payload CRC32 mismatch: the hidden data is corrupted")
+        return payload
+
+    def text(self, payload: bytes, encoding: str = "utf-8") -> str:
+        """
+        Verify a container text payload and decode it (undecodable bytes are replaced).
+
+        Raises:
+            ValueError: If the payload is binary or does not match its checksum
+        """
+        if self.binary:
+            raise ValueError("The hidden data is a binary payload; extract it with decode_payload")
+        return self.check(payload).decode(encoding, errors="replace")
@@ -0,0 +1,128 @@
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Union
+
+# Callbacks receiving (stage, seconds, nbytes) for every stage of every job
+_hooks: List[Callable[[str, float, int], None]] = []
+# Record of the job currently being measured by collect(), if any
+_current: contextvars.ContextVar = contextvars.ContextVar("steg_metrics", default=None)
+
+
+class StageTimer:
+    """
+    Handle yielded by stage(); set nbytes inside the block to record how much data the stage handled.
+    """
+    __slots__ = ("name", "nbytes", "seconds")
+
+    def __init__(self, name: str, nbytes: int = 0):
+        self.name = name
+        self.nbytes = nbytes
+        self.seconds = 0.0
+
+
+class MetricsRecord:
+    """
+    Per-stage durations and byte counts of one job, filled in by collect().
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Union[int, float]]] = {}
+        self.seconds = 0.0
+
+    def add(self, name: str, seconds: float, nbytes: int) -> None:
+        # A stage may run more than once per job (e.g. loading cover and secret); accumulate
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "bytes": 0})
+        entry["seconds"] += seconds
+        entry["bytes"] += nbytes
+
+    def as_dict(self) -> Dict[str, object]:
+        return {"seconds": self.seconds, "stages": self.stages}
+
+
+class ErrorCapture(logging.Handler):
+    """
+    Logging handler that keeps the last error logged by the mode classes, which report failures
+    by logging and returning None/False. Only errors of the creating thread are kept, so jobs
+    running on a thread pool do not see each other's errors.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.message = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread == self.thread:
+            self.message = record.getMessage()
+
+
+@contextlib.contextmanager
+def capture_errors() -> Iterator[ErrorCapture]:
+    """
+    Collect the errors logged inside the block; read the last one from .message afterwards.
+    """
+    handler = ErrorCapture()
+    root = logging.getLogger()
+    root.addHandler(handler)
+    try:
+        yield handler
+    finally:
+        root.removeHandler(handler)
+
+
+def add_hook(callback: Callable[[str, float, int], None]) -> None:
+    """
+    Register a callback called as callback(stage, seconds, nbytes) after every stage.
+    """
+    _hooks.append(callback)
+
+
+def remove_hook(callback: Callable[[str, float, int], None]) -> None:
+    """
+    Unregister a callback added with add_hook().
+    """
+    _hooks.remove(callback)
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[MetricsRecord]:
+    """
+    Record the stages run inside the block:
+
+        with StegMetrics.collect() as record:
+            ImageSteganography().encode(...)
+        record.as_dict()
+    """
+    record = MetricsRecord()
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def stage(name: str, nbytes: int = 0) -> Iterator[StageTimer]:
+    """
+    Time a pipeline stage (load, payload, embed, extract, save) and report it to the
+    active collect() record and the registered hooks. Nearly free when nobody listens.
+    """
+    timer = StageTimer(name, nbytes)
+    record = _current.get()
+    if record is None and not _hooks:
+        yield timer
+        return
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - start
+        if record is not None:
+            record.add(name, timer.seconds, timer.nbytes)
+        for hook in _hooks:
+            hook(name, timer.seconds, timer.nbytes)
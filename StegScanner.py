@@ -0,0 +1,268 @@
+import codecs
+import math
+import os
+import struct
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Union
+
+import numpy as np
+
+from AudioSampleManipulator import AudioSampleExtractor
+from BitPlaneManipulator import BitPlaneEngine, HEADER_BITS, MAX_DEPTH, MAX_PAYLOAD_BITS
+from CapacityPlanner import AUDIO_EXTENSIONS, IMAGE_EXTENSIONS
+from ImageRGBManipulator import ImageRowReader
+from PayloadCodec import PayloadCodec
+from StegContainer import CONTAINER_BITS, ContainerHeader
+
+# Samples fed to the chi-square statistic, and leading payload bytes checked for a known format
+SAMPLE_VALUES = 1 << 16
+PEEK_BYTES = 16
+
+
+def chi_square_lsb(values: np.ndarray) -> Union[float, None]:
+    """
+    Westfeld-Pfitzmann chi-square test of the low byte histogram of values.
+
+    Embedding random bits in the LSBs evens out the counts of each value pair (2k, 2k + 1);
+    untouched covers keep uneven pairs.
+
+    Returns:
+        float: Probability that the pairs are as even as for embedded data (near 1: likely
+            embedding, near 0: likely clean), or None if the sample is too small
+    """
+    hist = np.bincount((values & 0xFF).astype(np.intp, copy=False), minlength=256).reshape(128, 2)
+    expected = hist.sum(axis=1) / 2.0
+    # The chi-square approximation needs a handful of observations per pair
+    keep = expected >= 5
+    df = int(np.count_nonzero(keep)) - 1
+    if df < 1:
+        return None
+    chi2 = float(np.sum((hist[keep, 0] - expected[keep]) ** 2 / expected[keep]))
+    # Wilson-Hilferty approximation of the chi-square survival function
+    z = ((chi2 / df) ** (1 / 3) - (1 - 2 / (9 * df))) / math.sqrt(2 / (9 * df))
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _peek_content(flat: np.ndarray, header: ContainerHeader) -> str:
+    """
+    Classify the first payload bytes of a legacy header: a PayloadCodec header ("binary"),
+    UTF-8 ("text") or "unknown".
+    """
+    count = min(header.length, PEEK_BYTES * 8, (flat.size - header.offset) * header.depth)
+    count -= count % 8
+    if count <= 0:
+        return "unknown"
+    head = np.packbits(BitPlaneEngine.extract(flat, count, header.offset, header.depth)).tobytes()
+    if head.startswith(PayloadCodec.MAGIC[:len(head)]):
+        return "binary"
+    try:
+        # Incremental decoding tolerates a multi-byte character cut at the end of the peek
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "text"
+    except UnicodeDecodeError:
+        return "unknown"
+
+
+def _text_header(flat: np.ndarray, total: int) -> Union[Dict[str, object], None]:
+    """
+    Read the text-mode header (container or legacy) from the leading samples and check it
+    against the cover capacity.
+
+    Returns:
+        dict: format, bits, bits_per_sample and content of the announced payload, plus crc_ok
+            for containers whose payload lies within the samples read (else None),
+            or None if implausible
+    """
+    if flat.size < HEADER_BITS:
+        return None
+    try:
+        header = ContainerHeader.read(flat)
+    except (ValueError, struct.error):
+        # Container magic with an unknown version, or a cover too small for the header
+        return None
+    if header.length > MAX_PAYLOAD_BITS or not header.fits(total):
+        return None
+    result = {"format": "legacy" if header.legacy else "container", "bits": header.length,
+              "bits_per_sample": header.depth, "crc_ok": None}
+    if header.legacy:
+        result["content"] = _peek_content(flat, header)
+        return result
+    result["content"] = "binary" if header.binary else "text"
+    if header.offset + BitPlaneEngine.samples_for(header.length, header.depth) <= flat.size:
+        payload = np.packbits(BitPlaneEngine.extract(flat, header.length, header.offset, header.depth)).tobytes()
+        try:
+            header.check(payload)
+            result["crc_ok"] = True
+        except ValueError:
+            result["crc_ok"] = False
+    return result
+
+
+def _image_header(first_row: np.ndarray, height: int) -> Union[Dict[str, object], None]:
+    """
+    Look for an image-in-image size header at every bit depth and channel.
+
+    Returns:
+        dict: width, height, bit_depth and channel of the hidden image, or None if no setting fits
+    """
+    width = first_row.shape[0]
+    if width < 64:
+        return None
+    for bit_depth in range(1, MAX_DEPTH + 1):
+        # (8, 3) bytes: big-endian 32-bit width then height, one column per channel
+        packed = np.packbits((first_row[:64] >> bit_depth) & 1, axis=0).astype(np.uint32)
+        sizes = (packed[0::4] << 24 | packed[1::4] << 16 | packed[2::4] << 8 | packed[3::4])
+        for channel in range(3):
+            sw, sh = int(sizes[0, channel]), int(sizes[1, channel])
+            if 0 < sw <= width and 0 < sh <= height:
+                return {"width": sw, "height": sh, "bit_depth": bit_depth, "channel": channel}
+    return None
+
+
+def _scan_image(path: str, sample: int) -> Dict[str, object]:
+    with ImageRowReader(path) as reader:
+        row_bytes = reader.width * 3
+        total = reader.height * row_bytes
+        # Only the rows holding the header and the chi-square sample are decoded
+        flat = reader.read(stop=-(-(CONTAINER_BITS + sample) // row_bytes)).reshape(-1)
+        result = {"type": "image", "width": reader.width, "height": reader.height,
+                  "image_header": _image_header(flat[:row_bytes].reshape(-1, 3), reader.height)}
+    result["text_header"] = _text_header(flat, total)
+    result["chi2_values"] = max(0, min(sample, flat.size - CONTAINER_BITS))
+    result["chi2_p"] = chi_square_lsb(flat[CONTAINER_BITS:CONTAINER_BITS + sample])
+    return result
+
+
+def _scan_audio(path: str, sample: int) -> Dict[str, object]:
+    with wave.open(path, "rb") as wav:
+        params = wav.getparams()
+        frames = wav.readframes(-(-(CONTAINER_BITS + sample) // params.nchannels))
+    result = {"type": "audio", "channels": params.nchannels, "sampwidth": params.sampwidth,
+              "nframes": params.nframes, "text_header": None, "channel": None}
+    flat = AudioSampleExtractor.view(frames, params.sampwidth, params.nchannels)
+    # Interleaved samples first, then each channel alone (--audio-channel)
+    channels = [None] + (list(range(params.nchannels)) if params.nchannels > 1 else [])
+    for channel in channels:
+        samples = flat if channel is None else flat[channel::params.nchannels]
+        total = params.nframes * AudioSampleExtractor.lanes(params.nchannels, channel)
+        header = _text_header(samples, total)
+        if header is not None:
+            result["text_header"], result["channel"] = header, channel
+            flat = samples
+            break
+    result["chi2_values"] = max(0, min(sample, flat.size - CONTAINER_BITS))
+    result["chi2_p"] = chi_square_lsb(flat[CONTAINER_BITS:CONTAINER_BITS + sample])
+    return result
+
+
+def scan_file(path: str, sample: int = SAMPLE_VALUES, threshold: float = 0.95) -> Dict[str, object]:
+    """
+    Triage one file for payloads of this tool. Executed inside the worker processes.
+
+    Only the leading pixels or samples are read: the text header, the image-in-image header
+    and the chi-square sample all sit at the start of the cover. Keyed payloads scatter their
+    header and are only caught by the chi-square statistic.
+
+    Args:
+        path: Image or WAV file
+        sample: Number of pixel bytes or samples fed to the chi-square statistic
+        threshold: chi2_p at or above which the LSBs count as embedded data
+
+    Returns:
+        dict: path, type, cover size, text_header, image_header (images), chi2_p, suspect,
+            reasons, seconds and error fields
+    """
+    start = time.perf_counter()
+    result: Dict[str, object] = {"path": path}
+    try:
+        if path.lower().endswith(AUDIO_EXTENSIONS):
+            result.update(_scan_audio(path, sample))
+        else:
+            result.update(_scan_image(path, sample))
+        reasons = []
+        header = result["text_header"]
+        if header is not None and header["format"] == "container":
+            # A damaged payload still shows the file went through this tool
+            reasons.append("container:corrupt" if header["crc_ok"] is False else f"container:{header['content']}")
+        elif header is not None and header["format"] == "legacy" and header["content"] != "unknown":
+            reasons.append(f"text-header:{header['content']}")
+        if result.get("image_header") is not None:
+            reasons.append("image-header")
+        if result["chi2_p"] is not None and result["chi2_p"] >= threshold:
+            reasons.append("chi2")
+        result["suspect"] = bool(reasons)
+        result["reasons"] = reasons
+        result["error"] = None
+    except Exception as e:
+        result["suspect"] = False
+        result["reasons"] = []
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _scan_args(args: tuple) -> Dict[str, object]:
+    return scan_file(*args)
+
+
+class StegScanner:
+    """
+    StegScanner class that triages image and WAV archives for embedded payloads on a process pool.
+    """
+
+    def __init__(self, workers: Union[int, None] = None, sample: int = SAMPLE_VALUES, threshold: float = 0.95):
+        """
+        :param workers: Number of worker processes (defaults to the CPU count).
+        :param sample: Pixel bytes or samples per file fed to the chi-square statistic.
+        :param threshold: chi2_p at or above which a file is flagged.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.sample = sample
+        self.threshold = threshold
+
+    @staticmethod
+    def collect(paths: Iterable[str]) -> List[str]:
+        """
+        Expand directories (recursively) into the image and WAV files they contain; files are kept as given.
+        """
+        extensions = IMAGE_EXTENSIONS + AUDIO_EXTENSIONS
+        files = []
+        for path in paths:
+            if not os.path.isdir(path):
+                files.append(path)
+                continue
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(extensions))
+        return files
+
+    def run(self, paths: Iterable[str]) -> Iterator[Dict[str, object]]:
+        """
+        Scan the files on the process pool, yielding results in path order.
+        """
+        jobs = [(path, self.sample, self.threshold) for path in paths]
+        if not jobs:
+            return
+        if self.workers == 1:
+            yield from map(_scan_args, jobs)
+            return
+        # Scans take milliseconds; large chunks keep the pool from idling on IPC
+        chunksize = max(1, min(256, len(jobs) // (self.workers * 4)))
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            yield from pool.map(_scan_args, jobs, chunksize=chunksize)
+
+    @staticmethod
+    def summarize(results: List[Dict[str, object]], elapsed: float) -> Dict[str, object]:
+        """
+        Aggregate per-file results into counts and throughput.
+        """
+        return {
+            "files": len(results),
+            "suspect": sum(1 for r in results if r["suspect"]),
+            "errors": sum(1 for r in results if r["error"]),
+            "seconds": elapsed,
+            "files_per_second": len(results) / elapsed if elapsed else 0.0,
+        }
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import StegMetrics
+from AudioSteganography import AudioSteganography
+from ImageInImageSteganography import ImageInImageSteganography
+from ImageSteganography import ImageSteganography
+
+logger = logging.getLogger(__name__)
+
+# Endpoints: POST /<kind>/<action>
+KINDS = ("image-text", "image-image", "audio-text")
+ACTIONS = ("encode", "decode")
+ENDPOINTS = {"/health", "/metrics"} | {f"/{kind}/{action}" for kind in KINDS for action in ACTIONS}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+# (status, content type, body)
+Response = Tuple[int, str, bytes]
+
+
+def _json(status: int, obj: Dict[str, object]) -> Response:
+    return status, "application/json", json.dumps(obj).encode()
+
+
+def _int_param(params: Dict[str, str], name: str, default: Union[int, None]) -> Union[int, None]:
+    value = params.get(name)
+    return default if value in (None, "") else int(value)
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """
+    Split a multipart/form-data body into its named fields (file or text, as raw bytes).
+    """
+    boundary = None
+    for param in content_type.split(";")[1:]:
+        key, _, value = param.strip().partition("=")
+        if key.lower() == "boundary":
+            boundary = value.strip('"')
+    if not boundary:
+        raise ValueError("multipart/form-data without boundary")
+
+    fields = {}
+    delimiter = b"--" + boundary.encode("latin-1")
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b"--"):
+            break
+        head, sep, data = part.partition(b"\r\n\r\n")
+        if not sep:
+            continue
+        name = None
+        for line in head.decode("latin-1").split("\r\n"):
+            header, _, value = line.partition(":")
+            if header.strip().lower() == "content-disposition":
+                for item in value.split(";"):
+                    key, _, val = item.strip().partition("=")
+                    if key == "name":
+                        name = val.strip('"')
+        if name is not None:
+            # The part data ends with the CRLF that precedes the next delimiter
+            fields[name] = data[:-2] if data.endswith(b"\r\n") else data
+    return fields
+
+
+def handle_job(kind: str, action: str, fields: Dict[str, bytes], params: Dict[str, str]) \
+        -> Tuple[Response, Dict[str, Dict[str, float]]]:
+    """
+    Run one encode/decode request with the in-memory API. Executed on the worker pool.
+
+    Args:
+        kind: image-text, image-image or audio-text
+        action: encode or decode
+        fields: Uploaded data by field name (body holds a raw, non-multipart request body)
+        params: Query string parameters (message, bit_depth, channel, bits_per_sample, key)
+
+    Returns:
+        tuple: (response, per-stage metrics)
+    """
+    def field(*names: str) -> bytes:
+        for name in names:
+            if name in fields:
+                return fields[name]
+        raise ValueError(f"Missing {names[0]} upload")
+
+    def message() -> str:
+        if "message" in fields:
+            return fields["message"].decode("utf-8")
+        if "message" in params:
+            return params["message"]
+        raise ValueError("Missing message (form field or query parameter)")
+
+    def key() -> Union[str, None]:
+        # Prefer the form field: query strings tend to end up in access logs
+        if "key" in fields:
+            return fields["key"].decode("utf-8")
+        return params.get("key") or None
+
+    result = None
+    with StegMetrics.capture_errors() as last_error, StegMetrics.collect() as record:
+        try:
+            if kind == "image-text":
+                steg = ImageSteganography(bits_per_sample=_int_param(params, "bits_per_sample", 1), key=key())
+                if action == "encode":
+                    png = steg.encode_to_bytes(field("cover", "body"), message())
+                    if png is not None:
+                        result = 200, "image/png", png
+                else:
+                    text = steg.decode(field("image", "body"))
+                    if text is not None:
+                        result = _json(200, {"message": text})
+            elif kind == "image-image":
+                steg = ImageInImageSteganography(_int_param(params, "bit_depth", 4), _int_param(params, "channel", 0))
+                if action == "encode":
+                    png = steg.encode_to_bytes(field("cover"), field("secret"))
+                else:
+                    png = steg.decode_to_bytes(field("image", "body"))
+                if png is not None:
+                    result = 200, "image/png", png
+            else:
+                steg = AudioSteganography(channel=_int_param(params, "channel", None),
+                                          bits_per_sample=_int_param(params, "bits_per_sample", 1), key=key())
+                if action == "encode":
+                    wav = steg.encode_to_bytes(field("cover", "body"), message())
+                    if wav is not None:
+                        result = 200, "audio/wav", wav
+                else:
+                    text = steg.decode(field("audio", "body"))
+                    if text is not None:
+                        result = _json(200, {"message": text})
+        except ValueError as e:
+            result = _json(400, {"error": str(e)})
+    if result is None:
+        result = _json(422, {"error": last_error.message or f"{action} failed"})
+    return result, record.stages
+
+
+class ServerMetrics:
+    """
+    Request counters and stage totals exposed on /metrics in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.request_seconds: Dict[str, float] = {}
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_bytes: Dict[str, int] = {}
+        self.rejected = 0
+
+    def observe(self, endpoint: str, status: int, seconds: float) -> None:
+        self.requests[(endpoint, status)] = self.requests.get((endpoint, status), 0) + 1
+        self.request_seconds[endpoint] = self.request_seconds.get(endpoint, 0.0) + seconds
+
+    def observe_stages(self, stages: Dict[str, Dict[str, float]]) -> None:
+        for name, entry in stages.items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + entry["seconds"]
+            self.stage_bytes[name] = self.stage_bytes.get(name, 0) + int(entry["bytes"])
+
+    def render(self, in_flight: int, queued: int) -> str:
+        lines = ["# TYPE stegtool_requests_total counter"]
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'stegtool_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE stegtool_request_seconds_total counter")
+        for endpoint, seconds in sorted(self.request_seconds.items()):
+            lines.append(f'stegtool_request_seconds_total{{endpoint="{endpoint}"}} {seconds:.6f}')
+        lines.append("# TYPE stegtool_stage_seconds_total counter")
+        for name, seconds in sorted(self.stage_seconds.items()):
+            lines.append(f'stegtool_stage_seconds_total{{stage="{name}"}} {seconds:.6f}')
+        lines.append("# TYPE stegtool_stage_bytes_total counter")
+        for name, nbytes in sorted(self.stage_bytes.items()):
+            lines.append(f'stegtool_stage_bytes_total{{stage="{name}"}} {nbytes}')
+        lines.append("# TYPE stegtool_jobs_in_flight gauge")
+        lines.append(f"stegtool_jobs_in_flight {in_flight}")
+        lines.append("# TYPE stegtool_jobs_queued gauge")
+        lines.append(f"stegtool_jobs_queued {queued}")
+        lines.append("# TYPE stegtool_rejected_total counter")
+        lines.append(f"stegtool_rejected_total {self.rejected}")
+        return "\n".join(lines) + "\n"
+
+
+class StegServer:
+    """
+    StegServer class: a small asyncio HTTP/1.1 server running encode/decode jobs on a bounded pool.
+
+    Endpoints (uploads as a raw body or multipart/form-data fields):
+        POST /image-text/encode   cover + message        -> PNG (?bits_per_sample=&key=)
+        POST /image-text/decode   image                  -> {"message": ...} (?key=)
+        POST /image-image/encode  cover + secret         -> PNG (?bit_depth=&channel=)
+        POST /image-image/decode  image                  -> PNG (?bit_depth=&channel=)
+        POST /audio-text/encode   cover + message        -> WAV (?channel=&bits_per_sample=&key=)
+        POST /audio-text/decode   audio                  -> {"message": ...} (?channel=&key=)
+        GET  /metrics, GET /health
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, workers: Union[int, None] = None,
+                 threads: bool = False, max_queue: int = 16, max_body: int = 64 << 20):
+        """
+        :param host: Interface to listen on (localhost by default).
+        :param port: TCP port (0 picks a free one).
+        :param workers: Pool size (defaults to the CPU count).
+        :param threads: Use a thread pool instead of a process pool (NumPy releases the GIL in the bit ops).
+        :param max_queue: Jobs allowed to wait for a free worker; beyond that requests get 503.
+        :param max_body: Largest accepted request body in bytes; larger requests get 413.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.metrics = ServerMetrics()
+        self.pending = 0
+        self.pool: Union[Executor, None] = None
+        self.server: Union[asyncio.base_events.Server, None] = None
+
+    async def start(self) -> None:
+        """
+        Create the worker pool and start listening; self.port holds the bound port afterwards.
+        """
+        if self.threads:
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        else:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info("Serving on http://%s:%d with %d %s", self.host, self.port, self.workers,
+                    "threads" if self.threads else "processes")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve the requests of one (keep-alive) connection.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                start = time.perf_counter()
+                path = urlsplit(target).path
+                if "transfer-encoding" in headers:
+                    status, ctype, body = _json(411, {"error": "Chunked uploads are not supported"})
+                    keep_alive = False
+                else:
+                    length = int(headers.get("content-length", 0))
+                    if length > self.max_body:
+                        status, ctype, body = _json(413, {"error": f"Body larger than {self.max_body} bytes"})
+                        # The unread body would be parsed as the next request
+                        keep_alive = False
+                    else:
+                        data = await reader.readexactly(length)
+                        status, ctype, body = await self._dispatch(method, target, headers, data)
+                # Unknown paths share one label so scanners cannot blow up the metric cardinality
+                endpoint = path if path in ENDPOINTS else "other"
+                self.metrics.observe(endpoint, status, time.perf_counter() - start)
+
+                head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                        f"Content-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+                if status == 503:
+                    head += "Retry-After: 1\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Client went away or sent something that is not HTTP
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, headers: Dict[str, str], data: bytes) -> Response:
+        """
+        Route a request and run encode/decode jobs on the pool.
+        """
+        url = urlsplit(target)
+        if url.path == "/health":
+            return _json(200, {"status": "ok"})
+        if url.path == "/metrics":
+            in_flight = min(self.pending, self.workers)
+            text = self.metrics.render(in_flight, self.pending - in_flight)
+            return 200, "text/plain; version=0.0.4", text.encode()
+
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in KINDS or parts[1] not in ACTIONS:
+            return _json(404, {"error": f"Unknown endpoint {url.path}"})
+        if method != "POST":
+            return _json(405, {"error": "Use POST"})
+
+        # Backpressure: refuse work instead of queueing it without bound
+        if self.pending >= self.workers + self.max_queue:
+            self.metrics.rejected += 1
+            return _json(503, {"error": "Server busy, retry later"})
+
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        content_type = headers.get("content-type", "")
+        try:
+            if content_type.lower().startswith("multipart/form-data"):
+                fields = parse_multipart(content_type, data)
+            else:
+                fields = {"body": data}
+        except ValueError as e:
+            return _json(400, {"error": str(e)})
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            response, stages = await loop.run_in_executor(self.pool, handle_job, parts[0], parts[1], fields, params)
+            self.metrics.observe_stages(stages)
+            return response
+        except Exception as e:
+            logger.error("Error during %s: %s", url.path, e)
+            return _json(500, {"error": str(e)})
+        finally:
+            self.pending -= 1
@@ -0,0 +1,148 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar, Union
+
+import numpy as np
+
+from BitPlaneManipulator import BitPlaneEngine
+from KeyedScatter import KeyedScatter
+
+T = TypeVar("T")
+
+# Smallest span handed to one thread (payload bits, or bytes of image rows): below it, the
+# handoff costs more than the NumPy work it moves off the calling thread
+MIN_SPAN = 1 << 20
+
+_END = object()
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def spans(count: int, threads: int, unit: int = 1, min_size: int = MIN_SPAN) -> list[tuple[int, int]]:
+    """
+    Split [0, count) into at most threads contiguous (start, stop) spans of at least min_size,
+    every bound but the last a multiple of unit.
+    """
+    if count <= 0:
+        return []
+    parts = max(1, min(threads, count // max(1, min_size)))
+    step = -(-count // parts)
+    step += (-step) % unit
+    return [(start, min(count, start + step)) for start in range(0, count, step)]
+
+
+def run_spans(fn: Callable[[int, int], None], count: int, threads: int, unit: int = 1,
+              min_size: int = MIN_SPAN) -> None:
+    """
+    Call fn(start, stop) over contiguous spans of [0, count), on a thread pool when threads > 1.
+
+    NumPy releases the GIL inside its array kernels, so spans working on disjoint slices run in parallel.
+    """
+    parts = spans(count, threads, unit, min_size)
+    if len(parts) <= 1:
+        for start, stop in parts:
+            fn(start, stop)
+        return
+    with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+        # list() re-raises the first exception raised by any span
+        list(pool.map(lambda span: fn(*span), parts))
+
+
+def prefetch(items: Iterable[T], ahead: int = 1) -> Iterator[T]:
+    """
+    Iterate items on a background thread running up to ahead items ahead of the consumer, so producing
+    the next item (decoding a band, reading frames) overlaps with processing the current one.
+
+    Exceptions of the producer are re-raised in the consumer. Closing the iterator early stops
+    the producer after the item it is working on.
+    """
+    pending = queue.Queue(maxsize=ahead)
+    stop = threading.Event()
+
+    def produce() -> None:
+        try:
+            for item in items:
+                pending.put(item)
+                if stop.is_set():
+                    return
+        except BaseException as e:
+            pending.put(_Failure(e))
+            return
+        pending.put(_END)
+
+    thread = threading.Thread(target=produce, name="steg-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on the full queue
+        while thread.is_alive():
+            try:
+                pending.get(timeout=0.05)
+            except queue.Empty:
+                pass
+
+
+class ThreadedLayout:
+    """
+    Bit layout (BitPlaneEngine or KeyedScatter) whose embed and extract split the payload into
+    contiguous chunks processed on a thread pool.
+
+    Chunks start on whole samples (or keyed slots), so each one touches its own samples and the
+    result is identical to the wrapped layout. embed, extract and extract_chunks keep its signatures.
+    """
+
+    def __init__(self, layout: Union[BitPlaneEngine, KeyedScatter], threads: int):
+        """
+        :param layout: BitPlaneEngine, or a KeyedScatter bound to the cover.
+        :param threads: Maximum number of chunks processed at once.
+        """
+        self.layout = layout
+        self.threads = threads
+
+    def embed(self, flat: np.ndarray, bits: np.ndarray, offset: int = 0, depth: int = 1,
+              cleared: np.ndarray | None = None) -> None:
+        """
+        Overwrite the depth low bits of the samples holding bits, starting at offset, in place.
+        """
+        def embed_span(start: int, stop: int) -> None:
+            self.layout.embed(flat, bits[start:stop], offset + start // depth, depth, cleared)
+
+        run_spans(embed_span, len(bits), self.threads, depth)
+
+    def extract(self, flat: np.ndarray, count: int, offset: int = 0, depth: int = 1) -> np.ndarray:
+        """
+        Read count bits (depth per sample) starting at offset.
+
+        Returns:
+            np.ndarray: uint8 array of 0s and 1s
+        """
+        bits = np.empty(count, dtype=np.uint8)
+
+        def extract_span(start: int, stop: int) -> None:
+            bits[start:stop] = self.layout.extract(flat, stop - start, offset + start // depth, depth)
+
+        run_spans(extract_span, count, self.threads, depth)
+        return bits
+
+    def extract_chunks(self, flat: np.ndarray, count: int, offset: int = 0, chunk: int = 1 << 19,
+                       depth: int = 1) -> Iterator[np.ndarray]:
+        """
+        Lazily read count bits starting at offset, chunk bits at a time.
+        """
+        chunk = max(depth, chunk - chunk % depth)
+        for start in range(0, count, chunk):
+            yield self.extract(flat, min(chunk, count - start), offset + start // depth, depth)
@@ -1,4 +1,6 @@
-from typing import List
+import numpy as np
+from typing import Iterable
+
 
 class TextBitExtractor:
     def __init__(self, encoding: str = 'utf-8', delimiter: str = ''):
@@ -12,40 +14,103 @@ class TextBitExtractor:
         self.delimiter = delimiter
 
     @staticmethod
-    def encode_text_to_bits(self, text : str) -> List[int]:
+    def encode_text_to_bits(self, text : str) -> np.ndarray:
         """
-        Convert the text to a flat list of bits (MSB first for each byte).
+        Convert the text to a flat array of bits (MSB first for each byte).
         :param text: The text to convert.
         :param self: The instance of the class.
-        :return: List of 0s and 1s representing the text.
+        :return: uint8 array of 0s and 1s representing the text.
         """
         full_text = (text + self.delimiter).encode(self.encoding)
-        bit_list = []
-        for byte in full_text:
-            for bit in range(7, -1, -1):
-                bit_list.append((byte >> bit) & 1)
-        return bit_list
+        return np.unpackbits(np.frombuffer(full_text, dtype=np.uint8))
 
 
 class TextGenerator:
     @staticmethod
-    def decode_bits_to_text(bits: List[int]) -> str:
+    def decode_bits_to_text(bits: np.ndarray, encoding: str = 'utf-8') -> str:
         """
-        Convert a list of bits (MSB-first) into a UTF-8 string.
+        Convert an array of bits (MSB-first) into a string.
 
         Args:
-            bits: List of bits (0s and 1s)
+            bits: Array of bits (0s and 1s); an incomplete byte at the end is ignored
+            encoding: Text encoding of the bytes
 
         Returns:
-            Decoded string
+            Decoded string (undecodable bytes are replaced)
+        """
+        bits = np.asarray(bits, dtype=np.uint8)
+        usable = bits.size - bits.size % 8
+        return np.packbits(bits[:usable]).tobytes().decode(encoding, errors='replace')
+
+    @staticmethod
+    def decode_until_delimiter(bit_chunks: Iterable[np.ndarray], delimiter: str,
+                               encoding: str = 'utf-8') -> tuple[str, bool]:
         """
-        chars = []
-        for i in range(0, len(bits), 8):
-            byte = bits[i:i + 8]
-            if len(byte) < 8:
-                # Ignore incomplete byte at the end
+        Decode a stream of bit chunks, stopping as soon as the delimiter is seen.
+
+        bit_chunks may be a lazy generator; chunks after the one holding the delimiter are never requested.
+
+        Args:
+            bit_chunks: Iterable of bit arrays (MSB-first)
+            delimiter: String marking the end of the message
+            encoding: Text encoding of the message
+
+        Returns:
+            tuple: (text before the delimiter, True if the delimiter was found)
+        """
+        scanner = DelimiterScanner(delimiter, encoding)
+        for chunk in bit_chunks:
+            if scanner.feed(chunk):
                 break
-            byte_str = ''.join(str(bit) for bit in byte)
-            byte_val = int(byte_str, 2)
-            chars.append(chr(byte_val))
-        return ''.join(chars)
+        return scanner.text(), scanner.found
+
+
+class DelimiterScanner:
+    """
+    Incrementally packs message bits into bytes and stops at the first delimiter.
+    """
+    def __init__(self, delimiter: str, encoding: str = 'utf-8'):
+        """
+        :param delimiter: String marking the end of the message.
+        :param encoding: Text encoding of the message.
+        """
+        self.encoding = encoding
+        self.needle = delimiter.encode(encoding)
+        self.data = bytearray()
+        self.pending = np.empty(0, dtype=np.uint8)
+        self.end = -1
+
+    @property
+    def found(self) -> bool:
+        return self.end >= 0
+
+    def feed(self, bits: np.ndarray) -> bool:
+        """
+        Append the next chunk of bits (MSB-first) and search the new bytes for the delimiter.
+
+        Args:
+            bits: Next array of 0s and 1s
+
+        Returns:
+            bool: True once the delimiter has been found; further chunks are not needed
+        """
+        if self.found:
+            return True
+        bits = np.asarray(bits, dtype=np.uint8)
+        if self.pending.size:
+            bits = np.concatenate((self.pending, bits))
+        usable = bits.size - bits.size % 8
+        self.pending = bits[usable:]
+        # Only bytes that could complete a new match need to be searched again
+        start = max(0, len(self.data) - len(self.needle) + 1)
+        self.data += np.packbits(bits[:usable]).tobytes()
+        if self.needle:
+            self.end = self.data.find(self.needle, start)
+        return self.found
+
+    def text(self) -> str:
+        """
+        Decoded text before the delimiter (or everything fed so far when it was not found).
+        """
+        data = self.data[:self.end] if self.found else self.data
+        return data.decode(self.encoding, errors='replace')
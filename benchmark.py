@@ -0,0 +1,947 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the steganography modes.
+
+Run with -h to list the available benchmarks.
+"""
+import argparse
+import asyncio
+import hashlib
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import PIL
+from PIL import Image
+
+import StegMetrics
+from AudioSampleManipulator import AudioSampleExtractor
+from AudioSteganography import AudioSteganography
+from BitPlaneManipulator import BitPlaneEngine
+from CoverCache import CoverCache
+from ImageInImageSteganography import ImageInImageSteganography
+from ImageRGBManipulator import ImageRGBExtractor, ImageRowReader, ImageWriter
+from ImageSteganography import ImageSteganography
+from KeyedScatter import KeyedScatter
+from PayloadCodec import PayloadCodec
+from StegContainer import CONTAINER_BITS, ContainerHeader
+from StegScanner import StegScanner
+from StegServer import StegServer
+
+# Cover and payload sizes per preset: image megapixels, WAV seconds, WAV sample widths, payload bytes
+PRESETS = {
+    "quick": {"megapixels": [0.1, 1], "seconds": [10, 60], "sampwidths": [2],
+              "payload_bytes": [1024, 65536]},
+    "standard": {"megapixels": [0.1, 1, 10], "seconds": [10, 600], "sampwidths": [1, 2, 3],
+                 "payload_bytes": [1024, 65536, 1 << 20]},
+    "full": {"megapixels": [0.1, 1, 10, 50], "seconds": [10, 600, 3600], "sampwidths": [1, 2, 3, 4],
+             "payload_bytes": [1024, 65536, 1 << 20, 4 << 20]},
+}
+
+
+def make_wav(path: str, seconds: float, rate: int = 44100, channels: int = 1, chunk_frames: int = 1 << 20,
+             sampwidth: int = 2) -> str:
+    """
+    Write a synthetic PCM WAV file filled with noise, chunk by chunk.
+    """
+    rng = np.random.default_rng(0)
+    remaining = int(seconds * rate)
+    with wave.open(path, 'wb') as out:
+        out.setnchannels(channels)
+        out.setsampwidth(sampwidth)
+        out.setframerate(rate)
+        while remaining > 0:
+            n = min(chunk_frames, remaining)
+            out.writeframes(rng.integers(0, 256, n * channels * sampwidth, dtype=np.uint8).tobytes())
+            remaining -= n
+    return path
+
+
+def make_png(path: str, megapixels: float) -> str:
+    """
+    Write a synthetic 4:3 RGB PNG of about the given size: a gradient with mild noise, like a photo.
+    """
+    h = max(1, int(np.sqrt(megapixels * 1e6 * 3 / 4)))
+    w = max(64, int(h * 4 / 3))
+    rng = np.random.default_rng(0)
+    y = np.linspace(0, 200, h, dtype=np.float32)[:, None, None]
+    x = np.linspace(0, 200, w, dtype=np.float32)[None, :, None]
+    c = np.array([0.0, 20.0, 40.0], dtype=np.float32)[None, None, :]
+    arr = (y * 0.5 + x * 0.5 + c).astype(np.uint8)
+    arr += rng.integers(0, 16, arr.shape, dtype=np.uint8)
+    Image.fromarray(arr, mode='RGB').save(path, format='PNG', compress_level=1)
+    return path
+
+
+def measure(fn, *args):
+    """
+    Run fn(*args) under tracemalloc.
+
+    Returns:
+        tuple: (result, seconds, peak traced bytes)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def full_read_decode(audio_path: str) -> str:
+    """
+    Reference decode that loads every frame, as the non-streaming path did, then reads the
+    container header and checks the payload like the streaming decoder.
+    """
+    with wave.open(audio_path, 'rb') as wav:
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    header = ContainerHeader.read(samples)
+    bits = BitPlaneEngine.extract(samples, header.length, header.offset, header.depth)
+    return header.text(np.packbits(bits).tobytes())
+
+
+def bench_audio_decode(args) -> None:
+    """
+    Compare time and peak memory of a full-read decode with the streaming decode.
+    """
+    message = "x" * args.message_bytes
+    with tempfile.TemporaryDirectory() as tmp:
+        cover = make_wav(os.path.join(tmp, 'cover.wav'), args.seconds, channels=args.channels)
+        stego = os.path.join(tmp, 'stego.wav')
+        AudioSteganography().encode(cover, message, stego)
+        size_mb = os.path.getsize(stego) / 1e6
+
+        print(f"WAV: {args.seconds}s, {args.channels} channel(s), {size_mb:.1f} MB, payload {args.message_bytes} bytes")
+        full, t, peak = measure(full_read_decode, stego)
+        print(f"  full read : {t * 1e3:9.2f} ms  peak {peak / 1e6:9.2f} MB")
+        streamed, t, peak = measure(AudioSteganography().decode, stego)
+        assert full == streamed == message
+        print(f"  streaming : {t * 1e3:9.2f} ms  peak {peak / 1e6:9.2f} MB")
+
+
+def make_log_payload(size: int) -> bytes:
+    """
+    Build a compressible JSON-lines payload of roughly size bytes.
+    """
+    rng = np.random.default_rng(0)
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = json.dumps({"ts": 1700000000 + i, "level": ["INFO", "WARN", "ERROR"][rng.integers(3)],
+                           "path": f"/api/v1/items/{rng.integers(1000)}", "ms": int(rng.integers(1, 500))})
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    return ("\n".join(lines) + "\n").encode()[:size]
+
+
+def bench_payload_compression(args) -> None:
+    """
+    Time compress+embed and extract+decompress of a log payload per codec and level.
+    """
+    data = make_log_payload(args.payload_bytes)
+    # Cover just large enough for the uncompressed payload, its codec header and the container header
+    side = int(np.ceil(np.sqrt(((len(data) + PayloadCodec.HEADER.size) * 8 + CONTAINER_BITS) / 3)))
+    cover = np.random.default_rng(1).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    steg = ImageSteganography()
+
+    codecs = [("none", [None]), ("zlib", [1, 6, 9]), ("lzma", [0, 6, 9])]
+    try:
+        import zstandard  # noqa: F401
+        codecs.append(("zstd", [1, 3, 19]))
+    except ImportError:
+        print("(zstandard not installed, skipping zstd)")
+
+    print(f"Payload: {len(data)} bytes of JSON lines, cover {side}x{side}")
+    print(f"{'codec':>6} {'level':>5} {'packed':>10} {'pixels':>10} {'embed ms':>9} {'extract ms':>10}")
+    for codec, levels in codecs:
+        for level in levels:
+            def embed():
+                packed = PayloadCodec.pack(data, codec, level)
+                return packed, steg._embed_bits(cover, packed, binary=True)
+
+            def extract(stego):
+                flat, header, layout = steg._read_header(stego)
+                bits = layout.extract(flat, header.length, header.offset, header.depth)
+                return PayloadCodec.unpack(header.check(np.packbits(bits).tobytes()))
+
+            (packed, stego), t_embed, _ = measure(embed)
+            restored, t_extract, _ = measure(extract, stego)
+            assert restored == data
+            touched = (len(packed) * 8 + CONTAINER_BITS) / 3
+            print(f"{codec:>6} {str(level):>5} {len(packed):>10} {touched:>10.0f} "
+                  f"{t_embed * 1e3:>9.2f} {t_extract * 1e3:>10.2f}")
+
+
+def bench_bits_per_sample(args) -> None:
+    """
+    Embed/extract time and modified elements of one payload at 1-4 bits per sample.
+    """
+    data = np.random.default_rng(2).integers(0, 2, args.payload_bytes * 8, dtype=np.uint8)
+    side = int(np.ceil(np.sqrt((data.size + CONTAINER_BITS) / 3)))
+    cover = np.random.default_rng(1).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    print(f"Payload: {args.payload_bytes} bytes, cover {side}x{side}")
+    print(f"{'bits':>4} {'modified':>10} {'embed ms':>9} {'extract ms':>10}")
+    for depth in range(1, 5):
+        steg = ImageSteganography(bits_per_sample=depth)
+        stego, t_embed, _ = measure(steg._embed_bits, cover, np.packbits(data).tobytes())
+        flat = stego.reshape(-1)
+        bits, t_extract, _ = measure(BitPlaneEngine.extract, flat, data.size, CONTAINER_BITS, depth)
+        assert np.array_equal(bits, data)
+        modified = int(np.count_nonzero(stego != cover))
+        print(f"{depth:>4} {modified:>10} {t_embed * 1e3:>9.2f} {t_extract * 1e3:>10.2f}")
+
+
+def bench_keyed_scatter(args) -> None:
+    """
+    Keyed scatter cost for one payload over growing covers, against a full permutation of the cover.
+    """
+    data = np.random.default_rng(2).integers(0, 2, args.payload_bytes * 8, dtype=np.uint8)
+    print(f"Payload: {args.payload_bytes} bytes ({data.size + CONTAINER_BITS} slots)")
+    print(f"{'cover':>12} {'embed ms':>9} {'extract ms':>10} {'peak MB':>8} "
+          f"{'perm ms':>8} {'perm MB':>8}")
+    for size in args.samples:
+        cover = np.random.default_rng(1).integers(0, 256, size, dtype=np.uint8)
+        layout = KeyedScatter("benchmark", size)
+        _, t_embed, peak = measure(layout.embed, cover, data, CONTAINER_BITS)
+        bits, t_extract, _ = measure(layout.extract, cover, data.size, CONTAINER_BITS)
+        assert np.array_equal(bits, data)
+        # What naive scattering costs before writing a single bit
+        _, t_perm, perm_peak = measure(lambda: np.random.default_rng(0).permutation(size)[:data.size + CONTAINER_BITS])
+        print(f"{size:>12} {t_embed * 1e3:>9.2f} {t_extract * 1e3:>10.2f} {peak / 1e6:>8.1f} "
+              f"{t_perm * 1e3:>8.2f} {perm_peak / 1e6:>8.1f}")
+        del cover
+
+
+# Output writers compared by the writers benchmark: (label, ImageWriter arguments)
+WRITERS = [
+    ("png level 0", ("PNG", 0, False)),
+    ("png level 1", ("PNG", 1, False)),
+    ("png level 6", ("PNG", None, False)),
+    ("png level 9", ("PNG", 9, False)),
+    ("png optimize", ("PNG", 9, True)),
+    ("tiff", ("TIFF", None, False)),
+    ("bmp", ("BMP", None, False)),
+    ("npy", ("NPY", None, False)),
+]
+
+
+def bench_writers(args) -> None:
+    """
+    Write time, file size and load-back time of a stego image per output writer.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        cover = make_png(os.path.join(tmp, 'cover.png'), args.megapixels)
+        stego = ImageSteganography().encode_to_array(cover, "x" * args.message_bytes)
+        print(f"Image: {stego.shape[1]}x{stego.shape[0]}, {stego.nbytes / 1e6:.1f} MB raw")
+        print(f"{'writer':<13} {'write ms':>9} {'size MB':>8} {'ratio':>6} {'load ms':>9}")
+        for label, options in WRITERS:
+            if label == "png optimize" and not args.optimize:
+                continue
+            writer = ImageWriter(*options)
+            out = os.path.join(tmp, 'stego.' + options[0].lower())
+            _, t_write, _ = measure(writer.save, stego, out)
+            size = os.path.getsize(out)
+            extractor = ImageRGBExtractor(out)
+            _, t_load, _ = measure(extractor.load)
+            assert np.array_equal(extractor.arr, stego)
+            print(f"{label:<13} {t_write * 1e3:>9.1f} {size / 1e6:>8.2f} {size / stego.nbytes:>6.2f} "
+                  f"{t_load * 1e3:>9.1f}")
+
+
+def bench_serve(args) -> None:
+    """
+    Load-test the HTTP service on localhost: throughput, latency percentiles and 503s per concurrency.
+    """
+    server = StegServer(port=0, workers=args.workers, threads=args.threads, max_queue=args.max_queue)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(make_png(os.path.join(tmp, 'cover.png'), args.megapixels), 'rb') as f:
+            cover = f.read()
+    target = "/image-text/encode?message=" + "x" * args.message_bytes
+    print(f"Cover {len(cover) / 1e6:.2f} MB PNG, {server.workers} {'threads' if args.threads else 'processes'}, "
+          f"max queue {args.max_queue}")
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'200':>6} {'503':>6}")
+    try:
+        for clients in args.clients:
+            latencies, statuses = [], []
+
+            def client():
+                conn = http.client.HTTPConnection("127.0.0.1", server.port)
+                for _ in range(args.requests):
+                    start = time.perf_counter()
+                    conn.request("POST", target, cover)
+                    response = conn.getresponse()
+                    response.read()
+                    latencies.append(time.perf_counter() - start)
+                    statuses.append(response.status)
+                conn.close()
+
+            threads = [threading.Thread(target=client) for _ in range(clients)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            ms = np.sort(latencies) * 1e3
+            print(f"{clients:>7} {len(ms) / elapsed:>8.1f} {ms[len(ms) // 2]:>8.1f} {ms[int(len(ms) * 0.95)]:>8.1f} "
+                  f"{statuses.count(200):>6} {statuses.count(503):>6}")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def _run_image_bands(cover: str, secret: str, output: str, band_rows: int | None) -> dict:
+    """
+    Encode and decode one image-in-image pair. Runs in a fresh process so peak RSS belongs to this run.
+    """
+    steg = ImageInImageSteganography(band_rows=band_rows)
+    start = time.perf_counter()
+    assert steg.encode(cover, secret, output)
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    assert steg.decode(output, output + ".secret.png")
+    return {"encode": encode, "decode": time.perf_counter() - start, "peak_rss_bytes": _peak_rss_bytes()}
+
+
+def _same_pixels(a: str, b: str, rows: int = 256) -> bool:
+    with ImageRowReader(a) as ra, ImageRowReader(b) as rb:
+        return all(np.array_equal(x, y) for (_, x), (_, y) in zip(ra.iter_bands(rows), rb.iter_bands(rows)))
+
+
+def bench_image_bands(args) -> None:
+    """
+    Peak RSS and time of image-in-image encode/decode, whole-image versus row bands.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    cover = make_png(os.path.join(workdir, "cover.png"), args.megapixels)
+    secret = make_png(os.path.join(workdir, "secret.png"), args.megapixels / 4)
+    reference = os.path.join(workdir, "whole.png")
+    print(f"Cover {args.megapixels} MP PNG, secret {args.megapixels / 4} MP PNG")
+    print(f"{'band rows':>9} {'encode s':>9} {'decode s':>9} {'RSS MB':>8} {'identical':>9}")
+    ctx = multiprocessing.get_context("spawn")
+    for band_rows in [None] + args.band_rows:
+        output = reference if band_rows is None else os.path.join(workdir, f"band{band_rows}.png")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(_run_image_bands, cover, secret, output, band_rows).result()
+        rss = r["peak_rss_bytes"] / 1e6 if r["peak_rss_bytes"] else float("nan")
+        identical = "-" if band_rows is None else str(_same_pixels(reference, output)
+                                                       and _same_pixels(reference + ".secret.png",
+                                                                        output + ".secret.png"))
+        print(f"{str(band_rows or 'whole'):>9} {r['encode']:>9.2f} {r['decode']:>9.2f} {rss:>8.1f} {identical:>9}")
+
+
+def bench_partial_decode(args) -> None:
+    """
+    Text decode time from one large stego PNG versus message size, against decoding the whole image.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    cover = make_png(os.path.join(workdir, "cover.png"), args.megapixels)
+    _, t_whole, _ = measure(ImageRGBExtractor(cover).load)
+    print(f"Cover {args.megapixels} MP PNG, whole-image decode {t_whole:.3f} s")
+    print(f"{'message':>10} {'decode s':>9} {'peak MB':>8} {'vs whole':>8}")
+    stego = os.path.join(workdir, "stego.png")
+    for size in args.message_bytes:
+        message = "x" * size
+        assert ImageSteganography().encode(cover, message, stego)
+        text, t_decode, peak = measure(ImageSteganography().decode, stego)
+        assert text == message
+        print(f"{size:>10} {t_decode:>9.3f} {peak / 1e6:>8.1f} {t_decode / t_whole:>7.1%}")
+
+
+def bench_scan(args) -> None:
+    """
+    Scan throughput over a directory of covers, half of which carry a text payload.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    cover = make_png(os.path.join(workdir, "cover.png"), args.megapixels)
+    archive = os.path.join(workdir, "archive")
+    os.makedirs(archive)
+    steg = ImageSteganography()
+    for i in range(args.files):
+        path = os.path.join(archive, f"{i:06d}.png")
+        if i % 2:
+            assert steg.encode(cover, f"message {i}", path)
+        else:
+            shutil.copyfile(cover, path)
+    scanner = StegScanner(args.workers)
+    start = time.perf_counter()
+    results = list(scanner.run(StegScanner.collect([archive])))
+    elapsed = time.perf_counter() - start
+    summary = StegScanner.summarize(results, elapsed)
+    reasons = {}
+    for r in results:
+        for reason in r["reasons"]:
+            reasons[reason] = reasons.get(reason, 0) + 1
+    print(f"{args.files} x {args.megapixels} MP PNG, {scanner.workers} workers: {elapsed:.2f} s, "
+          f"{summary['files_per_second']:.0f} files/s, {summary['errors']} errors")
+    # The synthetic covers carry uniform noise, so chi2 also flags the clean copies
+    print(f"{summary['suspect']} flagged ({args.files // 2} stego), by reason: {json.dumps(reasons)}")
+    shutil.rmtree(workdir)
+
+
+def _importtime(argv: list) -> tuple:
+    """
+    Run stegtool.py under python -X importtime.
+
+    Returns:
+        tuple: (wall seconds, total import microseconds, names of the imported modules, exit status)
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stegtool.py")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", script, *argv], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    total, modules = 0, set()
+    # "import time: self [us] | cumulative | imported package", nested imports indented further
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return elapsed, total, modules, proc.returncode
+
+
+def bench_importtime(args) -> None:
+    """
+    CLI startup cost per mode: wall time and import time of stegtool.py, and whether NumPy
+    and Pillow were loaded.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    cover = make_png(os.path.join(workdir, "cover.png"), 0.1)
+    stego_png = os.path.join(workdir, "stego.png")
+    assert ImageSteganography().encode(cover, "hello", stego_png)
+    wav = make_wav(os.path.join(workdir, "cover.wav"), 1)
+    stego_wav = os.path.join(workdir, "stego.wav")
+    assert AudioSteganography().encode(wav, "hello", stego_wav)
+    out = os.path.join(workdir, "out")
+    cases = {
+        "-h": ["-h"],
+        "modes": ["modes"],
+        "audio-text decode": ["-q", "-m", "decode", "-a", stego_wav, "_", out],
+        "image-text decode": ["-q", "-m", "decode", "-i", stego_png, "_", out],
+    }
+    print(f"{'command':<20} {'wall ms':>8} {'import ms':>10} {'modules':>8}  numpy  PIL  importlib.metadata")
+    for name, argv in cases.items():
+        runs = [_importtime(argv) for _ in range(args.repeat)]
+        assert all(run[3] == 0 for run in runs), f"{name} failed"
+        # The fastest run has the least scheduling noise
+        elapsed, total, modules, _ = min(runs, key=lambda run: run[0])
+        loaded = ["yes" if top in modules else "no" for top in ("numpy", "PIL", "importlib.metadata")]
+        print(f"{name:<20} {elapsed * 1e3:>8.1f} {total / 1e3:>10.1f} {len(modules):>8}  "
+              f"{loaded[0]:<5}  {loaded[1]:<3}  {loaded[2]}")
+    shutil.rmtree(workdir)
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def bench_threads(args) -> None:
+    """
+    Wall time of each mode on one large cover at 1-N threads. Every output must match the
+    single-threaded one.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    cover = make_png(os.path.join(workdir, "cover.png"), args.megapixels)
+    secret = make_png(os.path.join(workdir, "secret.png"), args.megapixels / 4)
+    wav = make_wav(os.path.join(workdir, "cover.wav"), args.seconds, channels=2)
+    message = make_log_payload(args.message_bytes).decode()
+    stego = {name: os.path.join(workdir, f"stego-{name}") for name in ("text.png", "keyed.png", "image.png", "text.wav")}
+    assert ImageSteganography(bits_per_sample=4).encode(cover, message, stego["text.png"])
+    assert ImageSteganography(bits_per_sample=4, key="bench").encode(cover, message, stego["keyed.png"])
+    assert ImageInImageSteganography(band_rows=256).encode(cover, secret, stego["image.png"])
+    assert AudioSteganography(bits_per_sample=4).encode(wav, message, stego["text.wav"])
+
+    # Each case returns something comparable across thread counts: a digest or the decoded text
+    def image_text(t, out, key=None, decode=False):
+        steg = ImageSteganography(bits_per_sample=4, key=key, threads=t)
+        if decode:
+            return steg.decode(stego["keyed.png" if key else "text.png"])
+        assert steg.encode(cover, message, out)
+        return _digest(out)
+
+    def image_image(t, out, decode=False):
+        steg = ImageInImageSteganography(band_rows=256, threads=t)
+        assert steg.decode(stego["image.png"], out) if decode else steg.encode(cover, secret, out)
+        return _digest(out)
+
+    def audio_text(t, out, decode=False):
+        steg = AudioSteganography(bits_per_sample=4, threads=t)
+        if decode:
+            return steg.decode(stego["text.wav"])
+        assert steg.encode(wav, message, out)
+        return _digest(out)
+
+    cases = {
+        "image-text encode": lambda t, out: image_text(t, out + ".png"),
+        "image-text decode": lambda t, out: image_text(t, out, decode=True),
+        "keyed encode": lambda t, out: image_text(t, out + ".png", key="bench"),
+        "keyed decode": lambda t, out: image_text(t, out, key="bench", decode=True),
+        "image-image encode": lambda t, out: image_image(t, out + ".png"),
+        "image-image decode": lambda t, out: image_image(t, out + ".png", decode=True),
+        "audio-text encode": lambda t, out: audio_text(t, out + ".wav"),
+        "audio-text decode": lambda t, out: audio_text(t, out, decode=True),
+    }
+    print(f"{args.megapixels} MP PNG, {args.seconds} s stereo WAV, {len(message)} B message at 4 bits per sample, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'case':<20}" + "".join(f"{f'{t} thr s':>10}" for t in args.threads) + f"{'speedup':>9}")
+    for name, run in cases.items():
+        times, expected = [], None
+        for t in args.threads:
+            out = os.path.join(workdir, f"out-{t}")
+            start = time.perf_counter()
+            result = run(t, out)
+            times.append(time.perf_counter() - start)
+            if expected is None:
+                expected = result
+            assert result == expected, f"{name}: output at {t} threads differs from {args.threads[0]} thread(s)"
+        print(f"{name:<20}" + "".join(f"{s:>10.2f}" for s in times) + f"{times[0] / min(times):>8.2f}x")
+    shutil.rmtree(workdir)
+
+
+def bench_cover_cache(args) -> None:
+    """
+    Per-payload time of embedding many messages into the same cover, with and without a CoverCache.
+    Outputs must be identical.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    covers = {"image-text": make_png(os.path.join(workdir, "cover.png"), args.megapixels),
+              "audio-text": make_wav(os.path.join(workdir, "cover.wav"), args.seconds, channels=2)}
+    writer = ImageWriter(args.format)
+    print(f"{args.payloads} messages into one {args.megapixels} MP PNG ({args.format} output) "
+          f"and one {args.seconds} s stereo WAV")
+    # Columns after "first ms" average the reuses of the cover (payloads 2..N)
+    print(f"{'mode':<12} {'cache':<6} {'first ms':>9} {'reuse ms':>9} {'load':>8} {'embed':>8} {'save':>8}  stats")
+    for kind, cover in covers.items():
+        digests = {}
+        for cached in (False, True):
+            cache = CoverCache() if cached else None
+            if kind == "image-text":
+                steg = ImageSteganography(writer=writer, cache=cache)
+            else:
+                steg = AudioSteganography(cache=cache)
+            out = os.path.join(workdir, "out." + (args.format if kind == "image-text" else "wav"))
+            stages, digests[cached], times = {}, [], []
+            for i in range(args.payloads):
+                with StegMetrics.collect() as record:
+                    assert steg.encode(cover, f"recipient {i:06d}: " + "x" * args.message_bytes, out)
+                times.append(record.seconds)
+                if i:
+                    for name, stage in record.stages.items():
+                        stages[name] = stages.get(name, 0.0) + stage["seconds"]
+                digests[cached].append(_digest(out))
+            reuses = max(1, args.payloads - 1)
+            print(f"{kind:<12} {'yes' if cached else 'no':<6} {times[0] * 1e3:>9.1f} {sum(times[1:]) / reuses * 1e3:>9.1f}"
+                  + "".join(f"{stages.get(name, 0.0) / reuses * 1e3:>8.1f}" for name in ("load", "embed", "save"))
+                  + (f"  {json.dumps(cache.stats())}" if cache else ""))
+        assert digests[False] == digests[True], f"{kind}: cached outputs differ"
+    shutil.rmtree(workdir)
+
+
+# Upper bounds of peak RSS growth per path, in multiples of the decoded cover (H x W x 3 bytes).
+# Encodes hold the cover (1x) and Pillow's 4-byte-per-pixel copy for the PNG encoder (1.33x); the
+# row-band decoders add about 1 MB per band whatever the cover size, which only matters below
+# MEMORY_MIN_MEGAPIXELS, where the bounds are reported but not enforced
+MEMORY_BOUNDS = {"image-text encode": 3.0, "image-text decode": 2.0,
+                 "image-image encode": 3.0, "image-image decode": 2.0}
+MEMORY_MIN_MEGAPIXELS = 2
+
+
+def _rss_bytes(field: str = "VmRSS") -> int | None:
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _run_memory_case(path: str, cover: str, secret: str, workdir: str) -> float | None:
+    """
+    Run one path and return its peak RSS growth in bytes. Runs in a fresh process.
+    """
+    stego_text = os.path.join(workdir, "stego_text.png")
+    stego_image = os.path.join(workdir, "stego_image.png")
+    before = _rss_bytes()
+    if path == "image-text encode":
+        assert ImageSteganography().encode(cover, "x" * 1024, stego_text)
+    elif path == "image-text decode":
+        assert ImageSteganography().decode(stego_text) is not None
+    elif path == "image-image encode":
+        assert ImageInImageSteganography().encode(cover, secret, stego_image)
+    else:
+        assert ImageInImageSteganography().decode(stego_image, os.path.join(workdir, "recovered.png"))
+    peak = _rss_bytes("VmHWM")
+    return None if before is None or peak is None else peak - before
+
+
+def memory_profile(megapixels: float, workdir: str) -> tuple[int, dict]:
+    """
+    Run each MEMORY_BOUNDS path in a fresh process over a synthetic cover written to workdir.
+
+    Returns:
+        tuple: (decoded cover bytes, {path: peak RSS growth in bytes, or None without /proc})
+    """
+    cover = make_png(os.path.join(workdir, "cover.png"), megapixels)
+    secret = make_png(os.path.join(workdir, "secret.png"), megapixels / 4)
+    with Image.open(cover) as img:
+        decoded = img.width * img.height * 3
+    ctx = multiprocessing.get_context("spawn")
+    growth = {}
+    # Decodes read the stego files written by the encodes before them
+    for path in MEMORY_BOUNDS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            growth[path] = pool.submit(_run_memory_case, path, cover, secret, workdir).result()
+    return decoded, growth
+
+
+def bench_memory(args) -> None:
+    """
+    Peak RSS growth of each image path relative to the decoded cover size, checked against MEMORY_BOUNDS.
+
+    Exits with status 1 if any path exceeds its bound (Linux only: reads /proc/self/status).
+    Covers under MEMORY_MIN_MEGAPIXELS are reported only.
+    """
+    workdir = tempfile.mkdtemp(prefix="stegbench-")
+    try:
+        decoded, growth = memory_profile(args.megapixels, workdir)
+    finally:
+        shutil.rmtree(workdir)
+    enforced = args.megapixels >= MEMORY_MIN_MEGAPIXELS
+    print(f"Cover {args.megapixels} MP PNG ({decoded / 1e6:.0f} MB decoded)"
+          + ("" if enforced else f", bounds not enforced below {MEMORY_MIN_MEGAPIXELS} MP"))
+    print(f"{'path':<20} {'peak MB':>8} {'x cover':>8} {'bound':>6}")
+    failed = False
+    for path, bound in MEMORY_BOUNDS.items():
+        if growth[path] is None:
+            print(f"{path:<20} {'n/a':>8}")
+            continue
+        ratio = growth[path] / decoded
+        over = enforced and ratio > bound
+        failed |= over
+        print(f"{path:<20} {growth[path] / 1e6:>8.1f} {ratio:>8.2f} {bound:>6.1f}" + ("  OVER BOUND" if over else ""))
+    if failed:
+        sys.exit(1)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def _peak_rss_bytes() -> int | None:
+    # Linux: VmHWM belongs to this process image, while ru_maxrss survives fork + exec from the parent
+    peak = _rss_bytes("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: dict) -> dict:
+    """
+    Time the stages of one encode/decode case. Runs in a fresh process so peak RSS belongs to this case.
+
+    Stages: load (decode the cover), payload (text to bits, or load the secret image),
+    embed, save (write the stego file) and decode (full decode of the stego file).
+    """
+    kind, cover, out = case["kind"], case["cover"], case["output"]
+    timings = {}
+
+    def stage(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[name] = time.perf_counter() - start
+        return result
+
+    message = "x" * case["payload_bytes"]
+    if kind == "image-text":
+        steg = ImageSteganography()
+        extractor = ImageRGBExtractor(cover)
+        stage("load", extractor.load)
+        payload = stage("payload", message.encode, "utf-8")
+        bits = len(payload) * 8
+        stego = stage("embed", steg._embed_bits, extractor.arr, payload)
+        stage("save", lambda: Image.fromarray(stego, mode='RGB').save(out, format='PNG'))
+        ok = stage("decode", steg.decode, out) == message
+        cover_bytes = extractor.arr.nbytes
+    elif kind == "image-image":
+        steg = ImageInImageSteganography()
+        extractor = ImageRGBExtractor(cover)
+        stage("load", extractor.load)
+        secret = ImageRGBExtractor(case["secret"])
+        stage("payload", secret.load)
+        bits = secret.arr.size * steg.bit_depth
+        stego = stage("embed", steg._merge, extractor.arr, secret.arr)
+        stage("save", lambda: Image.fromarray(stego, mode='RGB').save(out, format='PNG'))
+        ok = stage("decode", steg.decode, out, out + ".secret.png")
+        cover_bytes = extractor.arr.nbytes
+    else:
+        steg = AudioSteganography()
+        extractor = AudioSampleExtractor(cover)
+        stage("load", extractor.load)
+        payload = stage("payload", message.encode, "utf-8")
+        bits = len(payload) * 8
+        stage("embed", steg._embed_bits, extractor.samples, payload)
+
+        def save():
+            with wave.open(out, 'wb') as w:
+                w.setparams(extractor.params)
+                w.writeframes(extractor.frames)
+        stage("save", save)
+        ok = stage("decode", steg.decode, out) == message
+        cover_bytes = len(extractor.frames)
+
+    payload_bits = bits
+    encode_seconds = sum(timings[k] for k in ("load", "payload", "embed", "save"))
+    result = {k: v for k, v in case.items() if k not in ("cover", "secret", "output")}
+    result.update({
+        "ok": bool(ok),
+        "cover_bytes": cover_bytes,
+        "payload_bits": payload_bits,
+        "seconds": timings,
+        "embed_bits_per_second": payload_bits / timings["embed"] if timings["embed"] else None,
+        "encode_mb_per_second": cover_bytes / 1e6 / encode_seconds if encode_seconds else None,
+        "decode_mb_per_second": cover_bytes / 1e6 / timings["decode"] if timings["decode"] else None,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    })
+    return result
+
+
+def build_cases(preset: dict, workdir: str) -> list:
+    """
+    Generate (or reuse) the synthetic covers in workdir and list the cases that fit them.
+    """
+    cases = []
+    for mp in preset["megapixels"]:
+        cover = os.path.join(workdir, f"cover_{mp}mp.png")
+        if not os.path.exists(cover):
+            make_png(cover, mp)
+        with Image.open(cover) as img:
+            w, h = img.size
+        for payload in preset["payload_bytes"]:
+            # Text cases run at 1 bit per sample: the container header, then the payload bytes
+            if payload * 8 + CONTAINER_BITS <= w * h * 3:
+                cases.append({"kind": "image-text", "cover": cover, "cover_size": f"{mp}MP",
+                              "payload_bytes": payload, "output": os.path.join(workdir, "out.png")})
+            # Square secret holding about payload bytes, clipped to the cover
+            side = min(h, w, max(1, int(np.sqrt(payload / 3))))
+            secret = os.path.join(workdir, f"secret_{side}.png")
+            if not os.path.exists(secret):
+                Image.fromarray(np.random.default_rng(side).integers(0, 256, (side, side, 3), dtype=np.uint8)
+                                ).save(secret, format='PNG', compress_level=1)
+            cases.append({"kind": "image-image", "cover": cover, "secret": secret, "cover_size": f"{mp}MP",
+                          "payload_bytes": side * side * 3, "output": os.path.join(workdir, "out.png")})
+    for seconds in preset["seconds"]:
+        for sampwidth in preset["sampwidths"]:
+            cover = os.path.join(workdir, f"cover_{seconds}s_{sampwidth * 8}bit.wav")
+            if not os.path.exists(cover):
+                make_wav(cover, seconds, channels=2, sampwidth=sampwidth)
+            n_samples = int(seconds * 44100) * 2
+            for payload in preset["payload_bytes"]:
+                if payload * 8 + CONTAINER_BITS <= n_samples:
+                    cases.append({"kind": "audio-text", "cover": cover, "cover_size": f"{seconds}s",
+                                  "sampwidth": sampwidth, "payload_bytes": payload,
+                                  "output": os.path.join(workdir, "out.wav")})
+    return cases
+
+
+def bench_suite(args) -> None:
+    """
+    Run every encode/decode path over synthetic covers and payload sizes and save the results as JSON.
+    """
+    preset = PRESETS[args.preset]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="stegbench-")
+    os.makedirs(workdir, exist_ok=True)
+    cases = build_cases(preset, workdir)
+    if args.only:
+        cases = [c for c in cases if c["kind"] == args.only]
+
+    results = []
+    # One fresh process per case: peak RSS is a process-wide high-water mark
+    ctx = multiprocessing.get_context("spawn")
+    print(f"{'kind':<12} {'cover':>7} {'pcm':>3} {'bytes':>9} {'load':>8} {'payload':>8} {'embed':>8} "
+          f"{'save':>8} {'decode':>8} {'emb Mb/s':>9} {'enc MB/s':>9} {'RSS MB':>8}")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(run_case, case).result()
+        results.append(r)
+        t = r["seconds"]
+        rss = r["peak_rss_bytes"] / 1e6 if r["peak_rss_bytes"] else float("nan")
+        print(f"{r['kind']:<12} {r['cover_size']:>7} {_pcm_bits(r):>3} {r['payload_bytes']:>9} "
+              f"{t['load']:>8.3f} {t['payload']:>8.3f} {t['embed']:>8.3f} {t['save']:>8.3f} {t['decode']:>8.3f} "
+              f"{(r['embed_bits_per_second'] or 0) / 1e6:>9.1f} {r['encode_mb_per_second'] or 0:>9.1f} {rss:>8.1f}"
+              + ("" if r["ok"] else "  ROUND-TRIP FAILED"))
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "preset": args.preset,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results saved to {args.output}")
+
+
+def _pcm_bits(r: dict) -> str:
+    return str(r["sampwidth"] * 8) if r.get("sampwidth") else "-"
+
+
+def _case_key(r: dict) -> tuple:
+    return r["kind"], r["cover_size"], r.get("sampwidth"), r["payload_bytes"]
+
+
+def bench_compare(args) -> None:
+    """
+    Compare two suite result files stage by stage (new / old time ratio; > 1 is slower).
+    """
+    with open(args.old, encoding="utf-8") as f:
+        old = {_case_key(r): r for r in json.load(f)["results"]}
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    stages = ("load", "payload", "embed", "save", "decode")
+    print(f"{'kind':<12} {'cover':>7} {'pcm':>3} {'bytes':>9} " + " ".join(f"{s:>8}" for s in stages) + f" {'RSS':>8}")
+    for r in new:
+        o = old.get(_case_key(r))
+        if o is None:
+            continue
+        ratios = [r["seconds"][s] / o["seconds"][s] if o["seconds"][s] else float("nan") for s in stages]
+        rss = (r["peak_rss_bytes"] / o["peak_rss_bytes"]) if r["peak_rss_bytes"] and o["peak_rss_bytes"] \
+            else float("nan")
+        print(f"{r['kind']:<12} {r['cover_size']:>7} {_pcm_bits(r):>3} {r['payload_bytes']:>9} "
+              + " ".join(f"{x:>7.2f}x" for x in ratios) + f" {rss:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StegoTool benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("audio-decode", help="Full-read vs streaming WAV decode")
+    p.add_argument("--seconds", type=float, default=600)
+    p.add_argument("--channels", type=int, default=2)
+    p.add_argument("--message-bytes", type=int, default=1024)
+    p.set_defaults(func=bench_audio_decode)
+
+    p = sub.add_parser("payload-compression", help="Embed/extract time versus compression codec and level")
+    p.add_argument("--payload-bytes", type=int, default=1 << 20)
+    p.set_defaults(func=bench_payload_compression)
+
+    p = sub.add_parser("bits-per-sample", help="Embed/extract time and modified pixels at 1-4 bits per sample")
+    p.add_argument("--payload-bytes", type=int, default=4 << 20)
+    p.set_defaults(func=bench_bits_per_sample)
+
+    p = sub.add_parser("keyed-scatter", help="Keyed scatter embed/extract cost versus cover size")
+    p.add_argument("--payload-bytes", type=int, default=64 << 10)
+    p.add_argument("--samples", type=int, nargs="+", default=[10 ** 6, 10 ** 7, 10 ** 8],
+                   help="Cover sizes in samples")
+    p.set_defaults(func=bench_keyed_scatter)
+
+    p = sub.add_parser("image-bands", help="Image-in-image peak RSS and time, whole image versus row bands")
+    p.add_argument("--megapixels", type=float, default=50)
+    p.add_argument("--band-rows", type=int, nargs="+", default=[64, 256, 1024])
+    p.set_defaults(func=bench_image_bands)
+
+    p = sub.add_parser("partial-decode", help="Text decode time from a large stego PNG versus message size")
+    p.add_argument("--megapixels", type=float, default=30)
+    p.add_argument("--message-bytes", type=int, nargs="+", default=[16, 1 << 10, 64 << 10, 1 << 20])
+    p.set_defaults(func=bench_partial_decode)
+
+    p = sub.add_parser("scan", help="Scan subcommand throughput over synthetic covers, half of them stego")
+    p.add_argument("--files", type=int, default=200)
+    p.add_argument("--megapixels", type=float, default=1)
+    p.add_argument("-j", "--workers", type=int, default=None)
+    p.set_defaults(func=bench_scan)
+
+    p = sub.add_parser("importtime", help="CLI startup and import time per mode under python -X importtime")
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_importtime)
+
+    p = sub.add_parser("threads", help="Time of each mode on one large cover at 1-N threads; outputs must match")
+    p.add_argument("--megapixels", type=float, default=30)
+    p.add_argument("--seconds", type=float, default=600)
+    p.add_argument("--message-bytes", type=int, default=4 << 20)
+    p.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.set_defaults(func=bench_threads)
+
+    p = sub.add_parser("cover-cache", help="Per-payload time of many messages into one cover, with and without CoverCache")
+    p.add_argument("--megapixels", type=float, default=10)
+    p.add_argument("--seconds", type=float, default=600)
+    p.add_argument("--payloads", type=int, default=20)
+    p.add_argument("--message-bytes", type=int, default=256)
+    p.add_argument("--format", choices=["png", "tiff", "bmp", "npy"], default="png")
+    p.set_defaults(func=bench_cover_cache)
+
+    p = sub.add_parser("memory", help="Peak RSS of each image path versus the cover size; fails over MEMORY_BOUNDS")
+    p.add_argument("--megapixels", type=float, default=20)
+    p.set_defaults(func=bench_memory)
+
+    p = sub.add_parser("writers", help="Write/load time and file size per output format and PNG level")
+    p.add_argument("--megapixels", type=float, default=10)
+    p.add_argument("--message-bytes", type=int, default=1024)
+    p.add_argument("--optimize", action="store_true", help="Also time PNG optimize (very slow on large images)")
+    p.set_defaults(func=bench_writers)
+
+    p = sub.add_parser("serve", help="Load-test the local HTTP service (image-text encode)")
+    p.add_argument("--megapixels", type=float, default=1)
+    p.add_argument("--message-bytes", type=int, default=64)
+    p.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrent clients per round")
+    p.add_argument("--requests", type=int, default=10, help="Requests per client per round")
+    p.add_argument("-j", "--workers", type=int, default=None)
+    p.add_argument("--threads", action="store_true")
+    p.add_argument("--max-queue", type=int, default=16)
+    p.set_defaults(func=bench_serve)
+
+    p = sub.add_parser("suite", help="Time every encode/decode path over synthetic covers; save JSON results")
+    p.add_argument("--preset", choices=list(PRESETS), default="quick")
+    p.add_argument("--only", choices=["image-text", "image-image", "audio-text"], help="Run a single mode")
+    p.add_argument("--workdir", metavar="DIR", help="Keep (and reuse) generated covers in DIR")
+    p.add_argument("--output", default="bench_results.json", metavar="FILE")
+    p.set_defaults(func=bench_suite)
+
+    p = sub.add_parser("compare", help="Compare two suite result files")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.set_defaults(func=bench_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
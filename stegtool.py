@@ -1,11 +1,348 @@
 #!/usr/bin/env python3
 import sys
+import json
+import time
+import logging
 import argparse
-from ImageSteganography import ImageSteganography
-from ImageInImageSteganography import ImageInImageSteganography
-from AudioSteganography import AudioSteganography
+import StegMetrics
+from PayloadCodec import CODECS
+
+# Entry point group of third-party modes, resolved only when --plugin asks for one
+PLUGIN_GROUP = "stegtool.modes"
+
+def positive_int(value: str) -> int:
+    """
+    argparse type for counts that must be at least 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {number}")
+    return number
+
+def batch_main(argv) -> int:
+    """
+    stegtool.py batch: run many encode/decode jobs on a process pool.
+    """
+    from BatchRunner import BatchRunner, KINDS, MODES
+
+    parser = argparse.ArgumentParser(
+        prog="stegtool.py batch",
+        description="Run encode/decode jobs from a CSV/JSONL manifest or over a directory"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--manifest", metavar="FILE",
+        help="CSV (with header) or JSONL manifest with kind, mode, input, payload, output "
+             "and optional bit_depth, channel, bits_per_sample, key, band_rows columns"
+    )
+    source.add_argument("--dir", metavar="DIR", help="Process every matching file in DIR")
+    parser.add_argument("--kind", choices=KINDS, help="Job kind for --dir")
+    parser.add_argument("-m", "--mode", choices=MODES, help="Job mode for --dir")
+    parser.add_argument("--out-dir", metavar="DIR", help="Output directory for --dir")
+    payload = parser.add_mutually_exclusive_group()
+    payload.add_argument("--message", default="", help="Message (or secret image path) for --dir encode jobs")
+    payload.add_argument("--message-file", metavar="FILE", help="Read the --dir message from FILE")
+    parser.add_argument("--bit-depth", type=int, help="Image↔Image bit depth for --dir jobs")
+    parser.add_argument("--channel", type=int, help="Image↔Image or Text↔Audio channel for --dir jobs")
+    parser.add_argument("--bits-per-sample", type=int, choices=range(1, 5), metavar="1-4",
+                        help="Text↔Image / Text↔Audio bits per sample for --dir encode jobs")
+    parser.add_argument("--key", help="Text↔Image / Text↔Audio scatter key for --dir jobs")
+    parser.add_argument("--band-rows", type=positive_int, help="Image↔Image row band size for --dir jobs")
+    parser.add_argument("-j", "--workers", type=positive_int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", metavar="FILE", help="Write per-job JSONL results to FILE instead of stdout")
+    parser.add_argument(
+        "--cover-cache-mb", type=int, default=0, metavar="MB",
+        help="Keep up to MB of decoded covers per worker, so encode jobs reusing a cover skip decoding it"
+    )
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        jobs = BatchRunner.load_manifest(args.manifest)
+    else:
+        if not (args.kind and args.mode and args.out_dir):
+            parser.error("--dir requires --kind, --mode and --out-dir")
+        message = args.message
+        if args.message_file:
+            with open(args.message_file, encoding="utf-8") as f:
+                message = f.read()
+        jobs = BatchRunner.jobs_from_directory(args.dir, args.kind, args.mode, args.out_dir, message,
+                                               bit_depth=args.bit_depth, channel=args.channel,
+                                               bits_per_sample=args.bits_per_sample, key=args.key,
+                                               band_rows=args.band_rows)
+
+    runner = BatchRunner(args.workers, args.cover_cache_mb << 20)
+    report = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in runner.run(jobs):
+            results.append(result)
+            report.write(json.dumps(result) + "\n")
+    finally:
+        if report is not sys.stdout:
+            report.close()
+    summary = BatchRunner.summarize(results, time.perf_counter() - start)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+def capacity_main(argv) -> int:
+    """
+    stegtool.py capacity: report cover capacity from file headers, or pick the smallest fitting cover.
+    """
+    from CapacityPlanner import CapacityPlanner, CoverIndex
+
+    parser = argparse.ArgumentParser(
+        prog="stegtool.py capacity",
+        description="Report payload capacity (bits) per mode, bit depth and channel without decoding covers"
+    )
+    parser.add_argument("paths", nargs="*", metavar="COVER", help="Image or WAV covers to report on")
+    parser.add_argument("--index", metavar="DIR", help="Index every cover in DIR into a cached capacity table")
+    parser.add_argument("--cache", metavar="FILE", help="Capacity table file (default: DIR/.stegtool-capacity.json)")
+    parser.add_argument(
+        "--key", default="image-text",
+        help="Capacity key used by --fit-*: image-text, audio-text, audio-text/channel=N, image-image/bit_depth=N, "
+             "with /bits_per_sample=N for the text modes"
+    )
+    fit = parser.add_mutually_exclusive_group()
+    fit.add_argument("--fit-bytes", type=int, metavar="N", help="With --index: smallest cover for an N-byte text message")
+    fit.add_argument("--fit-bits", type=int, metavar="N", help="With --index: smallest cover for N payload bits")
+    args = parser.parse_args(argv)
+
+    if not args.paths and not args.index:
+        parser.error("give COVER paths or --index DIR")
+
+    status = 0
+    for path in args.paths:
+        try:
+            print(json.dumps(CapacityPlanner.probe(path)))
+        except Exception as e:
+            print(json.dumps({"path": path, "error": str(e)}))
+            status = 1
+
+    if args.index:
+        index = CoverIndex(args.index, args.cache).build()
+        if args.fit_bytes is None and args.fit_bits is None:
+            for entry in index.entries.values():
+                print(json.dumps(entry))
+        else:
+            bits = args.fit_bits if args.fit_bits is not None else CapacityPlanner.message_bits(args.fit_bytes)
+            entry = index.smallest_fitting(args.key, bits)
+            if entry is None:
+                print(f"Error: no cover in {args.index} holds {bits} bits for {args.key}", file=sys.stderr)
+                return 1
+            print(json.dumps(entry))
+    return status
+
+
+def serve_main(argv) -> int:
+    """
+    stegtool.py serve: local HTTP service running encode/decode requests on a worker pool.
+    """
+    import asyncio
+    from StegServer import StegServer
+
+    parser = argparse.ArgumentParser(
+        prog="stegtool.py serve",
+        description="Serve POST /{image-text,image-image,audio-text}/{encode,decode}, GET /metrics and /health"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-j", "--workers", type=positive_int, default=None, help="Pool size (default: CPU count)")
+    parser.add_argument("--threads", action="store_true", help="Run jobs on threads instead of processes")
+    parser.add_argument("--max-queue", type=int, default=16,
+                        help="Jobs allowed to wait for a worker before answering 503 (default 16)")
+    parser.add_argument("--max-body-mb", type=float, default=64,
+                        help="Reject request bodies larger than this with 413 (default 64)")
+    args = parser.parse_args(argv)
+
+    # Per-request success messages of the mode classes would flood the log; keep warnings and errors
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logging.getLogger("StegServer").setLevel(logging.INFO)
+    server = StegServer(args.host, args.port, args.workers, args.threads, args.max_queue,
+                        int(args.max_body_mb * (1 << 20)))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def scan_main(argv) -> int:
+    """
+    stegtool.py scan: triage image/WAV archives for embedded payloads from their leading pixels or samples.
+    """
+    from StegScanner import StegScanner, SAMPLE_VALUES
+
+    parser = argparse.ArgumentParser(
+        prog="stegtool.py scan",
+        description="Flag files carrying a plausible text or image-in-image header or LSBs that pass a "
+                    "chi-square test, reading only the start of each file"
+    )
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="Image or WAV files, or directories to walk")
+    parser.add_argument("--sample", type=int, default=SAMPLE_VALUES,
+                        help=f"Pixel bytes or samples per file for the chi-square test (default {SAMPLE_VALUES})")
+    parser.add_argument("--threshold", type=float, default=0.95,
+                        help="Flag files whose chi-square p-value reaches this (default 0.95)")
+    parser.add_argument("-j", "--workers", type=positive_int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--report", metavar="FILE", help="Write per-file JSONL results to FILE instead of stdout")
+    parser.add_argument("--suspect-only", action="store_true", help="Report flagged files and errors only")
+    args = parser.parse_args(argv)
+
+    scanner = StegScanner(args.workers, args.sample, args.threshold)
+    report = open(args.report, "w", encoding="utf-8") if args.report else sys.stdout
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in scanner.run(StegScanner.collect(args.paths)):
+            results.append(result)
+            if result["suspect"] or result["error"] or not args.suspect_only:
+                report.write(json.dumps(result) + "\n")
+    finally:
+        if report is not sys.stdout:
+            report.close()
+    summary = StegScanner.summarize(results, time.perf_counter() - start)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["errors"] == 0 else 1
+
+
+def run_text_mode(steg, args, src: str, msg: str, out: str) -> bool:
+    """
+    Encode/decode for the text modes (-i and -a), as text or as a binary payload.
+    """
+    if args.mode == "encode":
+        if args.payload_file:
+            with open(args.payload_file, "rb") as f:
+                data = f.read()
+            return steg.encode_payload(src, data, out, args.codec, args.level)
+        return steg.encode(src, msg, out)
+
+    if args.binary:
+        data = steg.decode_payload(src)
+        if data is None:
+            return False
+        with open(out, "wb") as f:
+            f.write(data)
+        return True
+
+    hidden = steg.decode(src)
+    if hidden is None:
+        return False
+    if not args.quiet:
+        print(hidden)
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(hidden)
+    return True
+
+
+def run_image_text(args, src: str, msg: str, out: str) -> bool:
+    from ImageRGBManipulator import ImageWriter
+    from ImageSteganography import ImageSteganography
+
+    writer = ImageWriter(args.format, args.compress_level, args.optimize)
+    steg = ImageSteganography(writer=writer, bits_per_sample=args.bits_per_sample, key=args.key,
+                              threads=args.threads)
+    return run_text_mode(steg, args, src, msg, out)
+
+
+def run_image_image(args, src: str, secret: str, out: str) -> bool:
+    from ImageRGBManipulator import ImageWriter
+    from ImageInImageSteganography import ImageInImageSteganography
+
+    writer = ImageWriter(args.format, args.compress_level, args.optimize)
+    steg = ImageInImageSteganography(writer=writer, band_rows=args.band_rows, threads=args.threads)
+    if args.mode == "encode":
+        return steg.encode(src, secret, out)
+    # secret arg is ignored; out is the recovered image path
+    return steg.decode(src, out)
+
+
+def run_audio_text(args, src: str, msg: str, out: str) -> bool:
+    from AudioSteganography import AudioSteganography
+
+    steg = AudioSteganography(channel=args.audio_channel, bits_per_sample=args.bits_per_sample, key=args.key,
+                              threads=args.threads)
+    if args.mode == "encode" and args.mmap:
+        return steg.encode_mmap(src, msg, out)
+    return run_text_mode(steg, args, src, msg, out)
+
+
+# Built-in modes of the classic interface. Each runner imports its implementation (and with it
+# NumPy, and Pillow for the image modes) only once its mode is chosen, so -h and the other modes
+# never pay for it. Plugins registered under PLUGIN_GROUP provide runners with the same signature:
+# run(args, input, message_or_secret, output) -> bool.
+MODES = {
+    "image-text": {
+        "flags": ("-i", "--image-text"),
+        "metavar": ("IMAGE", "MSG_OR_", "OUT"),
+        "help": "Text↔Image. Encode: COVER IMAGE, MESSAGE, OUT_IMAGE. Decode: STEGO_IMAGE, _, OUT_TEXTFILE.",
+        "run": run_image_text,
+    },
+    "image-image": {
+        "flags": ("-I", "--image-image"),
+        "metavar": ("IMAGE", "SECRET_OR_", "OUT"),
+        "help": "Image↔Image. Encode: COVER_IMAGE, SECRET_IMAGE, OUT_IMAGE. Decode: STEGO_IMAGE, _, OUT_IMAGE.",
+        "run": run_image_image,
+    },
+    "audio-text": {
+        "flags": ("-a", "--audio-text"),
+        "metavar": ("WAV", "MSG_OR_", "OUT"),
+        "help": "Text↔Audio. Encode: IN_WAV, MESSAGE, OUT_WAV. Decode: STEGO_WAV, _, OUT_TEXTFILE.",
+        "run": run_audio_text,
+    },
+}
+
+
+def load_plugin(name: str):
+    """
+    Resolve the runner of a third-party mode registered under the PLUGIN_GROUP entry point group.
+
+    Returns:
+        The loaded runner, or None if no plugin has that name
+    """
+    # importlib.metadata alone costs tens of milliseconds; only plugin runs import it
+    from importlib.metadata import entry_points
+
+    for ep in entry_points(group=PLUGIN_GROUP):
+        if ep.name == name:
+            return ep.load()
+    return None
+
+
+def modes_main(argv) -> int:
+    """
+    stegtool.py modes: list the built-in modes and the installed mode plugins.
+    """
+    from importlib.metadata import entry_points
+
+    parser = argparse.ArgumentParser(
+        prog="stegtool.py modes",
+        description=f"List the built-in modes and the plugins registered under the {PLUGIN_GROUP} entry point group"
+    )
+    parser.parse_args(argv)
+    for name, spec in MODES.items():
+        print(json.dumps({"name": name, "flags": list(spec["flags"]), "builtin": True}))
+    for ep in entry_points(group=PLUGIN_GROUP):
+        print(json.dumps({"name": ep.name, "flags": ["--plugin", ep.name], "builtin": False, "target": ep.value}))
+    return 0
+
+
+SUBCOMMANDS = {
+    "batch": batch_main,
+    "capacity": capacity_main,
+    "serve": serve_main,
+    "scan": scan_main,
+    "modes": modes_main,
+}
+
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(SUBCOMMANDS[sys.argv[1]](sys.argv[2:]))
+
     parser = argparse.ArgumentParser(
         description="StegoTool: encode/decode text/images in images or text in audio"
     )
@@ -15,70 +352,118 @@ def main():
         help="Mode: encode to hide data, decode to extract"
     )
     group = parser.add_mutually_exclusive_group(required=True)
-
+    for name, spec in MODES.items():
+        group.add_argument(*spec["flags"], nargs=3, metavar=spec["metavar"], help=spec["help"])
     group.add_argument(
-        "-i", "--image-text",
-        nargs=3, metavar=("IMAGE", "MSG_OR_", "OUT"),
-        help="Text↔Image. Encode: COVER IMAGE, MESSAGE, OUT_IMAGE. "
-             "Decode: STEGO_IMAGE, _, OUT_TEXTFILE."
+        "--plugin", nargs=4, metavar=("NAME", "IN", "PAYLOAD_OR_", "OUT"),
+        help=f"Run the third-party mode NAME registered under the {PLUGIN_GROUP} entry point group "
+             "(see 'stegtool.py modes')"
     )
-    group.add_argument(
-        "-I", "--image-image",
-        nargs=3, metavar=("IMAGE", "SECRET_OR_", "OUT"),
-        help="Image↔Image. Encode: COVER_IMAGE, SECRET_IMAGE, OUT_IMAGE. "
-             "Decode: STEGO_IMAGE, _, OUT_IMAGE."
+
+    parser.add_argument(
+        "--mmap", action="store_true",
+        help="Text↔Audio encode: copy IN_WAV to OUT_WAV and patch only the payload "
+             "samples through a memory map. Use the same path for both to modify IN_WAV in place."
     )
-    group.add_argument(
-        "-a", "--audio-text",
-        nargs=3, metavar=("WAV", "MSG_OR_", "OUT"),
-        help="Text↔Audio. Encode: IN_WAV, MESSAGE, OUT_WAV. "
-             "Decode: STEGO_WAV, _, OUT_TEXTFILE."
+
+    parser.add_argument(
+        "--audio-channel", type=int, default=None, metavar="N",
+        help="Text↔Audio: confine hidden bits to channel N instead of spreading them across all channels"
+    )
+
+    parser.add_argument(
+        "--bits-per-sample", type=int, choices=range(1, 5), default=1, metavar="1-4",
+        help="Text↔Image / Text↔Audio encode: low bits per pixel byte or sample carrying the message "
+             "(recorded in the header; decode detects it)"
+    )
+
+    parser.add_argument(
+        "--key", default=None,
+        help="Text↔Image / Text↔Audio: scatter the hidden bits over keyed pseudo-random positions "
+             "instead of the first pixels or samples (decode needs the same key)"
+    )
+
+    parser.add_argument(
+        "--payload-file", metavar="FILE",
+        help="Text↔Image / Text↔Audio encode: hide the bytes of FILE instead of MESSAGE"
+    )
+    parser.add_argument(
+        "--codec", choices=list(CODECS), default="none",
+        help="Compression for --payload-file (zstd needs the 'zstandard' package)"
+    )
+    parser.add_argument("--level", type=int, default=None, help="Compression level for --codec")
+    parser.add_argument(
+        "--binary", action="store_true",
+        help="Text↔Image / Text↔Audio decode: extract a --payload-file payload and write its raw bytes to OUT"
+    )
+
+    parser.add_argument(
+        "--format", choices=["png", "tiff", "bmp", "npy"], default=None,
+        help="Text↔Image / Image↔Image: output format (default: from the OUT extension, else png). "
+             "tiff and bmp are uncompressed, npy is a raw array: faster to write, larger on disk"
+    )
+    parser.add_argument(
+        "--compress-level", type=int, choices=range(10), default=None, metavar="0-9",
+        help="PNG zlib level: 0-1 for fast intermediate files, 9 for compact delivery (default 6)"
+    )
+    parser.add_argument("--optimize", action="store_true", help="PNG: search for the smallest encoding (slow)")
+    parser.add_argument(
+        "--band-rows", type=positive_int, default=None, metavar="N",
+        help="Image↔Image: stream cover, secret and output in bands of N rows so memory stays bounded "
+             "on huge images (PNG or NPY output)"
+    )
+    parser.add_argument(
+        "--threads", type=positive_int, default=1, metavar="N",
+        help="Embed/extract large payloads in N concurrent chunks and decode the next row band or "
+             "frame chunk while the current one is processed (same output as 1)"
+    )
+
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-q", "--quiet", action="store_true",
+                           help="Only report warnings and errors (and do not echo the decoded message)")
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="Also log debug details such as header values")
+    parser.add_argument(
+        "--metrics-json", action="store_true",
+        help="Write one JSON record with the per-stage durations and byte counts of the job to stderr"
     )
 
     args = parser.parse_args()
-    success = False
-
-    if args.image_text:
-        img_path, msg, out = args.image_text
-        steg = ImageSteganography()
-        if args.mode == "encode":
-            success = steg.encode(img_path, msg, out)
-        else:  # decode
-            hidden = steg.decode(img_path)
-            if hidden is not None:
-                print(hidden)
-                with open(out, "w", encoding="utf-8") as f:
-                    f.write(hidden)
-                success = True
-
-    elif args.image_image:
-        img_path, secret, out = args.image_image
-        steg = ImageInImageSteganography()
-        if args.mode == "encode":
-            success = steg.encode(img_path, secret, out)
-        else:
-            # decode
-            # secret arg is ignored; out is the recovered image path
-            success = steg.decode(img_path, out)
-
-    elif args.audio_text:
-        wav_path, msg, out = args.audio_text
-        steg = AudioSteganography()
-        if args.mode == "encode":
-            success = steg.encode(wav_path, msg, out)
-        else:  # decode
-            hidden = steg.decode(wav_path)
-            if hidden is not None:
-                print(hidden)
-                with open(out, "w", encoding="utf-8") as f:
-                    f.write(hidden)
-                success = True
+    if args.mmap and args.payload_file:
+        parser.error("--mmap only supports text messages")
+    level = logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format="%(message)s")
+    # Pillow's own debug output (PNG chunk dumps) drowns the tool's messages in --verbose
+    logging.getLogger("PIL").setLevel(max(level, logging.INFO))
+    kind, run, files = select_mode(parser, args)
 
-    else:
-        parser.print_usage()
-        sys.exit(1)
+    with StegMetrics.collect() as record:
+        success = run(args, *files)
 
+    if args.metrics_json:
+        print(json.dumps({"kind": kind, "mode": args.mode, "ok": bool(success), **record.as_dict()}),
+              file=sys.stderr)
     sys.exit(0 if success else 1)
 
+
+def select_mode(parser, args) -> tuple:
+    """
+    Pick the mode chosen on the command line of the classic (non-subcommand) interface.
+
+    Returns:
+        tuple: (mode name, runner, [input, message or secret, output])
+    """
+    if args.plugin:
+        name, *files = args.plugin
+        run = load_plugin(name)
+        if run is None:
+            parser.error(f"no mode plugin named {name!r} in the {PLUGIN_GROUP} entry point group")
+        return name, run, files
+    for name, spec in MODES.items():
+        files = getattr(args, name.replace("-", "_"))
+        if files:
+            return name, spec["run"], files
+    parser.print_usage()
+    sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,66 @@
+"""
+AudioSteganography sample arrays and WAV file handling.
+"""
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from AudioSteganography import AudioSteganography
+
+MESSAGE = "Secret"
+
+
+def test_samples_channel_needs_frames_by_channels():
+    stereo = np.random.default_rng(1).integers(-32768, 32768, (2000, 2), dtype=np.int16)
+    steg = AudioSteganography(channel=1)
+
+    stego = steg.encode_samples(stereo, MESSAGE)
+    assert np.array_equal(stego[:, 0], stereo[:, 0])
+    assert steg.decode_samples(stego) == MESSAGE
+    # Interleaved samples do not tell their channel count
+    assert steg.encode_samples(stereo.reshape(-1), MESSAGE) is None
+    assert steg.decode_samples(stego.reshape(-1)) is None
+
+
+def write_wav(path, samples: np.ndarray, format_tag: int = 1) -> str:
+    """
+    Write 16-bit mono samples; a format tag other than PCM gets an extensible-style 40-byte fmt chunk.
+    """
+    data = samples.astype("<i2").tobytes()
+    if format_tag == 1:
+        fmt = struct.pack("<HHIIHH", 1, 1, 44100, 88200, 2, 16)
+    else:
+        fmt = struct.pack("<HHIIHHHHI16s", format_tag, 1, 44100, 88200, 2, 16, 22, 16, 4,
+                          b"\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71")
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", len(body)) + body)
+    return str(path)
+
+
+@pytest.fixture
+def pcm():
+    return np.random.default_rng(2).integers(-32768, 32768, 4000, dtype=np.int16)
+
+
+@pytest.mark.parametrize("key", [None, "k"])
+def test_mmap_paths_read_pcm(tmp_path, pcm, key):
+    cover = write_wav(tmp_path / "cover.wav", pcm)
+    stego = str(tmp_path / "stego.wav")
+
+    assert AudioSteganography(key=key).encode_mmap(cover, MESSAGE, stego)
+    assert AudioSteganography(key=key).decode(stego) == MESSAGE
+    with wave.open(stego, "rb") as wav:
+        assert wav.getnframes() == pcm.size
+
+
+@pytest.mark.parametrize("key", [None, "k"])
+def test_mmap_paths_reject_extensible_like_wave(tmp_path, pcm, key):
+    cover = write_wav(tmp_path / "cover.wav", pcm, format_tag=0xFFFE)
+
+    # The wave-based paths cannot read WAVE_FORMAT_EXTENSIBLE; the memory-mapped ones must not either
+    assert AudioSteganography(key=key).encode(cover, MESSAGE, str(tmp_path / "stego.wav")) is False
+    assert AudioSteganography(key=key).encode_mmap(cover, MESSAGE, str(tmp_path / "mmap.wav")) is False
+    assert AudioSteganography(key=key).decode(cover) is None
@@ -0,0 +1,164 @@
+"""
+Bit-for-bit regression of the vectorized engines against the per-sample loops they replaced.
+"""
+import numpy as np
+import pytest
+
+from AudioSteganography import AudioSteganography
+from BitPlaneManipulator import BitPlaneEngine
+from ImageInImageSteganography import ImageInImageSteganography
+from ImageSteganography import ImageSteganography
+from StegContainer import CONTAINER_BITS, ContainerHeader
+from TextBitManipulator import TextBitExtractor
+
+MESSAGE = "Regression check: vectorized embedding must match the original loops ✓"
+
+
+def loop_embed(flat: np.ndarray, bits, offset: int = 0, depth: int = 1) -> None:
+    """
+    The original embedding loop, one sample at a time, generalised to depth bits per sample
+    (MSB first, the last sample zero-padded).
+    """
+    mask = (1 << depth) - 1
+    for i in range(0, len(bits), depth):
+        value = 0
+        for bit in bits[i:i + depth]:
+            value = (value << 1) | int(bit)
+        value <<= depth - len(bits[i:i + depth])
+        j = offset + i // depth
+        flat[j] = (int(flat[j]) & ~mask) | value
+
+
+def loop_extract(flat: np.ndarray, count: int, offset: int = 0, depth: int = 1) -> np.ndarray:
+    """
+    The original extraction loop, generalised to depth bits per sample.
+    """
+    bits = []
+    for j in range(offset, offset + -(-count // depth)):
+        for shift in range(depth - 1, -1, -1):
+            bits.append((int(flat[j]) >> shift) & 1)
+    return np.array(bits[:count], dtype=np.uint8)
+
+
+def loop_legacy(flat: np.ndarray, message: str, delimiter: str = "<END>") -> None:
+    """
+    What the original text modes wrote: a bare 32-bit length, then the message and delimiter bits.
+    """
+    extractor = TextBitExtractor(delimiter=delimiter)
+    message_bits = extractor.encode_text_to_bits(extractor, message)
+    loop_embed(flat, [int(b) for b in format(len(message_bits), '032b')])
+    loop_embed(flat, message_bits, 32)
+
+
+def expected_text_stego(cover: np.ndarray, payload: bytes, depth: int) -> np.ndarray:
+    """
+    Container header at 1 bit per sample, then the payload at depth bits per sample, written by the loops.
+    """
+    stego = cover.copy()
+    flat = stego.reshape(-1)
+    loop_embed(flat, ContainerHeader.pack(payload, depth), 0)
+    loop_embed(flat, np.unpackbits(np.frombuffer(payload, dtype=np.uint8)), CONTAINER_BITS, depth)
+    return stego
+
+
+@pytest.fixture
+def cover() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (40, 64, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def samples() -> np.ndarray:
+    return np.random.default_rng(1).integers(-32768, 32768, 4000, dtype=np.int16)
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16, np.int32])
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_bit_plane_engine_matches_loop(dtype, depth):
+    rng = np.random.default_rng(depth)
+    info = np.iinfo(dtype)
+    flat = rng.integers(info.min, info.max, 3000, dtype=dtype, endpoint=True)
+    # An odd bit count leaves a partially filled last sample
+    bits = rng.integers(0, 2, 1001, dtype=np.uint8)
+
+    expected = flat.copy()
+    loop_embed(expected, bits, 7, depth)
+    actual = flat.copy()
+    BitPlaneEngine.embed(actual, bits, 7, depth)
+
+    assert np.array_equal(actual, expected)
+    extracted = BitPlaneEngine.extract(actual, bits.size, 7, depth)
+    assert np.array_equal(extracted, loop_extract(expected, bits.size, 7, depth))
+    assert np.array_equal(extracted, bits)
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_image_text_encode_matches_loop(cover, depth):
+    stego = ImageSteganography(bits_per_sample=depth).encode_to_array(cover, MESSAGE)
+
+    assert np.array_equal(stego, expected_text_stego(cover, MESSAGE.encode("utf-8"), depth))
+    assert ImageSteganography().decode(stego) == MESSAGE
+
+
+def test_image_text_decodes_loop_written_legacy(cover):
+    stego = cover.copy()
+    loop_legacy(stego.reshape(-1), MESSAGE)
+
+    assert ImageSteganography().decode(stego) == MESSAGE
+
+
+@pytest.mark.parametrize("depth", [1, 2, 3, 4])
+def test_audio_text_encode_matches_loop(samples, depth):
+    stego = AudioSteganography(bits_per_sample=depth).encode_samples(samples, MESSAGE)
+
+    assert np.array_equal(stego, expected_text_stego(samples, MESSAGE.encode("utf-8"), depth))
+    assert AudioSteganography().decode_samples(stego) == MESSAGE
+
+
+def test_audio_text_decodes_loop_written_legacy(samples):
+    stego = samples.copy()
+    # The original loop masked 16-bit samples with 0xFE, also clearing their high byte; only the LSB matters here
+    loop_legacy(stego, MESSAGE)
+
+    assert AudioSteganography().decode_samples(stego) == MESSAGE
+
+
+def loop_image_in_image(cover: np.ndarray, secret: np.ndarray, bit_depth: int, channel: int) -> np.ndarray:
+    """
+    The original image-in-image encode loops: size header in the first row, then the secret MSBs.
+    """
+    stego = cover.copy()
+    sh, sw, _ = secret.shape
+    header = format(sw, '032b') + format(sh, '032b')
+    clear_mask = int("1" * (8 - bit_depth - 1) + "0" * (bit_depth + 1), 2)
+    for x in range(64):
+        stego[0, x, channel] = (stego[0][x][channel] & clear_mask) | ((int(header[x]) & 1) << bit_depth)
+    mask = int("1" * (8 - bit_depth) + "0" * bit_depth, 2)
+    for y in range(sh):
+        for x in range(sw):
+            for c in range(3):
+                stego[y][x][c] = (stego[y][x][c] & mask) | (secret[y][x][c] >> (8 - bit_depth))
+    return stego
+
+
+def loop_image_from_image(stego: np.ndarray, sw: int, sh: int, bit_depth: int) -> np.ndarray:
+    """
+    The original image-in-image decode loop.
+    """
+    secret = np.zeros((sh, sw, 3), dtype=np.uint8)
+    mask = (1 << bit_depth) - 1
+    for y in range(sh):
+        for x in range(sw):
+            for c in range(3):
+                secret[y, x, c] = (stego[y][x][c] & mask) << (8 - bit_depth)
+    return secret
+
+
+@pytest.mark.parametrize("channel", [0, 1, 2])
+@pytest.mark.parametrize("bit_depth", [1, 2, 3, 4])
+def test_image_in_image_matches_loop(cover, bit_depth, channel):
+    secret = np.random.default_rng(2).integers(0, 256, (25, 30, 3), dtype=np.uint8)
+    steg = ImageInImageSteganography(bit_depth=bit_depth, channel=channel)
+
+    stego = steg.encode_to_array(cover, secret)
+    assert np.array_equal(stego, loop_image_in_image(cover, secret, bit_depth, channel))
+    assert np.array_equal(steg.decode_to_array(stego), loop_image_from_image(stego, 30, 25, bit_depth))
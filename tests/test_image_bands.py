@@ -0,0 +1,123 @@
+"""
+Row-band streaming of the image-in-image mode against whole-image processing.
+"""
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from ImageInImageSteganography import ImageInImageSteganography
+from ImageRGBManipulator import ImageRGBExtractor, ImageRowReader, ImageWriter
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    cover = tmp_path / "cover.png"
+    secret = tmp_path / "secret.png"
+    Image.fromarray(rng.integers(0, 256, (150, 96, 3), dtype=np.uint8), mode="RGB").save(cover)
+    Image.fromarray(rng.integers(0, 256, (70, 80, 3), dtype=np.uint8), mode="RGB").save(secret)
+    return str(cover), str(secret)
+
+
+def load(path) -> np.ndarray:
+    if str(path).endswith(".npy"):
+        return np.load(path)
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+@pytest.mark.parametrize("band_rows", [1, 16, 64, 1000])
+@pytest.mark.parametrize("ext", ["png", "npy"])
+def test_banded_output_matches_whole_image(images, tmp_path, band_rows, ext):
+    cover, secret = images
+    whole, banded = tmp_path / f"whole.{ext}", tmp_path / f"banded.{ext}"
+    assert ImageInImageSteganography(bit_depth=3).encode(cover, secret, str(whole))
+    assert ImageInImageSteganography(bit_depth=3, band_rows=band_rows).encode(cover, secret, str(banded))
+
+    assert np.array_equal(load(banded), load(whole))
+    if ext == "npy":
+        # PNG bands use their own filter and deflate stream; only NPY is byte for byte identical
+        assert banded.read_bytes() == whole.read_bytes()
+
+    recovered_whole, recovered_banded = tmp_path / f"secret_whole.{ext}", tmp_path / f"secret_banded.{ext}"
+    assert ImageInImageSteganography(bit_depth=3).decode(str(whole), str(recovered_whole))
+    assert ImageInImageSteganography(bit_depth=3, band_rows=band_rows).decode(str(whole), str(recovered_banded))
+    assert np.array_equal(load(recovered_banded), load(recovered_whole))
+
+
+@pytest.mark.parametrize("level", [0, 1, 9])
+def test_banded_png_levels_keep_pixels(images, tmp_path, level):
+    cover, secret = images
+    writer = ImageWriter("PNG", compress_level=level)
+    whole, banded = tmp_path / "whole.png", tmp_path / "banded.png"
+    assert ImageInImageSteganography(writer=writer).encode(cover, secret, str(whole))
+    assert ImageInImageSteganography(writer=writer, band_rows=32).encode(cover, secret, str(banded))
+
+    assert np.array_equal(load(banded), load(whole))
+
+
+def encoded(image, format: str) -> bytes:
+    buf = io.BytesIO()
+    img = image if isinstance(image, Image.Image) else Image.fromarray(image, mode="RGB")
+    img.save(buf, format=format)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("format", ["BMP", "TIFF"])
+def test_raw_reader_keeps_pillow_bomb_limit(monkeypatch, format):
+    arr = np.random.default_rng(3).integers(0, 256, (60, 50, 3), dtype=np.uint8)
+    data = encoded(arr, format)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+
+    def open_many():
+        for _ in range(50):
+            with ImageRowReader(data) as reader:
+                assert reader.banded
+                reader.read(stop=2)
+
+    threads = [threading.Thread(target=open_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert Image.MAX_IMAGE_PIXELS == 1000
+
+    # Opening never trips the guard, decoding more rows than the limit allows does
+    with ImageRowReader(data) as reader:
+        assert np.array_equal(reader.read(stop=5), arr[:5])
+        with pytest.raises(Image.DecompressionBombError):
+            reader.read()
+
+
+
+def test_banded_encode_and_decode_in_place(images, tmp_path):
+    cover, secret = images
+    expected = tmp_path / "expected.png"
+    assert ImageInImageSteganography().encode(cover, secret, str(expected))
+    target = tmp_path / "target.png"
+    target.write_bytes(open(cover, "rb").read())
+
+    # The output is one of the images being streamed: it must only be replaced once complete
+    steg = ImageInImageSteganography(band_rows=16)
+    assert steg.encode(str(target), secret, str(target))
+    assert np.array_equal(load(target), load(expected))
+    assert steg.decode(str(target), str(target))
+    assert np.array_equal(load(target), ImageInImageSteganography().decode_to_array(str(expected)))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cover.png", "expected.png", "secret.png", "target.png"]
+
+
+@pytest.mark.parametrize("mode", ["1", "L", "LA", "P", "RGB", "RGBA", "I;16"])
+def test_banded_png_load_matches_pillow(mode):
+    # More than one load band (about 1 MB of RGB each)
+    arr = np.random.default_rng(4).integers(0, 256, (700, 600, 3), dtype=np.uint8)
+    img = Image.fromarray(arr, mode="RGB")
+    img = img.quantize() if mode == "P" else img.convert("L").convert(mode) if mode == "I;16" else img.convert(mode)
+    data = encoded(img, "PNG")
+
+    extractor = ImageRGBExtractor(data)
+    extractor.load()
+    with Image.open(io.BytesIO(data)) as expected:
+        assert np.array_equal(extractor.arr, np.asarray(expected.convert("RGB")))
@@ -0,0 +1,15 @@
+"""
+Peak memory of the image paths relative to the decoded cover.
+"""
+import pytest
+
+import benchmark
+
+
+def test_image_paths_stay_within_memory_bounds(tmp_path):
+    megapixels = 2 * benchmark.MEMORY_MIN_MEGAPIXELS
+    decoded, growth = benchmark.memory_profile(megapixels, str(tmp_path))
+    if any(value is None for value in growth.values()):
+        pytest.skip("peak RSS needs /proc/self/status")
+    for path, bound in benchmark.MEMORY_BOUNDS.items():
+        assert growth[path] <= bound * decoded, f"{path}: {growth[path] / decoded:.2f}x the cover, bound {bound}x"
@@ -0,0 +1,47 @@
+"""
+PayloadCodec packing and bounded decompression.
+"""
+import zlib
+
+import pytest
+
+from PayloadCodec import CODECS, PayloadCodec
+
+DATA = bytes(range(256)) * 64 + b"log line\n" * 2000
+
+
+def codecs():
+    try:
+        import zstandard  # noqa: F401
+        return list(CODECS)
+    except ImportError:
+        return [codec for codec in CODECS if codec != "zstd"]
+
+
+def forge(blob: bytes, size: int) -> bytes:
+    magic, codec_id, _ = PayloadCodec.HEADER.unpack_from(blob)
+    return PayloadCodec.HEADER.pack(magic, codec_id, size) + blob[PayloadCodec.HEADER.size:]
+
+
+@pytest.mark.parametrize("codec", codecs())
+def test_round_trip(codec):
+    assert PayloadCodec.unpack(PayloadCodec.pack(DATA, codec)) == DATA
+
+
+@pytest.mark.parametrize("codec", codecs())
+def test_output_capped_at_recorded_size(codec):
+    with pytest.raises(ValueError, match="more than the 100 bytes"):
+        PayloadCodec.unpack(forge(PayloadCodec.pack(DATA, codec), 100))
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_truncated_stream_rejected(codec):
+    with pytest.raises(ValueError):
+        PayloadCodec.unpack(PayloadCodec.pack(DATA, codec)[:-8])
+
+
+def test_bomb_stops_at_recorded_size():
+    # 64 MB of zeros in about 64 kB, announced as 1 kB
+    bomb = PayloadCodec.HEADER.pack(PayloadCodec.MAGIC, CODECS["zlib"], 1024) + zlib.compress(bytes(64 << 20), 9)
+    with pytest.raises(ValueError, match="more than the 1024 bytes"):
+        PayloadCodec.unpack(bomb)